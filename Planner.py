@@ -1,53 +1,170 @@
 # -*- coding: utf-8 -*-
+import time
+
+STARTED = time.perf_counter()  # Начало отсчёта фаз запуска — до импорта tkinter
+
 import tkinter as tk
-from tkinter import messagebox, ttk
-from tkcalendar import Calendar
-from tkcalendar import DateEntry
+from tkinter import filedialog, messagebox, ttk
 from datetime import datetime, timedelta
-import json
+import heapq
+import math
 import os
-import shutil
-import csv
-
-class Task:
-    def __init__(self, title, due_date, category="Без категории", comment="", time_spent=0, importance=False, urgency=False):
-        self.title = title
-        self.due_date = due_date
-        self.category = category
-        self.completed = False
-        self.comment = comment
-        self.time_spent = time_spent  # Время в секундах
-        self.importance = importance  # True = Важно, False = Не важно
-        self.urgency = urgency  # True = Срочно, False = Не срочно
-
-    def __str__(self):
-        status = "✓" if self.completed else "✗"
-        return f"{self.title} | {self.due_date} | {self.category} | {status}"
-
-class Note:
-    def __init__(self, text, date, category="Без категории"):
-        self.text = text
-        self.date = date
-        self.category = category
-
-    @property
-    def title(self):
-        return self.text.split("\n")[0].strip() if self.text else ""
-
-    def __str__(self):
-        return f"{self.title} | {self.date} | {self.category}"
+import queue
+import sys
+import threading
+import exporter
+import importer
+from planner_core import PlannerCore, format_duration, parse_due
+from background_writer import BackgroundWriter
+from storage import open_storage, CorruptDataError
+from archive import ARCHIVE_DAYS, archive_days
+from snapshots import SnapshotError
+from virtual_table import VirtualTable
+from views import TaskView, load_views, save_views
+from pomodoro import PomodoroTimer, REST, WORK
+
+class ReminderScheduler:
+    # Мин-куча ближайших событий по задачам. root.after ставится только на ближайшее событие,
+    # поэтому в простое планировщик ничего не перебирает.
+    MAX_SLEEP_MS = 60000  # Просыпаемся хотя бы раз в минуту, чтобы не зависеть от ухода системы в сон
+
+    def __init__(self, root, get_task, on_remind, on_overdue, lead_minutes=10):
+        self.root = root
+        self.get_task = get_task
+        self.on_remind = on_remind
+        self.on_overdue = on_overdue
+        self.lead = timedelta(minutes=lead_minutes)
+        self.heap = []  # (время события, вид, id задачи, срок задачи)
+        self.fired = set()  # (id задачи, срок) — напоминания, которые уже показаны
+        self.after_id = None
+
+    def set_lead(self, minutes, tasks):
+        self.lead = timedelta(minutes=minutes)
+        self.reset(tasks)
+
+    def reset(self, tasks):
+        now = datetime.now()
+        self.heap = []
+        for task in tasks:
+            if not task.completed and task.due_at > now:
+                self.heap.append((task.due_at - self.lead, "remind", task.id, task.due_at))
+                self.heap.append((task.due_at, "overdue", task.id, task.due_at))
+        heapq.heapify(self.heap)
+        self._arm()
+
+    def schedule(self, task):
+        # Вызывается после добавления или изменения задачи; устаревшие записи отсеются при извлечении
+        if not task.completed and task.due_at > datetime.now():
+            heapq.heappush(self.heap, (task.due_at - self.lead, "remind", task.id, task.due_at))
+            heapq.heappush(self.heap, (task.due_at, "overdue", task.id, task.due_at))
+        self._arm()
+
+    def _arm(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        if not self.heap:
+            return
+        delay = (self.heap[0][0] - datetime.now()).total_seconds() * 1000
+        self.after_id = self.root.after(int(min(max(delay, 0), self.MAX_SLEEP_MS)), self._run)
+
+    def _run(self):
+        self.after_id = None
+        now = datetime.now()
+        due_events = []
+        while self.heap and self.heap[0][0] <= now:
+            when, kind, task_id, due_at = heapq.heappop(self.heap)
+            task = self.get_task(task_id)
+            # Задачу удалили, выполнили или перенесли — событие устарело
+            if task is None or task.completed or task.due_at != due_at:
+                continue
+            if kind == "remind":
+                if (task_id, due_at) in self.fired or when != due_at - self.lead or due_at < now:
+                    continue
+                self.fired.add((task_id, due_at))
+            due_events.append((kind, task))
+        self._arm()
+        for kind, task in due_events:
+            if kind == "remind":
+                self.on_remind(task)
+            else:
+                self.on_overdue(task)
+
+
+class StartupTimer:
+    # Замер фаз запуска: импорт, построение окна, первая отрисовка, первый экран данных, вся история.
+    # Фазы печатаются в stderr при PLANNER_STARTUP_TIMING=1; если первая отрисовка не уложилась
+    # в бюджет (PLANNER_STARTUP_BUDGET_MS), предупреждение печатается всегда.
+    BUDGET_MS = 300
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.last = self.started
+        self.phases = []  # (фаза, мс с предыдущей фазы, мс от начала)
+        self.finished = False
+        self.verbose = bool(os.environ.get("PLANNER_STARTUP_TIMING"))
+        self.budget_ms = float(os.environ.get("PLANNER_STARTUP_BUDGET_MS", self.BUDGET_MS))
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        step_ms = (now - self.last) * 1000
+        total_ms = (now - self.started) * 1000
+        self.last = now
+        self.phases.append((phase, step_ms, total_ms))
+        if self.verbose:
+            print(f"[запуск] {phase}: +{step_ms:.1f} мс, всего {total_ms:.1f} мс", file=sys.stderr)
+        return total_ms
+
+    def first_paint(self):
+        total_ms = self.mark("первая отрисовка")
+        if total_ms > self.budget_ms:
+            print(f"[запуск] первая отрисовка через {total_ms:.0f} мс — больше бюджета {self.budget_ms:.0f} мс",
+                  file=sys.stderr)
+
+    def finish(self):
+        if not self.finished:
+            self.finished = True
+            self.mark("история загружена")
+
+
+# Квадрант Эйзенхауэра -> тег строки (цвет задаётся в PlannerApp)
+PRIORITY_TAGS = {1: "urgent_important", 2: "important", 3: "urgent", 4: "not_important"}
+QUADRANT_NAMES = {1: "1 — Важно и срочно", 2: "2 — Важно, не срочно", 3: "3 — Не важно, срочно",
+                  4: "4 — Не важно, не срочно"}
+# Столбец таблицы -> (заголовок, ключ сортировки в views.py)
+TASK_COLUMNS = {"Title": ("Задача", "title"), "Due Date": ("Срок", "due"), "Category": ("Категория", "category"),
+                "Status": ("Статус", "status"), "Comment": ("Комментарий", "comment"), "Time": ("Время", "time"),
+                "Priority": ("Приоритет", "priority")}
+NOTE_COLUMNS = {"Title": ("Заголовок заметки", "title"), "Date": ("Дата", "date"),
+                "Category": ("Категория", "category")}
+VIEW_STATUS_NAMES = {None: "Все", "open": "Невыполненные", "done": "Выполненные"}
+VIEW_DUE_NAMES = {None: "Любой срок", "overdue": "Просроченные", "today": "Сегодня", "week": "Эта неделя"}
+
 
 class PlannerApp:
-    def __init__(self, root):
+    def __init__(self, root, startup=None):
         self.root = root
+        self.startup = startup or StartupTimer(STARTED)
+        self.startup.mark("импорт модулей")
         self.root.title("Планировщик дел")
         self.root.minsize(700, 600)
-        self.tasks = []
-        self.notes = []
-        self.categories = ["Без категории", "Работа", "Личное", "Срочное"]
-        self.free_time_entries = []
+        # Данные, индексы и сохранение живут в ядре; окно только показывает их и вызывает его методы
+        # Запись на диск — в фоновом потоке, окно не ждёт ни журнала, ни уплотнения
+        self.writer = BackgroundWriter(open_storage())
+        self.core = PlannerCore(self.writer)
+        self.write_error_shown = None  # Об этой ошибке записи уже сообщили
+        self.search_after_id = None
+        self.search_active = False
+        self.found_tasks = []  # Результаты поиска; порядок и отбор по виду накладываются поверх
+        self.found_notes = []
+        # Вид таблицы задач (views.py) и сортировка по столбцу; None — порядок добавления
+        self.views = load_views()
+        self.task_view = self.views[0]
+        self.task_sort, self.task_reverse = self.task_view.sort, self.task_view.reverse
+        self.note_sort, self.note_reverse = None, False
+        self.sync_after_id = None
+        self.loading = False
         self.current_task = None
-        self.load_data()
 
         self.root.grid_columnconfigure(0, weight=1)
         self.root.grid_columnconfigure(1, weight=1)
@@ -56,22 +173,31 @@ class PlannerApp:
 
         # Поиск
         tk.Label(root, text="Поиск:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
-        self.search_entry = tk.Entry(root)
-        self.search_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        search_frame = tk.Frame(root)
+        search_frame.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        self.search_entry = tk.Entry(search_frame)
+        self.search_entry.pack(side="left", expand=True, fill="x")
+        self.search_entry.bind("<KeyRelease>", self.on_search_typed)
+        self.search_category_var = tk.StringVar(value="Все категории")
+        self.search_category_var.trace_add("write", lambda *args: self.search())
+        self.search_category_menu = tk.OptionMenu(search_frame, self.search_category_var, "Все категории",
+                                                  *self.core.categories)
+        self.search_category_menu.pack(side="left")
+        self.view_var = tk.StringVar(value=self.task_view.name)
+        self.view_menu = tk.OptionMenu(search_frame, self.view_var, *[view.name for view in self.views],
+                                       command=self.choose_view)
+        self.view_menu.pack(side="left")
+        tk.Button(search_frame, text="Вид…", command=self.save_view_window).pack(side="left")
         tk.Button(root, text="Найти", command=self.search).grid(row=0, column=2, padx=5, pady=5)
         tk.Button(root, text="Показать всё", command=self.reset_search).grid(row=0, column=3, padx=5, pady=5)
 
         # Таблица задач
         self.task_tree = ttk.Treeview(root, columns=(
         "Title", "Due Date", "Category", "Status", "Comment", "Time", "Priority"),
-                                      show="headings", height=10)
-        self.task_tree.heading("Title", text="Задача")
-        self.task_tree.heading("Due Date", text="Срок")
-        self.task_tree.heading("Category", text="Категория")
-        self.task_tree.heading("Status", text="Статус")
-        self.task_tree.heading("Comment", text="Комментарий")
-        self.task_tree.heading("Time", text="Время")
-        self.task_tree.heading("Priority", text="Приоритет")  # Новая колонка
+                                      show="headings", height=10, selectmode="extended")
+        # Щелчок по заголовку сортирует: по возрастанию, по убыванию, снова порядок добавления
+        for column, (text, key) in TASK_COLUMNS.items():
+            self.task_tree.heading(column, text=text, command=lambda key=key: self.sort_tasks(key))
         self.task_tree.column("Title", width=250, stretch=True)
         self.task_tree.column("Due Date", width=150, stretch=True)
         self.task_tree.column("Category", width=120, stretch=True)
@@ -80,8 +206,17 @@ class PlannerApp:
         self.task_tree.column("Time", width=100, stretch=True)
         self.task_tree.column("Priority", width=80, anchor="center")  # Новая колонка
         self.task_tree.grid(row=1, column=0, columnspan=4, padx=5, pady=5, sticky="ew")
+        # Мягкие цвета
+        self.task_tree.tag_configure("urgent_important", background="#ffcccc")  # Квадрант 1: Мягкий красный
+        self.task_tree.tag_configure("important", background="#ccffcc")  # Квадрант 2: Мягкий зелёный
+        self.task_tree.tag_configure("urgent", background="#ffcc99")  # Квадрант 3: Мягкий оранжевый
+        self.task_tree.tag_configure("not_important", background="#cce5ff")  # Квадрант 4: Мягкий голубой
         self.task_tree.tag_configure("overdue", foreground="red")
         self.task_tree.bind("<Double-1>", self.on_task_double_click)
+        task_scrollbar = ttk.Scrollbar(root, orient="vertical")
+        task_scrollbar.grid(row=1, column=4, pady=5, sticky="ns")
+        # В таблице создаются только видимые строки, остальное — в модели VirtualTable
+        self.task_table = VirtualTable(self.task_tree, task_scrollbar, self.task_row_by_id)
 
         # Кнопки для задач
         tk.Button(root, text="Добавить задачу", command=self.add_task_window).grid(row=2, column=0, padx=5, pady=5)
@@ -94,51 +229,76 @@ class PlannerApp:
         tk.Button(root, text="Статистика таймера", command=self.show_pomodoro_stats).grid(row=3, column=1, padx=5,
                                                                                           pady=5)
 
-        self.timer_running = False
-        self.timer_paused = False
-        self.pomodoro_cycles = 0
-        self.work_seconds = 0
-        self.rest_seconds = 0
-        self.long_break_seconds = 15 * 60
-        self.original_work_seconds = 25 * 60
-        self.original_rest_seconds = 5 * 60
-        self.is_work_phase = True
-        self.work_time_spent = 0
-        self.total_work_time = 0
+        self.pomodoro = None  # PomodoroTimer текущей сессии
+        self.timer_after_id = None
+        self.timer_update = None
 
         # Настройка напоминаний
         tk.Label(root, text="Напоминание за:").grid(row=3, column=2, padx=5, pady=5, sticky="e")
         self.reminder_var = tk.StringVar(value="10")
         tk.OptionMenu(root, self.reminder_var, "5", "10", "30", "60").grid(row=3, column=3, padx=5, pady=5, sticky="w")
+        self.reminders = ReminderScheduler(self.root, self.task_index_get, self.show_reminder, self.refresh_task_row,
+                                           int(self.reminder_var.get()))
+        self.reminder_var.trace_add("write", lambda *args: self.reminders.set_lead(int(self.reminder_var.get()),
+                                                                                    self.core.tasks))
 
         # Заметки
         tk.Button(root, text="Добавить заметку", command=self.open_note_window).grid(row=4, column=0, padx=5, pady=5)
         tk.Button(root, text="Редактировать заметку", command=self.edit_note).grid(row=4, column=1, padx=5, pady=5)
         tk.Button(root, text="Удалить заметку", command=self.delete_note).grid(row=4, column=2, padx=5, pady=5)
-        tk.Button(root, text="Восстановить из резерва", command=self.restore_from_backup).grid(row=5, column=0, padx=5,
-                                                                                               pady=5)
-        tk.Button(root, text="Экспорт в CSV", command=self.export_to_csv).grid(row=5, column=1, padx=5, pady=5)
-
-        self.note_tree = ttk.Treeview(root, columns=("Title", "Date", "Category"), show="headings", height=5)
-        self.note_tree.heading("Title", text="Заголовок заметки")
-        self.note_tree.heading("Date", text="Дата")
-        self.note_tree.heading("Category", text="Категория")
+        tk.Button(root, text="Категория заметок", command=self.recategorize_notes).grid(row=4, column=3, padx=5,
+                                                                                         pady=5)
+        tk.Button(root, text="Резервные снимки", command=self.snapshots_window).grid(row=5, column=0, padx=5, pady=5)
+        transfer_frame = tk.Frame(root)
+        transfer_frame.grid(row=5, column=1, padx=5, pady=5)
+        tk.Button(transfer_frame, text="Экспорт", command=self.export_window).pack(side="left")
+        tk.Button(transfer_frame, text="Импорт", command=self.import_window).pack(side="left", padx=(5, 0))
+        tk.Button(transfer_frame, text="Архив", command=self.archive_window).pack(side="left", padx=(5, 0))
+        # Массовые действия над выделенными задачами (Ctrl/Shift+щелчок, Ctrl+A — все строки таблицы)
+        tk.Button(root, text="Категория задач", command=self.recategorize_tasks).grid(row=5, column=2, padx=5, pady=5)
+        tk.Button(root, text="Приоритет задач", command=self.set_tasks_priority).grid(row=5, column=3, padx=5, pady=5)
+
+        self.note_tree = ttk.Treeview(root, columns=("Title", "Date", "Category"), show="headings", height=5,
+                                      selectmode="extended")
+        for column, (text, key) in NOTE_COLUMNS.items():
+            self.note_tree.heading(column, text=text, command=lambda key=key: self.sort_notes(key))
         self.note_tree.column("Title", width=450, stretch=True)
         self.note_tree.column("Date", width=150, stretch=True)
         self.note_tree.column("Category", width=150, stretch=True)
         self.note_tree.grid(row=6, column=0, columnspan=4, padx=5, pady=5, sticky="ew")
         self.note_tree.bind("<Double-1>", self.on_note_double_click)
+        note_scrollbar = ttk.Scrollbar(root, orient="vertical")
+        note_scrollbar.grid(row=6, column=4, pady=5, sticky="ns")
+        self.note_table = VirtualTable(self.note_tree, note_scrollbar, self.note_row_by_id)
+        self.update_headings()
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-        self.update_task_table()
-        self.update_note_table()
-        self.check_reminders()
+        self.startup.mark("окно построено")
+        # Данные читаем после первой отрисовки: сначала пользователь видит окно, потом строки
+        self.first_paint_done = False
+        self.root.bind("<Map>", self.on_first_map, add="+")
+
+    def on_first_map(self, event):
+        # <Map> корневого окна приходит и от дочерних виджетов — реагируем только на само окно
+        if event.widget is not self.root or self.first_paint_done:
+            return
+        self.first_paint_done = True
+        # after_idle встаёт в очередь после перерисовки, запланированной при показе окна
+        self.root.after_idle(self.after_first_paint)
+
+    def after_first_paint(self):
+        self.startup.first_paint()
+        self.load_data()
 
     def set_today(self):
         today = datetime.now().strftime("%Y-%m-%d %H:%M")
         self.due_date_var.set(today)
 
     def open_calendar(self):
+        # tkcalendar (вместе с babel) грузится долго, а нужен только в двух диалогах —
+        # импортируем его при первом открытии, а не при запуске
+        from tkcalendar import Calendar
+
         top = tk.Toplevel(self.root)
         top.title("Выберите дату")
         cal = Calendar(top, selectmode="day", date_pattern="yyyy-mm-dd")
@@ -151,29 +311,79 @@ class PlannerApp:
 
         tk.Button(top, text="Подтвердить", command=set_date).pack(pady=5)
 
+    # Действия над выделением применяются к модели одной пачкой: одна запись на диск
+    # и одна перерисовка таблицы, сколько бы строк ни было выделено
+
     def complete_task(self):
-        try:
-            selected_item = self.task_tree.selection()[0]
-            index = self.task_tree.index(selected_item)
-            self.tasks[index].completed = True
-            self.update_task_table()
-        except IndexError:
+        tasks = self.selected_tasks()
+        if not tasks:
             messagebox.showwarning("Ошибка", "Выберите задачу!")
+            return
+        self.core.complete_tasks(tasks)
+        self.redraw_tasks()
 
     def delete_task(self):
-        try:
-            selected_item = self.task_tree.selection()[0]
-            index = self.task_tree.index(selected_item)
-            self.tasks.pop(index)
-            self.update_task_table()
-        except IndexError:
+        tasks = self.selected_tasks()
+        if not tasks:
+            messagebox.showwarning("Ошибка", "Выберите задачу!")
+            return
+        if len(tasks) > 1 and not messagebox.askyesno("Удаление", f"Удалить выбранные задачи ({len(tasks)})?"):
+            return
+        self.task_table.remove_many([task.id for task in tasks])
+        self.core.delete_tasks(tasks)
+
+    def recategorize_tasks(self):
+        tasks = self.selected_tasks()
+        if not tasks:
+            messagebox.showwarning("Ошибка", "Выберите задачу!")
+            return
+
+        def save(category):
+            self.core.update_tasks(tasks, category=category)
+            self.redraw_tasks()
+
+        self.choose_category(f"Категория задач ({len(tasks)})", save)
+
+    def set_tasks_priority(self):
+        tasks = self.selected_tasks()
+        if not tasks:
             messagebox.showwarning("Ошибка", "Выберите задачу!")
+            return
+
+        top = tk.Toplevel(self.root)
+        top.title(f"Приоритет задач ({len(tasks)})")
+        top.geometry("300x150")
+
+        tk.Label(top, text="Квадрант:").pack(pady=5)
+        quadrant_var = tk.StringVar(value=QUADRANT_NAMES[tasks[0].priority])
+        tk.OptionMenu(top, quadrant_var, *QUADRANT_NAMES.values()).pack(pady=5)
+
+        def save_priority():
+            quadrant = next(number for number, name in QUADRANT_NAMES.items() if name == quadrant_var.get())
+            self.core.set_quadrant(tasks, quadrant)
+            self.redraw_tasks()
+            top.destroy()
+
+        tk.Button(top, text="Сохранить", command=save_priority).pack(pady=10)
+
+    def choose_category(self, title, on_save):
+        top = tk.Toplevel(self.root)
+        top.title(title)
+        top.geometry("300x150")
+
+        tk.Label(top, text="Новая категория:").pack(pady=5)
+        category_var = tk.StringVar(value="Без категории")
+        tk.OptionMenu(top, category_var, *self.core.categories).pack(pady=5)
+
+        def save_category():
+            on_save(category_var.get())
+            top.destroy()
+
+        tk.Button(top, text="Сохранить", command=save_category).pack(pady=10)
 
     def edit_task(self):
         try:
-            selected_item = self.task_tree.selection()[0]
-            index = self.task_tree.index(selected_item)
-            current_task = self.tasks[index]
+            current_task = self.selected_task()
 
             top = tk.Toplevel(self.root)
             top.title("Редактировать задачу")
@@ -201,12 +411,11 @@ class PlannerApp:
             category_frame.grid(row=2, column=1, pady=5, sticky="w")
 
             category_var = tk.StringVar(value=current_task.category)
-            category_menu = tk.OptionMenu(category_frame, category_var, *self.categories)
+            category_menu = tk.OptionMenu(category_frame, category_var, *self.core.categories)
             category_menu.pack(side="left", padx=(0, 10))
 
-            importance_var = tk.BooleanVar(
-                value=current_task.importance if hasattr(current_task, 'importance') else False)
-            urgency_var = tk.BooleanVar(value=current_task.urgency if hasattr(current_task, 'urgency') else False)
+            importance_var = tk.BooleanVar(value=current_task.importance)
+            urgency_var = tk.BooleanVar(value=current_task.urgency)
             tk.Checkbutton(category_frame, text="Важно", variable=importance_var).pack(side="left", padx=5)
             tk.Checkbutton(category_frame, text="Срочно", variable=urgency_var).pack(side="left", padx=5)
 
@@ -244,17 +453,13 @@ class PlannerApp:
                     messagebox.showwarning("Ошибка", "Введите название задачи!")
                     return
                 try:
-                    datetime.strptime(new_due_date, "%Y-%m-%d %H:%M")
-                    current_task.title = new_title
-                    current_task.due_date = new_due_date
-                    current_task.category = new_category
-                    current_task.comment = new_comment if new_comment != "комментарий" else ""  # Убираем подсказку
-                    if hasattr(current_task, 'importance'):
-                        current_task.importance = new_importance
-                    if hasattr(current_task, 'urgency'):
-                        current_task.urgency = new_urgency
-                    self.update_task_table()
-                    self.save_data()  # Сохранение данных
+                    _, new_due_date = parse_due(new_due_date)  # Тот же разбор, что у Task: "2025-3-5 9:00" тоже
+                    self.core.update_task(current_task, title=new_title, due_date=new_due_date,
+                                          category=new_category,
+                                          comment=new_comment if new_comment != "комментарий" else "",  # Убираем подсказку
+                                          importance=new_importance, urgency=new_urgency)
+                    self.reminders.schedule(current_task)
+                    self.refresh_task_row(current_task)
                     top.destroy()
                 except ValueError:
                     messagebox.showerror("Ошибка", "Неверный формат даты! Используйте YYYY-MM-DD HH:MM")
@@ -280,7 +485,7 @@ class PlannerApp:
 
         tk.Label(top, text="Категория:").pack(pady=5)
         category_var = tk.StringVar(value="Без категории")
-        tk.OptionMenu(top, category_var, *self.categories).pack(pady=5)
+        tk.OptionMenu(top, category_var, *self.core.categories).pack(pady=5)
 
         def save_note():
             text = note_text.get("1.0", tk.END).strip()
@@ -288,19 +493,20 @@ class PlannerApp:
             if not text:
                 messagebox.showwarning("Ошибка", "Введите текст заметки!")
                 return
-            date = datetime.now().strftime("%Y-%m-%d %H:%M")
-            note = Note(text, date, category)
-            self.notes.append(note)
-            self.update_note_table()
+            note = self.core.add_note(text, category)
+            if self.search_active:
+                self.found_notes.append(note)
+            if self.note_sort is not None:
+                self.update_note_table()
+            else:
+                self.note_table.append(note.id)
             top.destroy()
 
         tk.Button(top, text="Сохранить", command=save_note).pack(pady=5)
 
     def edit_note(self):
         try:
-            selected_item = self.note_tree.selection()[0]
-            index = self.note_tree.index(selected_item)
-            current_note = self.notes[index]
+            current_note = self.selected_note()
 
             top = tk.Toplevel(self.root)
             top.title("Редактировать заметку")
@@ -313,7 +519,7 @@ class PlannerApp:
 
             tk.Label(top, text="Категория:").pack(pady=5)
             category_var = tk.StringVar(value=current_note.category)
-            tk.OptionMenu(top, category_var, *self.categories).pack(pady=5)
+            tk.OptionMenu(top, category_var, *self.core.categories).pack(pady=5)
 
             def save_edited_note():
                 text = note_text.get("1.0", tk.END).strip()
@@ -321,9 +527,11 @@ class PlannerApp:
                 if not text:
                     messagebox.showwarning("Ошибка", "Введите текст заметки!")
                     return
-                current_note.text = text
-                current_note.category = category
-                self.update_note_table()
+                self.core.update_note(current_note, text=text, category=category)
+                if self.note_sort is not None:
+                    self.update_note_table()  # Строка могла сменить место
+                else:
+                    self.note_table.update(current_note.id)
                 top.destroy()
 
             tk.Button(top, text="Сохранить", command=save_edited_note).pack(pady=5)
@@ -334,83 +542,256 @@ class PlannerApp:
         self.edit_note()
 
     def delete_note(self):
-        try:
-            selected_item = self.note_tree.selection()[0]
-            index = self.note_tree.index(selected_item)
-            self.notes.pop(index)
-            self.update_note_table()
-        except IndexError:
+        notes = self.selected_notes()
+        if not notes:
             messagebox.showwarning("Ошибка", "Выберите заметку!")
+            return
+        if len(notes) > 1 and not messagebox.askyesno("Удаление", f"Удалить выбранные заметки ({len(notes)})?"):
+            return
+        self.note_table.remove_many([note.id for note in notes])
+        self.core.delete_notes(notes)
+
+    def recategorize_notes(self):
+        notes = self.selected_notes()
+        if not notes:
+            messagebox.showwarning("Ошибка", "Выберите заметку!")
+            return
+
+        def save(category):
+            self.core.update_notes(notes, category=category)
+            self.update_note_table()  # При сортировке по категории строки меняют место
+
+        self.choose_category(f"Категория заметок ({len(notes)})", save)
+
+    def task_row(self, task):
+        status = "✓" if task.completed else "✗"
+        time_str = format_duration(task.time_spent) if task.time_spent else ""
+        comment_symbol = "✎" if task.comment else ""
+        tag = PRIORITY_TAGS[task.priority]
+
+        values = (task.title, task.due_date, task.category, status, comment_symbol, time_str, str(task.priority))
+        if not task.completed and task.due_at < datetime.now():
+            return values, (tag, "overdue")
+        return values, (tag,)
+
+    # iid строки в таблице совпадает с id задачи, поэтому выбор не зависит от позиции строки
+    def selected_task(self):
+        return self.core.task_index[self.task_table.selection()[0]]
+
+    def selected_note(self):
+        return self.core.note_index[self.note_table.selection()[0]]
+
+    def selected_tasks(self):
+        return [self.core.task_index[task_id] for task_id in self.task_table.selection()
+                if task_id in self.core.task_index]
+
+    def selected_notes(self):
+        return [self.core.note_index[note_id] for note_id in self.note_table.selection()
+                if note_id in self.core.note_index]
+
+    def task_row_by_id(self, task_id):
+        return self.task_row(self.core.task_index[task_id])
+
+    def note_row_by_id(self, note_id):
+        note = self.core.note_index[note_id]
+        return (note.title, note.date, note.category), ()
+
+    def insert_task_row(self, task):
+        if self.search_active:
+            self.found_tasks.append(task)  # Новая задача видна и среди найденных
+        if self.task_sort is not None:
+            self.update_task_table()  # Место новой строки — по индексу сортировки
+        elif not self.task_view.filtered or self.task_view.matcher(datetime.now())(task):
+            self.task_table.append(task.id)
+
+    def refresh_task_row(self, task):
+        if self.task_sort is not None or self.task_view.filtered:
+            self.update_task_table()  # Строка могла сменить место или выпасть из вида
+        else:
+            # Перерисовываем только строку изменённой задачи (если она сейчас видна)
+            self.task_table.update(task.id)
 
-    def update_task_table(self):
-        for item in self.task_tree.get_children():
-            self.task_tree.delete(item)
-        for task in self.tasks:
-            status = "✓" if task.completed else "✗"
-            time_str = f"{task.time_spent // 60} мин {task.time_spent % 60} сек" if task.time_spent else ""
-            comment_symbol = "✎" if task.comment else ""
-            if task.importance and task.urgency:
-                priority = "1"  # Важно и Срочно
-                tag = "urgent_important"
-            elif task.importance and not task.urgency:
-                priority = "2"  # Важно, Не срочно
-                tag = "important"
-            elif not task.importance and task.urgency:
-                priority = "3"  # Не важно, Срочно
-                tag = "urgent"
-            else:
-                priority = "4"  # Не важно, Не срочно
-                tag = "not_important"
+    def redraw_tasks(self):
+        # После массового действия над выделенными задачами
+        if self.task_sort is not None or self.task_view.filtered:
+            self.update_task_table()
+        else:
+            self.task_table.refresh()
 
-            values = (task.title, task.due_date, task.category, status, comment_symbol, time_str, priority)
-            item = self.task_tree.insert("", "end", values=values, tags=(tag,))
-            if not task.completed and datetime.strptime(task.due_date, "%Y-%m-%d %H:%M") < datetime.now():
-                self.task_tree.item(item, tags=(tag, "overdue"))
+    def remove_task_row(self, task):
+        self.task_table.remove(task.id)
 
-        # Мягкие цвета
-        self.task_tree.tag_configure("urgent_important", background="#ffcccc")  # Квадрант 1: Мягкий красный
-        self.task_tree.tag_configure("important", background="#ccffcc")  # Квадрант 2: Мягкий зелёный
-        self.task_tree.tag_configure("urgent", background="#ffcc99")  # Квадрант 3: Мягкий оранжевый
-        self.task_tree.tag_configure("not_important", background="#cce5ff")  # Квадрант 4: Мягкий голубой
-        self.task_tree.tag_configure("overdue", foreground="red")
+    def append_task_rows(self, task_ids):
+        # Новые задачи (загрузка, импорт) дописываются в конец, если таблица не отсортирована; при сортировке
+        # их место определит перерисовка по индексу в конце загрузки или импорта
+        if self.search_active or self.task_sort is not None:
+            return
+        if self.task_view.filtered:
+            accepts = self.task_view.matcher(datetime.now())
+            task_ids = [task_id for task_id in task_ids if accepts(self.core.task_index[task_id])]
+        self.task_table.extend(task_ids)
+
+    def append_note_rows(self, note_ids):
+        if not self.search_active and self.note_sort is None:
+            self.note_table.extend(note_ids)
+
+    def update_task_table(self):
+        # Полная замена порядка строк: при старте, после поиска, смены вида или сортировки.
+        # Отбор и порядок дают индексы модели (views.py) — это перестановка id, а не перестройка таблицы
+        tasks = self.found_tasks if self.search_active else None
+        self.task_table.set_ids(self.core.views.task_ids(self.task_view, self.task_sort, self.task_reverse, tasks))
 
     def update_note_table(self):
-        self.note_tree.delete(*self.note_tree.get_children())
-        for note in self.notes:
-            self.note_tree.insert("", "end", values=(note.title, note.date, note.category))
+        notes = self.found_notes if self.search_active else None
+        self.note_table.set_ids(self.core.views.note_ids(self.note_sort, self.note_reverse, notes))
+
+    def update_tables(self):
+        # Обе таблицы целиком из модели: поиск перезапускается, вид и сортировка берутся из индексов
+        if self.search_active:
+            self.search()
+        else:
+            self.update_task_table()
+            self.update_note_table()
+
+    def update_headings(self):
+        # Стрелка у столбца, по которому отсортирована таблица
+        for tree, columns, sort, reverse in ((self.task_tree, TASK_COLUMNS, self.task_sort, self.task_reverse),
+                                             (self.note_tree, NOTE_COLUMNS, self.note_sort, self.note_reverse)):
+            for column, (text, key) in columns.items():
+                arrow = (" ▼" if reverse else " ▲") if key == sort else ""
+                tree.heading(column, text=text + arrow)
+
+    def next_sort(self, key, sort, reverse):
+        # По возрастанию -> по убыванию -> порядок добавления
+        if key != sort:
+            return key, False
+        if not reverse:
+            return key, True
+        return None, False
+
+    def sort_tasks(self, key):
+        self.task_sort, self.task_reverse = self.next_sort(key, self.task_sort, self.task_reverse)
+        self.update_headings()
+        self.update_task_table()
+
+    def sort_notes(self, key):
+        self.note_sort, self.note_reverse = self.next_sort(key, self.note_sort, self.note_reverse)
+        self.update_headings()
+        self.update_note_table()
+
+    def choose_view(self, name):
+        # Смена вида — новый отбор и порядок из индексов модели, без перестройки данных
+        self.task_view = next(view for view in self.views if view.name == name)
+        self.task_sort, self.task_reverse = self.task_view.sort, self.task_view.reverse
+        self.update_headings()
+        self.update_task_table()
+
+    def refresh_view_menu(self):
+        menu = self.view_menu["menu"]
+        menu.delete(0, "end")
+        for view in self.views:
+            menu.add_command(label=view.name, command=lambda name=view.name: (self.view_var.set(name),
+                                                                              self.choose_view(name)))
+
+    def save_view_window(self):
+        # Сохранить текущий отбор и сортировку под именем (или удалить вид с этим именем); виды — в views.json
+        top = tk.Toplevel(self.root)
+        top.title("Вид таблицы задач")
+        top.geometry("350x380")
+        view = self.task_view
+
+        tk.Label(top, text="Название:").pack(pady=5)
+        name_entry = tk.Entry(top, width=40)
+        name_entry.insert(0, view.name)
+        name_entry.pack(pady=5)
+
+        tk.Label(top, text="Категория:").pack()
+        category_var = tk.StringVar(value=view.category or "Все категории")
+        tk.OptionMenu(top, category_var, "Все категории", *self.core.categories).pack()
+        tk.Label(top, text="Статус:").pack()
+        status_var = tk.StringVar(value=VIEW_STATUS_NAMES[view.status])
+        tk.OptionMenu(top, status_var, *VIEW_STATUS_NAMES.values()).pack()
+        tk.Label(top, text="Квадрант:").pack()
+        quadrant_var = tk.StringVar(value=QUADRANT_NAMES.get(view.quadrant, "Все"))
+        tk.OptionMenu(top, quadrant_var, "Все", *QUADRANT_NAMES.values()).pack()
+        tk.Label(top, text="Срок:").pack()
+        due_var = tk.StringVar(value=VIEW_DUE_NAMES[view.due])
+        tk.OptionMenu(top, due_var, *VIEW_DUE_NAMES.values()).pack()
+
+        def by_name(names, value):
+            return next((key for key, name in names.items() if name == value), None)
+
+        def save_view():
+            name = name_entry.get().strip()
+            if not name:
+                messagebox.showwarning("Ошибка", "Введите название вида!", parent=top)
+                return
+            category = category_var.get()
+            new_view = TaskView(name, None if category == "Все категории" else category,
+                                by_name(VIEW_STATUS_NAMES, status_var.get()),
+                                by_name(QUADRANT_NAMES, quadrant_var.get()), by_name(VIEW_DUE_NAMES, due_var.get()),
+                                self.task_sort, self.task_reverse)
+            position = next((i for i, old in enumerate(self.views) if old.name == name), len(self.views))
+            self.views[position:position + 1] = [new_view]
+            save_views(self.views)
+            self.refresh_view_menu()
+            self.view_var.set(name)
+            self.choose_view(name)
+            top.destroy()
+
+        def delete_view():
+            name = name_entry.get().strip()
+            if len(self.views) == 1 or all(view.name != name for view in self.views):
+                return
+            self.views = [view for view in self.views if view.name != name]
+            save_views(self.views)
+            self.refresh_view_menu()
+            if self.task_view.name == name:
+                self.view_var.set(self.views[0].name)
+                self.choose_view(self.views[0].name)
+            top.destroy()
+
+        buttons = tk.Frame(top)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text="Сохранить", command=save_view).pack(side="left")
+        tk.Button(buttons, text="Удалить вид", command=delete_view).pack(side="left", padx=(5, 0))
+
+    def on_search_typed(self, event):
+        # Поиск по мере ввода: ждём паузу в наборе, чтобы не искать на каждое нажатие
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(150, self.search)
 
     def search(self):
-        query = self.search_entry.get().lower()
-        self.task_tree.delete(*self.task_tree.get_children())
-        self.note_tree.delete(*self.note_tree.get_children())
-        for task in self.tasks:
-            if query in task.title.lower() or query in task.category.lower():
-                status = "✓" if task.completed else "✗"
-                self.task_tree.insert("", "end", values=(task.title, task.due_date, task.category, status))
-        for note in self.notes:
-            if query in note.title.lower() or query in note.text.lower() or query in note.category.lower():
-                self.note_tree.insert("", "end", values=(note.title, note.date, note.category))
+        self.search_after_id = None
+        query = self.search_entry.get()
+        category = self.search_category_var.get()
+        if category == "Все категории":
+            if not query.strip():
+                self.search_active = False
+                self.update_task_table()
+                self.update_note_table()
+                return
+            category = None
+        self.search_active = True
+        self.found_tasks, self.found_notes = self.core.search(query, category)
+        self.update_task_table()
+        self.update_note_table()
 
     def reset_search(self):
         self.search_entry.delete(0, tk.END)
-        self.update_task_table()
-        self.update_note_table()
+        self.search_category_var.set("Все категории")  # Перерисует таблицы через search()
 
-    def check_reminders(self):
-        now = datetime.now()
-        reminder_minutes = int(self.reminder_var.get())
-        for task in self.tasks:
-            if not task.completed:
-                due = datetime.strptime(task.due_date, "%Y-%m-%d %H:%M")
-                if now <= due <= now + timedelta(minutes=reminder_minutes):
-                    messagebox.showinfo("Напоминание", f"Срок задачи '{task.title}' через {reminder_minutes} минут!")
-        self.root.after(60000, self.check_reminders)
+    def task_index_get(self, task_id):
+        return self.core.task_index.get(task_id)
+
+    def show_reminder(self, task):
+        minutes = int(self.reminders.lead.total_seconds() // 60)
+        messagebox.showinfo("Напоминание", f"Срок задачи '{task.title}' через {minutes} минут!")
 
     def start_pomodoro(self):
         try:
-            selected_item = self.task_tree.selection()[0]
-            index = self.task_tree.index(selected_item)
-            self.current_task = self.tasks[index]
+            self.current_task = self.selected_task()
             task_name = self.current_task.title
         except IndexError:
             self.current_task = None
@@ -442,23 +823,14 @@ class PlannerApp:
                 long_break_minutes = int(long_break_entry.get())
                 if work_minutes <= 0 or rest_minutes <= 0 or long_break_minutes <= 0:
                     raise ValueError
-                self.work_seconds = work_minutes * 60
-                self.rest_seconds = rest_minutes * 60
-                self.long_break_seconds = long_break_minutes * 60
-                self.original_work_seconds = work_minutes * 60
-                self.original_rest_seconds = rest_minutes * 60
-                self.is_work_phase = True
-                self.timer_running = True
-                self.timer_paused = False
-                self.pomodoro_cycles = 0
-                self.work_time_spent = 0
-                self.total_work_time = 0  # Сбрасываем общее время
+                self.pomodoro = PomodoroTimer(work_minutes * 60, rest_minutes * 60, long_break_minutes * 60)
+                self.pomodoro_changed("start")
                 settings_win.destroy()
 
                 timer_win = tk.Toplevel(self.root)
                 timer_win.title(f"Таймер Помидоро: {task_name}")
                 timer_win.geometry("400x200")
-                timer_win.protocol("WM_DELETE_WINDOW", self.stop_timer)
+                timer_win.protocol("WM_DELETE_WINDOW", lambda: self.stop_timer(timer_win))
 
                 timer_label = tk.Label(timer_win, text="Таймер: Настраивается...")
                 timer_label.pack(pady=10)
@@ -475,72 +847,63 @@ class PlannerApp:
                 end_btn = tk.Button(timer_win, text="Окончить работу", command=lambda: self.end_work(timer_win))
                 end_btn.pack(side=tk.LEFT, padx=5, pady=5)
 
-                self.run_pomodoro_timer(timer_win, timer_label, progress_bar)
+                self.run_pomodoro_timer(timer_win, timer_label, progress_bar, pause_btn)
             except ValueError:
                 messagebox.showerror("Ошибка", "Введите положительные числа!")
 
         tk.Button(settings_win, text="Старт", command=run_timer).pack(pady=10)
         tk.Button(settings_win, text="Отмена", command=settings_win.destroy).pack(pady=5)
 
-    def run_pomodoro_timer(self, timer_win, timer_label, progress_bar):
-        pause_btn = timer_win.children["!button"]  # Кнопка "Пауза"
+    TIMER_REDRAW_MS = 1000  # Как часто перерисовывать таймер; на точность отсчёта не влияет
+
+    def run_pomodoro_timer(self, timer_win, timer_label, progress_bar, pause_btn):
+        timer = self.pomodoro
 
         def update_timer():
-            if not self.timer_running:
-                if timer_win.winfo_exists():
-                    progress_bar["value"] = 0
-                    timer_win.destroy()
+            self.timer_after_id = None
+            if not timer.running or not timer_win.winfo_exists():
                 return
-            if self.timer_paused:
-                timer_label.config(text=f"Пауза: {'Работа' if self.is_work_phase else 'Отдых'}")
+            self.apply_pomodoro_phases(timer.advance())
+            if timer.paused:
+                # Во время паузы таймер не просыпается вовсе — его разбудит toggle_pause
+                timer_label.config(text=f"Пауза: {'Работа' if timer.phase == WORK else 'Отдых'}")
                 pause_btn.config(text="Продолжить")
-                self.root.after(1000, update_timer)
                 return
-            else:
-                pause_btn.config(text="Пауза")
+            pause_btn.config(text="Пауза")
 
+            remaining = math.ceil(timer.remaining())
             task_name = self.current_task.title if self.current_task else "Без задачи"
-            if self.is_work_phase and self.work_seconds > 0:
-                timer_label.config(
-                    text=f"Работа над '{task_name}': {self.work_seconds // 60}:{self.work_seconds % 60:02d} (Цикл {self.pomodoro_cycles + 1})")
-                progress = (self.original_work_seconds - self.work_seconds) / self.original_work_seconds * 100
-                progress_bar["value"] = progress
-                self.work_seconds -= 1
-                self.work_time_spent += 1
-                self.total_work_time += 1  # Накапливаем общее время
-                self.root.after(1000, update_timer)
-            elif self.is_work_phase and self.work_seconds <= 0:
-                if self.current_task:
-                    self.current_task.time_spent += self.work_time_spent
-                    self.update_task_table()
-                self.work_time_spent = 0
-                self.is_work_phase = False
-                self.pomodoro_cycles += 1
-                self.rest_seconds = self.original_rest_seconds if self.pomodoro_cycles < 4 else self.long_break_seconds
-                self.root.after(1000, update_timer)
-            elif not self.is_work_phase and self.rest_seconds > 0:
+            if timer.phase == WORK:
                 timer_label.config(
-                    text=f"Отдых: {self.rest_seconds // 60}:{self.rest_seconds % 60:02d} (Цикл {self.pomodoro_cycles})")
-                progress = (
-                                       self.original_rest_seconds - self.rest_seconds) / self.original_rest_seconds * 100 if self.pomodoro_cycles < 4 else (
-                                                                                                                                                                       self.long_break_seconds - self.rest_seconds) / self.long_break_seconds * 100
-                progress_bar["value"] = progress
-                self.rest_seconds -= 1
-                self.root.after(1000, update_timer)
+                    text=f"Работа над '{task_name}': {remaining // 60}:{remaining % 60:02d} (Цикл {timer.cycles + 1})")
             else:
-                self.work_seconds = self.original_work_seconds
-                self.is_work_phase = True
-                self.pomodoro_cycles = 0 if self.pomodoro_cycles >= 4 else self.pomodoro_cycles
-                self.root.after(1000, update_timer)
-
+                timer_label.config(text=f"Отдых: {remaining // 60}:{remaining % 60:02d} (Цикл {timer.cycles})")
+            progress_bar["value"] = timer.progress()
+            # Просыпаемся к моменту, когда сменится показываемое значение, а не по счётчику тиков
+            period = self.TIMER_REDRAW_MS / 1000
+            delay = timer.remaining() % period or period
+            self.timer_after_id = self.root.after(max(1, int(delay * 1000)), update_timer)
+
+        self.timer_update = update_timer
         update_timer()
 
+    def apply_pomodoro_phases(self, ended):
+        # Каждая завершённая фаза — сессия в журнале; время рабочей фазы сразу записываем в задачу
+        if ended:
+            self.pomodoro_changed("phase")
+        for phase, seconds, ended_at in ended:
+            end = self.pomodoro.wall_time(ended_at)
+            self.core.log_session(phase, end - seconds, end, self.current_task)
+            if phase == WORK and self.current_task:
+                self.core.add_time(self.current_task, seconds)
+                self.refresh_task_row(self.current_task)
+
     def log_free_time(self, time_spent):
         top = tk.Toplevel(self.root)
         top.title("Лог времени")
         top.geometry("400x200")
 
-        tk.Label(top, text=f"Потрачено {time_spent // 60} мин {time_spent % 60} сек").pack(pady=5)
+        tk.Label(top, text=f"Потрачено {format_duration(time_spent)}").pack(pady=5)
         tk.Label(top, text="На что было потрачено время?").pack(pady=5)
         desc_entry = tk.Entry(top, width=40)
         desc_entry.pack(pady=5)
@@ -550,26 +913,29 @@ class PlannerApp:
             if not desc:
                 messagebox.showwarning("Ошибка", "Введите описание!")
                 return
-            entry = {
-                "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                "description": desc,
-                "time_spent": time_spent
-            }
-            self.free_time_entries.append(entry)
+            self.core.log_free_time(desc, time_spent)
             top.destroy()
 
         tk.Button(top, text="Сохранить", command=save_log).pack(pady=10)
 
     def end_work(self, timer_win):
+        ended, partial = self.finish_timer()
+        self.apply_pomodoro_phases(ended)
+        if partial > 0:
+            end = self.pomodoro.wall_time(self.pomodoro.now())
+            self.core.log_session(WORK, end - partial, end, self.current_task)
         if self.current_task:
-            self.current_task.time_spent += self.work_time_spent
-            self.update_task_table()
+            self.core.add_time(self.current_task, partial)
+            self.refresh_task_row(self.current_task)
         else:
-            if self.total_work_time > 0:  # Учитываем всё время работы
-                self.log_free_time(self.total_work_time)
-        self.timer_running = False
+            total_work_time = round(self.pomodoro.total_work + partial)
+            if total_work_time > 0:  # Учитываем всё время работы
+                self.log_free_time(total_work_time)
         timer_win.destroy()
 
+    STATS_TOP_TASKS = 20
+    STATS_FREE_TIME = 20  # Последних записей работы вне плана
+
     def show_pomodoro_stats(self):
         top = tk.Toplevel(self.root)
         top.title("Статистика таймера")
@@ -578,173 +944,648 @@ class PlannerApp:
         stats_text = tk.Text(top, wrap="word", height=20)
         stats_text.pack(pady=5, padx=10, expand=True, fill="both")
 
-        stats_text.insert("end", "Время по задачам:\n")
-        for task in self.tasks:
-            if task.time_spent > 0:
-                minutes = task.time_spent // 60
-                seconds = task.time_spent % 60
-                stats_text.insert("end", f"- {task.title}: {minutes} мин {seconds} сек\n")
+        # Всё берётся из готовых сводок журнала сессий и поддерживаемого индекса времени по задачам:
+        # окно открывается одинаково быстро и через неделю, и через несколько лет истории.
+        # Полный отчёт по неделям проходит по всем задачам — он строится только по кнопке
+        sessions = self.core.sessions
+        now = datetime.now()
+        stats_text.insert("end", f"Сегодня: {format_duration(round(sessions.day_total(now)))}\n")
+        stats_text.insert("end", f"Эта неделя: {format_duration(round(sessions.week_total(now)))}\n")
+        stats_text.insert("end", f"Этот месяц: {format_duration(round(sessions.month_total(now)))}, "
+                                 f"отдых {format_duration(round(sessions.month_total(now, REST)))}\n")
+
+        stats_text.insert("end", "\nЧасы по категориям за месяц:\n")
+        by_category = sessions.month_by_category(now)
+        for category, seconds in sorted(by_category.items(), key=lambda item: item[1], reverse=True):
+            stats_text.insert("end", f"- {category}: {seconds / 3600:.1f} ч\n")
+
+        stats_text.insert("end", f"\nВремя по задачам (первые {self.STATS_TOP_TASKS}):\n")
+        # По Task.time_spent, как и planner_cli.py stats: там и время до журнала сессий, и каждая рабочая фаза
+        for task in self.core.top_tasks_by_time(self.STATS_TOP_TASKS):
+            stats_text.insert("end", f"- {task.title}: {format_duration(task.time_spent)}\n")
+
+        stats_text.insert("end", "\nРабота вне плана (последние записи):\n")
+        for entry in self.core.free_time_entries[-self.STATS_FREE_TIME:]:
+            stats_text.insert("end", f"- {entry['date']} | {entry['description']}: "
+                                     f"{format_duration(entry['time_spent'])}\n")
+        stats_text.config(state="disabled")  # Только чтение
 
-        stats_text.insert("end", "\nРабота вне плана:\n")
-        for entry in self.free_time_entries:
-            minutes = entry["time_spent"] // 60
-            seconds = entry["time_spent"] % 60
-            stats_text.insert("end", f"- {entry['date']} | {entry['description']}: {minutes} мин {seconds} сек\n")
+        def show_report():
+            from reports import build_report, format_report
+            report = format_report(build_report(self.core.tasks, self.core.free_time_entries))
+            stats_text.config(state="normal")
+            stats_text.insert("end", "\n" + "\n".join(report) + "\n")
+            stats_text.config(state="disabled")
+            stats_text.see("end")
+            report_btn.config(state="disabled")
 
-        stats_text.config(state="disabled")  # Только чтение
+        report_btn = tk.Button(top, text="Отчёт по неделям", command=show_report)
+        report_btn.pack(pady=5)
 
     def toggle_pause(self):
-        if self.timer_running:
-            self.timer_paused = not self.timer_paused
+        if self.pomodoro and self.pomodoro.running:
+            self.pomodoro.toggle_pause()
+            self.pomodoro_changed("pause" if self.pomodoro.paused else "resume")
+            if self.timer_after_id is not None:
+                self.root.after_cancel(self.timer_after_id)
+                self.timer_after_id = None
+            self.timer_update()
+
+    def finish_timer(self):
+        if self.timer_after_id is not None:
+            self.root.after_cancel(self.timer_after_id)
+            self.timer_after_id = None
+        result = self.pomodoro.stop()
+        self.pomodoro_changed("stop")
+        return result
 
     def stop_timer(self, timer_win=None):
-        self.timer_running = False
+        if self.pomodoro and self.pomodoro.running:
+            ended, _ = self.finish_timer()
+            self.apply_pomodoro_phases(ended)  # Незавершённая рабочая фаза при остановке не засчитывается
         if timer_win:
             timer_win.destroy()
 
     def save_data(self):
-        data = {
-            "tasks": [{"title": task.title, "due_date": task.due_date, "category": task.category,
-                       "comment": task.comment, "time_spent": task.time_spent, "completed": task.completed,
-                       "importance": task.importance, "urgency": task.urgency} for task in self.tasks],
-            "notes": [{"text": note.text, "date": note.date, "category": note.category} for note in self.notes],
-            "categories": self.categories,
-            "free_time_entries": self.free_time_entries
-        }
-        with open("tasks.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        if not os.path.exists("tasks_backup.json") or os.path.getmtime("tasks.json") > os.path.getmtime(
-                "tasks_backup.json"):
-            with open("tasks_backup.json", "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+        # Пока история догружается, дочитываем её через окно, чтобы таблицы и напоминания тоже обновились
+        while self.loading:
+            self.load_chunk(self.core.LOAD_CHUNK)
+        self.core.save()
+
+    FIRST_SCREEN = 200  # Записей, которые загружаются сразу после первой отрисовки окна
+    LOAD_CHUNK = 5000  # Записей за один шаг фоновой догрузки
 
     def load_data(self):
+        # Потоковая загрузка: записи превращаются в объекты по одной, первый экран показывается сразу,
+        # остальная история догружается порциями между событиями интерфейса
+        self.core.begin_load(self.core.storage.iter_load())
+        self.begin_load()
+        self.startup.mark("первый экран данных")
+
+    def begin_load(self):
+        self.loading = True
+        self.update_task_table()
+        self.update_note_table()
+        self.load_chunk(self.FIRST_SCREEN)
+
+    def load_chunk(self, limit):
+        if not self.loading:
+            return
         try:
-            with open("tasks.json", "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                if not content:
-                    self.tasks = []
-                    self.notes = []
-                    self.categories = ["Без категории", "Работа", "Личное", "Срочное"]
-                    self.free_time_entries = []
-                else:
-                    data = json.loads(content)
-                    self.tasks = [Task(t["title"], t["due_date"], t.get("category", "Без категории"),
-                                       t.get("comment", ""), t.get("time_spent", 0),
-                                       t.get("importance", False), t.get("urgency", False))
-                                  for t in data.get("tasks", [])]
-                    for i, task in enumerate(self.tasks):
-                        task.completed = data["tasks"][i]["completed"]
-                    self.notes = [Note(n["text"], n["date"], n.get("category", "Без категории"))
-                                  for n in data.get("notes", [])]
-                    self.categories = data.get("categories", ["Без категории", "Работа", "Личное", "Срочное"])
-                    self.free_time_entries = data.get("free_time_entries", [])
-        except FileNotFoundError:
-            self.tasks = []
-            self.notes = []
-            self.categories = ["Без категории", "Работа", "Личное", "Срочное"]
-            self.free_time_entries = []
-        except json.JSONDecodeError:
-            self.tasks = []
-            self.notes = []
-            self.categories = ["Без категории", "Работа", "Личное", "Срочное"]
-            self.free_time_entries = []
+            new_task_ids, new_note_ids = self.core.load_records(limit)
+        except CorruptDataError as e:
+            corrupt_path = self.core.recover()
+            messagebox.showerror("Ошибка", f"Файл данных повреждён: {e}\nОн сохранён как {corrupt_path}, "
+                                           f"данные восстановлены из резервной копии.")
+            self.begin_load()
+            return
+        self.append_task_rows(new_task_ids)
+        self.append_note_rows(new_note_ids)
+        if not self.core.loading:
+            self.finish_load()
+        else:
+            self.root.title(f"Планировщик дел — загрузка ({len(self.core.tasks)} задач, "
+                            f"{len(self.core.notes)} заметок)")
+            self.root.after(1, self.load_chunk, self.LOAD_CHUNK)
+
+    def finish_load(self):
+        self.loading = False
+        self.core.auto_archive()  # Давно выполненное и старые заметки — в архив; таблицы ниже строятся заново
+        self.reminders.reset(self.core.tasks)
+        self.refresh_category_menu()
+        self.root.title("Планировщик дел")
+        # Ядро могло дочитать историю само (уплотнение во время загрузки) — сверяем таблицы целиком;
+        # здесь же применяется сортировка, если она выбрана
+        self.update_tables()
+        self.startup.finish()
+        if self.sync_after_id is None:
+            self.sync_after_id = self.root.after(self.SYNC_MS, self.poll_external_changes)
+            self.start_api()
+
+    def start_api(self):
+        # Локальный HTTP API включается переменной PLANNER_API_PORT (0 — любой свободный порт)
+        self.api = None
+        port = os.environ.get("PLANNER_API_PORT")
+        if port is None:
+            return
+        from planner_api import PlannerApiServer, TkBridge
+        self.api = PlannerApiServer(self.core, TkBridge(self.root), self.pomodoro_state, self.api_task_saved,
+                                    port=int(port))
+        self.api.start_in_thread()
+        print(f"API планировщика: http://127.0.0.1:{self.api.port}/api/tasks", file=sys.stderr)
+
+    def api_task_saved(self, task, added):
+        # Задачу добавили или отметили выполненной через API (вызов уже в потоке Tk, через TkBridge):
+        # строка и напоминания обновляются так же, как после действия в самом окне
+        if added:
+            self.insert_task_row(task)
+        else:
+            self.refresh_task_row(task)
+        self.reminders.schedule(task)
+
+    def pomodoro_state(self):
+        timer = self.pomodoro
+        if timer is None or not timer.running:
+            return None
+        return {"phase": timer.phase, "paused": timer.paused, "remaining": round(timer.remaining(), 1),
+                "phase_length": timer.phase_length, "cycles": timer.cycles,
+                "total_work": round(timer.total_work + timer.current_work()),
+                "task_id": self.current_task.id if self.current_task else None,
+                "task_title": self.current_task.title if self.current_task else None}
+
+    def pomodoro_changed(self, action):
+        self.core.changed("pomodoro", self.current_task.id if self.current_task else None, action)
+
+    SYNC_MS = 2000  # Как часто проверять изменения от других процессов (второе окно, planner_cli.py)
+
+    def poll_external_changes(self):
+        self.sync_after_id = self.root.after(self.SYNC_MS, self.poll_external_changes)
+        self.check_write_error()
+        if self.loading:
+            return
+        changes = self.core.sync()
+        if changes is None:
+            return
+        # Перерисовываем только затронутые строки
+        for task_id in changes["removed"]["task"]:
+            self.task_table.remove(task_id)
+        for note_id in changes["removed"]["note"]:
+            self.note_table.remove(note_id)
+        for task_id in changes["added"]["task"] + changes["updated"]["task"]:
+            task = self.core.task_index.get(task_id)
+            if task is not None:
+                self.reminders.schedule(task)
+        if self.search_active:
+            self.search()
+        else:
+            if self.task_sort is not None or self.task_view.filtered:
+                self.update_task_table()  # Индексы сортировки уже обновлены ядром — это перестановка id
+            else:
+                self.task_table.extend([task_id for task_id in changes["added"]["task"]
+                                        if task_id in self.core.task_index])
+                for task_id in changes["updated"]["task"]:
+                    self.task_table.update(task_id)
+            if self.note_sort is not None:
+                self.update_note_table()
+            else:
+                self.note_table.extend([note_id for note_id in changes["added"]["note"]
+                                        if note_id in self.core.note_index])
+                for note_id in changes["updated"]["note"]:
+                    self.note_table.update(note_id)
+        if changes["lists"]:
+            self.refresh_category_menu()
+
+    def refresh_category_menu(self):
+        menu = self.search_category_menu["menu"]
+        menu.delete(0, "end")
+        for category in ["Все категории"] + self.core.categories:
+            menu.add_command(label=category, command=lambda c=category: self.search_category_var.set(c))
+
+    def snapshots_window(self):
+        # Поколения резервных снимков (snapshots.py): список, создание и восстановление в полной точности
+        top = tk.Toplevel(self.root)
+        top.title("Резервные снимки")
+        top.geometry("640x340")
+        tree = ttk.Treeview(top, columns=("Created", "Tasks", "Notes", "Label"), show="headings", height=10,
+                            selectmode="browse")
+        for column, text, width in (("Created", "Создан", 170), ("Tasks", "Задач", 90), ("Notes", "Заметок", 90),
+                                    ("Label", "Метка", 220)):
+            tree.heading(column, text=text)
+            tree.column(column, width=width)
+        tree.grid(row=0, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
+        status_var = tk.StringVar()
+        tk.Label(top, textvariable=status_var).grid(row=1, column=0, columnspan=3, sticky="w", padx=10)
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            try:
+                manifests = self.core.snapshots.list()
+            except SnapshotError as e:
+                messagebox.showerror("Ошибка", str(e), parent=top)
+                return
+            for manifest in manifests:
+                tree.insert("", "end", iid=manifest["id"], values=(
+                    datetime.fromtimestamp(manifest["created"]).strftime("%Y-%m-%d %H:%M:%S"),
+                    manifest["counts"].get("tasks", 0), manifest["counts"].get("notes", 0), manifest["label"]))
+            status_var.set(f"Поколений: {len(manifests)}, на диске {self.core.snapshots.size() / 1048576:.1f} МБ")
+
+        def create():
+            # Списки ссылок снимаются здесь, словари записей строит и сжимает фоновый поток
+            builder = self.core.snapshot_builder()
+            create_btn.config(state="disabled")
+            state = {"error": None}
+
+            def work():
+                try:
+                    self.core.snapshots.create(builder, "вручную")
+                except Exception as e:
+                    state["error"] = e
 
-    def save_data(self):
-        data = {
-            "tasks": [{"title": task.title, "due_date": task.due_date, "category": task.category,
-                       "comment": task.comment, "time_spent": task.time_spent, "completed": task.completed,
-                       "importance": task.importance, "urgency": task.urgency} for task in self.tasks],
-            "notes": [{"text": note.text, "date": note.date, "category": note.category} for note in self.notes],
-            "categories": self.categories,
-            "free_time_entries": self.free_time_entries
-        }
-        with open("tasks.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        if not os.path.exists("tasks_backup.json") or os.path.getmtime("tasks.json") > os.path.getmtime(
-                "tasks_backup.json"):
-            with open("tasks_backup.json", "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            worker = threading.Thread(target=work, name="planner-snapshot", daemon=True)
+            worker.start()
+            watch(worker, state)
 
-    def load_data(self):
-        try:
-            with open("tasks.json", "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                if not content:
-                    self.tasks = []
-                    self.notes = []
-                    self.categories = ["Без категории", "Работа", "Личное", "Срочное"]
-                    self.free_time_entries = []
-                else:
-                    data = json.loads(content)
-                    self.tasks = [Task(t["title"], t["due_date"], t.get("category", "Без категории"),
-                                       t.get("comment", ""), t.get("time_spent", 0),
-                                       t.get("importance", False), t.get("urgency", False))
-                                  for t in data.get("tasks", [])]
-                    for i, task in enumerate(self.tasks):
-                        task.completed = data["tasks"][i]["completed"]
-                    self.notes = [Note(n["text"], n["date"], n.get("category", "Без категории"))
-                                  for n in data.get("notes", [])]
-                    self.categories = data.get("categories", ["Без категории", "Работа", "Личное", "Срочное"])
-                    self.free_time_entries = data.get("free_time_entries", [])
-        except FileNotFoundError:
-            self.tasks = []
-            self.notes = []
-            self.categories = ["Без категории", "Работа", "Личное", "Срочное"]
-            self.free_time_entries = []
-        except json.JSONDecodeError:
-            self.tasks = []
-            self.notes = []
-            self.categories = ["Без категории", "Работа", "Личное", "Срочное"]
-            self.free_time_entries = []
-
-    def restore_from_backup(self):
-        if os.path.exists("tasks_backup.json"):
+        def watch(worker, state):
+            if worker.is_alive():
+                self.root.after(100, watch, worker, state)
+                return
+            if not top.winfo_exists():
+                return
+            create_btn.config(state="normal")
+            if state["error"] is not None:
+                messagebox.showerror("Ошибка", f"Не удалось создать снимок: {state['error']}", parent=top)
+            refresh()
+
+        def restore():
+            selection = tree.selection()
+            if not selection:
+                messagebox.showwarning("Внимание", "Выберите снимок!", parent=top)
+                return
+            if self.loading:
+                messagebox.showwarning("Внимание", "Дождитесь окончания загрузки данных.", parent=top)
+                return
+            if not messagebox.askyesno("Подтверждение", "Текущие задачи и заметки будут заменены данными снимка. "
+                                                        "Продолжить?", parent=top):
+                return
             try:
-                with open("tasks_backup.json", "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        self.tasks = [Task(t["title"], t["due_date"], t.get("category", "Без категории")) for t in data.get("tasks", [])]
-                        for i, task in enumerate(self.tasks):
-                            task.completed = data["tasks"][i]["completed"]
-                        self.notes = [Note(n["text"], n["date"], n.get("category", "Без категории")) for n in data.get("notes", [])]
-                        self.update_task_table()
-                        self.update_note_table()
-                        messagebox.showinfo("Успех", "Данные восстановлены из резервной копии.")
-                        self.save_data()
-                    else:
-                        messagebox.showerror("Ошибка", "Резервная копия имеет неверный формат.")
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось восстановить данные: {e}")
-        else:
-            messagebox.showwarning("Внимание", "Резервная копия не найдена.")
+                self.core.begin_restore(selection[0])
+            except SnapshotError as e:
+                messagebox.showerror("Ошибка", f"Не удалось восстановить данные: {e}", parent=top)
+                return
+            top.destroy()
+            # Таблицы очищаются и заполняются порциями, как при запуске; в конце хранилище переписывается
+            self.begin_load()
 
-    def export_to_csv(self):
-        try:
-            with open("planner_export.csv", "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                # Заголовки для задач
-                writer.writerow(["Тип", "Название", "Срок/Дата", "Категория", "Статус"])
-                # Экспорт задач
-                for task in self.tasks:
-                    status = "Выполнено" if task.completed else "Не выполнено"
-                    writer.writerow(["Задача", task.title, task.due_date, task.category, status])
-                # Экспорт заметок
-                for note in self.notes:
-                    writer.writerow(["Заметка", note.title, note.date, note.category, ""])
-            messagebox.showinfo("Успех", "Данные экспортированы в planner_export.csv")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось экспортировать данные: {e}")
+        create_btn = tk.Button(top, text="Создать снимок", command=create)
+        create_btn.grid(row=2, column=0, padx=10, pady=10)
+        tk.Button(top, text="Восстановить", command=restore).grid(row=2, column=1, padx=10, pady=10)
+        tk.Button(top, text="Закрыть", command=top.destroy).grid(row=2, column=2, padx=10, pady=10)
+        refresh()
+
+    ARCHIVE_ROWS = 500  # Сколько найденных записей архива показывать
+
+    def archive_window(self):
+        # Архив (archive.py): поиск по индексу, который читается при первом открытии, восстановление
+        # выделенных записей, архивация по возрасту сейчас и выделенных в главном окне заметок
+        top = tk.Toplevel(self.root)
+        top.title("Архив")
+        top.geometry("760x420")
+        query_entry = tk.Entry(top, width=50)
+        query_entry.grid(row=0, column=0, columnspan=2, padx=10, pady=10, sticky="ew")
+        query_entry.bind("<Return>", lambda event: refresh())
+        tk.Button(top, text="Найти", command=lambda: refresh()).grid(row=0, column=2, padx=10, pady=10)
+        tree = ttk.Treeview(top, columns=("Kind", "Title", "Date", "Category", "Archived"), show="headings", height=12,
+                            selectmode="extended")
+        for column, text, width in (("Kind", "Вид", 70), ("Title", "Заголовок", 290), ("Date", "Срок / дата", 120),
+                                    ("Category", "Категория", 110), ("Archived", "В архиве с", 100)):
+            tree.heading(column, text=text)
+            tree.column(column, width=width)
+        tree.grid(row=1, column=0, columnspan=3, padx=10, sticky="nsew")
+        status_var = tk.StringVar()
+        tk.Label(top, textvariable=status_var).grid(row=2, column=0, columnspan=3, sticky="w", padx=10)
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            entries = self.core.archive.search(query_entry.get())
+            for entry in entries[:self.ARCHIVE_ROWS]:
+                tree.insert("", "end", iid=entry["id"], values=(
+                    "задача" if entry["kind"] == "task" else "заметка", entry["title"], entry["date"],
+                    entry["category"], datetime.fromtimestamp(entry["archived_at"]).strftime("%Y-%m-%d")))
+            shown = f" (показаны первые {self.ARCHIVE_ROWS})" if len(entries) > self.ARCHIVE_ROWS else ""
+            status_var.set(f"Найдено: {len(entries)}{shown}; всего в архиве {len(self.core.archive)}, "
+                           f"на диске {self.core.archive.size() / 1048576:.1f} МБ")
+
+        def restore():
+            selection = tree.selection()
+            if not selection:
+                messagebox.showwarning("Внимание", "Выберите записи!", parent=top)
+                return
+            tasks, notes = self.core.restore_archived(selection)
+            self.refresh_category_menu()
+            self.update_tables()
+            refresh()
+            status_var.set(f"Восстановлено: задач {len(tasks)}, заметок {len(notes)}")
+
+        def archive_now():
+            try:
+                days = int(days_var.get())
+            except ValueError:
+                messagebox.showerror("Ошибка", "Введите число дней!", parent=top)
+                return
+            if self.loading:
+                messagebox.showwarning("Внимание", "Дождитесь окончания загрузки данных.", parent=top)
+                return
+            tasks, notes = self.core.archive_old(days)
+            self.task_table.remove_many([task.id for task in tasks])
+            self.note_table.remove_many([note.id for note in notes])
+            refresh()
+            status_var.set(f"В архив: задач {len(tasks)}, заметок {len(notes)}")
+
+        def archive_notes():
+            notes = self.selected_notes()
+            if not notes:
+                messagebox.showwarning("Внимание", "Выберите заметки в главном окне!", parent=top)
+                return
+            if self.loading:
+                messagebox.showwarning("Внимание", "Дождитесь окончания загрузки данных.", parent=top)
+                return
+            self.core.archive_notes(notes)
+            self.note_table.remove_many([note.id for note in notes])
+            refresh()
+            status_var.set(f"В архив: заметок {len(notes)}")
+
+        actions = tk.Frame(top)
+        actions.grid(row=3, column=0, columnspan=3, pady=10)
+        tk.Button(actions, text="Восстановить", command=restore).pack(side="left", padx=5)
+        tk.Label(actions, text="Выполненное и заметки старше, дней:").pack(side="left", padx=(20, 0))
+        days_var = tk.StringVar(value=str(archive_days() or ARCHIVE_DAYS))
+        tk.Entry(actions, textvariable=days_var, width=5).pack(side="left")
+        tk.Button(actions, text="В архив", command=archive_now).pack(side="left", padx=5)
+        tk.Button(actions, text="Выделенные заметки в архив", command=archive_notes).pack(side="left", padx=5)
+        tk.Button(actions, text="Закрыть", command=top.destroy).pack(side="left", padx=(20, 0))
+        top.grid_columnconfigure(0, weight=1)
+        top.grid_rowconfigure(1, weight=1)
+        refresh()
+
+    EXPORT_STATUSES = {"Все задачи": None, "Открытые": "open", "Выполненные": "done"}
+
+    def export_window(self):
+        # Экспорт идёт в фоновом потоке: окно остаётся отзывчивым, ход виден на полосе прогресса
+        top = tk.Toplevel(self.root)
+        top.title("Экспорт")
+        top.geometry("460x360")
+
+        tk.Label(top, text="Формат:").grid(row=0, column=0, sticky="w", padx=10, pady=5)
+        format_var = tk.StringVar(value="csv")
+        tk.OptionMenu(top, format_var, *exporter.FORMATS).grid(row=0, column=1, sticky="w", padx=10, pady=5)
+
+        tk.Label(top, text="Файл:").grid(row=1, column=0, sticky="w", padx=10, pady=5)
+        path_entry = tk.Entry(top, width=30)
+        path_entry.insert(0, "planner_export.csv")
+        path_entry.grid(row=1, column=1, sticky="w", padx=10, pady=5)
+
+        def choose_path():
+            path = filedialog.asksaveasfilename(parent=top, initialfile=path_entry.get(),
+                                                defaultextension="." + format_var.get())
+            if path:
+                path_entry.delete(0, tk.END)
+                path_entry.insert(0, path)
+
+        def format_changed(*args):
+            # Расширение файла по умолчанию следует за форматом
+            root_name, extension = os.path.splitext(path_entry.get())
+            if extension.lstrip(".") in exporter.FORMATS:
+                path_entry.delete(0, tk.END)
+                path_entry.insert(0, f"{root_name}.{format_var.get()}")
+
+        format_var.trace_add("write", format_changed)
+        tk.Button(top, text="Обзор…", command=choose_path).grid(row=1, column=2, padx=5, pady=5)
+
+        tk.Label(top, text="С даты (ГГГГ-ММ-ДД):").grid(row=2, column=0, sticky="w", padx=10, pady=5)
+        from_entry = tk.Entry(top, width=12)
+        from_entry.grid(row=2, column=1, sticky="w", padx=10, pady=5)
+        tk.Label(top, text="По дату (ГГГГ-ММ-ДД):").grid(row=3, column=0, sticky="w", padx=10, pady=5)
+        to_entry = tk.Entry(top, width=12)
+        to_entry.grid(row=3, column=1, sticky="w", padx=10, pady=5)
+
+        tk.Label(top, text="Категория:").grid(row=4, column=0, sticky="w", padx=10, pady=5)
+        category_var = tk.StringVar(value="Все категории")
+        tk.OptionMenu(top, category_var, "Все категории", *self.core.categories).grid(row=4, column=1, sticky="w",
+                                                                                      padx=10, pady=5)
+        tk.Label(top, text="Статус задач:").grid(row=5, column=0, sticky="w", padx=10, pady=5)
+        status_var = tk.StringVar(value="Все задачи")
+        tk.OptionMenu(top, status_var, *self.EXPORT_STATUSES).grid(row=5, column=1, sticky="w", padx=10, pady=5)
+
+        kind_vars = {"task": tk.BooleanVar(value=True), "note": tk.BooleanVar(value=True),
+                     "free_time": tk.BooleanVar(value=True)}
+        kinds_frame = tk.Frame(top)
+        kinds_frame.grid(row=6, column=0, columnspan=3, sticky="w", padx=10, pady=5)
+        for kind, text in (("task", "Задачи"), ("note", "Заметки"), ("free_time", "Работа вне плана")):
+            tk.Checkbutton(kinds_frame, text=text, variable=kind_vars[kind]).pack(side="left", padx=5)
+
+        progress_bar = ttk.Progressbar(top, length=400, mode="determinate")
+        progress_bar.grid(row=7, column=0, columnspan=3, padx=10, pady=5)
+        state = {"done": 0, "total": 0, "result": None, "error": None}
+        cancel = threading.Event()
+
+        def run_export():
+            dates = []
+            for entry in (from_entry, to_entry):
+                value = entry.get().strip()
+                try:
+                    dates.append(datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d") if value else None)
+                except ValueError:
+                    messagebox.showwarning("Ошибка", "Неверный формат даты! Используйте ГГГГ-ММ-ДД", parent=top)
+                    return
+            kinds = [kind for kind, var in kind_vars.items() if var.get()]
+            if not kinds:
+                messagebox.showwarning("Ошибка", "Выберите, что экспортировать!", parent=top)
+                return
+            category = category_var.get()
+            export_filter = exporter.ExportFilter(dates[0], dates[1],
+                                                  None if category == "Все категории" else category,
+                                                  self.EXPORT_STATUSES[status_var.get()], kinds)
+            # Списки записей снимаем здесь, в потоке интерфейса; словари строит и пишет фоновый поток
+            records, state["total"] = exporter.core_records(self.core)
+            path, fmt = path_entry.get().strip(), format_var.get()
+            start_btn.config(state="disabled")
+
+            def work():
+                def progress(done, total):
+                    state["done"] = done
+                try:
+                    state["result"] = exporter.export(records, path, fmt, export_filter, state["total"], progress,
+                                                      cancel)
+                except Exception as e:
+                    state["error"] = e
+
+            worker = threading.Thread(target=work, name="planner-export", daemon=True)
+            worker.start()
+            watch(worker, path)
+
+        def watch(worker, path):
+            if not top.winfo_exists():
+                return  # Окно закрыли — экспорт отменён
+            if state["total"]:
+                progress_bar["value"] = state["done"] / state["total"] * 100
+            if worker.is_alive():
+                self.root.after(100, watch, worker, path)
+                return
+            if isinstance(state["error"], exporter.ExportCancelled):
+                return
+            if state["error"] is not None:
+                messagebox.showerror("Ошибка", f"Не удалось экспортировать данные: {state['error']}", parent=top)
+                start_btn.config(state="normal")
+                return
+            messagebox.showinfo("Успех", f"Экспортировано записей: {state['result']}\nФайл: {path}", parent=top)
+            top.destroy()
+
+        def cancel_export():
+            cancel.set()
+            top.destroy()
+
+        top.protocol("WM_DELETE_WINDOW", cancel_export)
+        start_btn = tk.Button(top, text="Экспортировать", command=run_export)
+        start_btn.grid(row=8, column=0, padx=10, pady=10)
+        tk.Button(top, text="Отмена", command=cancel_export).grid(row=8, column=1, sticky="w", padx=10, pady=10)
+
+    IMPORT_QUEUE = 4  # Готовых пачек в очереди: разбор не уходит далеко вперёд применения, память не растёт
+
+    def import_window(self):
+        # Файл разбирается в фоновом потоке (чтение, дедупликация, объекты задач), а готовые пачки применяются
+        # в потоке интерфейса: одна запись на диск и одно обновление таблиц на пачку, а не на строку
+        if self.loading:
+            messagebox.showwarning("Внимание", "Дождитесь окончания загрузки данных.")
+            return
+        top = tk.Toplevel(self.root)
+        top.title("Импорт")
+        top.geometry("520x200")
+
+        tk.Label(top, text="Файл:").grid(row=0, column=0, sticky="w", padx=10, pady=5)
+        path_entry = tk.Entry(top, width=36)
+        path_entry.grid(row=0, column=1, sticky="w", padx=10, pady=5)
+
+        def choose_path():
+            path = filedialog.askopenfilename(parent=top, filetypes=[
+                ("Планировщик", "*.csv *.jsonl *.ics *.json"), ("Все файлы", "*")])
+            if path:
+                path_entry.delete(0, tk.END)
+                path_entry.insert(0, path)
+
+        tk.Button(top, text="Обзор…", command=choose_path).grid(row=0, column=2, padx=5, pady=5)
+        tk.Label(top, text="Формат:").grid(row=1, column=0, sticky="w", padx=10, pady=5)
+        format_var = tk.StringVar(value="по расширению")
+        tk.OptionMenu(top, format_var, "по расширению", *importer.FORMATS).grid(row=1, column=1, sticky="w",
+                                                                               padx=10, pady=5)
+        progress_bar = ttk.Progressbar(top, length=460, mode="indeterminate")
+        progress_bar.grid(row=2, column=0, columnspan=3, padx=10, pady=5)
+        status_var = tk.StringVar()
+        tk.Label(top, textvariable=status_var).grid(row=3, column=0, columnspan=3, sticky="w", padx=10)
+        batches = queue.Queue(maxsize=self.IMPORT_QUEUE)
+        state = {"error": None, "applied": 0}
+        cancel = threading.Event()
+
+        def run_import():
+            path = path_entry.get().strip()
+            fmt = None if format_var.get() == "по расширению" else format_var.get()
+            try:
+                if fmt is None:
+                    importer.detect_format(path)
+                if not os.path.isfile(path):
+                    raise ValueError(f"файл {path} не найден")
+            except ValueError as e:
+                messagebox.showwarning("Ошибка", str(e), parent=top)
+                return
+            # Хеши существующих записей снимаются здесь, в потоке интерфейса, который владеет моделью
+            job = importer.Importer(self.core)
+            start_btn.config(state="disabled")
+            progress_bar.start(20)
+
+            def work():
+                try:
+                    for batch in job.batches(path, fmt, cancel):
+                        while not cancel.is_set():
+                            try:
+                                batches.put(batch, timeout=0.1)
+                                break
+                            except queue.Full:
+                                continue
+                except Exception as e:
+                    state["error"] = e
+
+            worker = threading.Thread(target=work, name="planner-import", daemon=True)
+            worker.start()
+            apply_batches(worker, job.stats)
+
+        def apply_batches(worker, stats):
+            # По одной пачке за шаг главного цикла — окно остаётся отзывчивым
+            try:
+                batch = batches.get_nowait()
+            except queue.Empty:
+                batch = None
+            if batch is not None:
+                self.core.import_batch(batch.tasks, batch.notes, batch.free_time_entries, batch.categories)
+                state["applied"] += 1
+                self.append_task_rows([task.id for task in batch.tasks])
+                self.append_note_rows([note.id for note in batch.notes])
+                if top.winfo_exists():
+                    elapsed = time.perf_counter() - stats.started
+                    status_var.set(f"Прочитано {stats.read}, добавлено {stats.imported}, "
+                                   f"дубликатов {stats.duplicates} — {stats.read / elapsed:.0f} записей/с")
+                self.root.after(1, apply_batches, worker, stats)
+            elif worker.is_alive():
+                self.root.after(50, apply_batches, worker, stats)
+            else:
+                finish_import(stats)
+
+        def finish_import(stats):
+            if state["applied"]:
+                self.core.finish_import()
+                self.reminders.reset(self.core.tasks)
+                self.refresh_category_menu()
+                if self.search_active or self.task_sort is not None or self.note_sort is not None:
+                    self.update_tables()
+            if not top.winfo_exists():
+                return  # Окно закрыли — импорт остановлен, применённые пачки остаются
+            progress_bar.stop()
+            stats.seconds = time.perf_counter() - stats.started
+            if state["error"] is not None:
+                messagebox.showerror("Ошибка", f"Импорт прерван: {state['error']}\n{stats.summary()}", parent=top)
+                start_btn.config(state="normal")
+                return
+            messagebox.showinfo("Успех", stats.summary(), parent=top)
+            top.destroy()
+
+        def cancel_import():
+            cancel.set()
+            top.destroy()
+
+        top.protocol("WM_DELETE_WINDOW", cancel_import)
+        start_btn = tk.Button(top, text="Импортировать", command=run_import)
+        start_btn.grid(row=4, column=0, padx=10, pady=10)
+        tk.Button(top, text="Отмена", command=cancel_import).grid(row=4, column=1, sticky="w", padx=10, pady=10)
+
+    def check_write_error(self):
+        # Поток записи не смог записать изменения (диск заполнен, нет прав): пока они есть только в памяти
+        error = self.writer.error
+        if error is not None and error is not self.write_error_shown:
+            self.write_error_shown = error
+            messagebox.showerror("Ошибка записи", f"Не удалось сохранить изменения на диск: {error}\n\n"
+                                 "Пока они есть только в памяти. Освободите место или проверьте права на файлы — "
+                                 "при выходе программа попробует записать всё заново.")
+
+    def save_before_exit(self):
+        # Дожидаемся записи очереди. Если запись не удалась, всё состояние записывается заново одним снимком;
+        # не вышло и это — выход только с явного согласия, иначе окно остаётся открытым
+        self.writer.flush()
+        if self.writer.error is None:
+            return True
+        self.writer.error = None
+        self.core.save()
+        self.writer.flush()
+        if self.writer.error is None:
+            return True
+        return messagebox.askyesno("Ошибка записи", f"Изменения не сохранены: {self.writer.error}\n\n"
+                                   "Выйти без сохранения? «Нет» — окно останется открытым, выход можно повторить, "
+                                   "когда место или права будут исправлены.", icon="warning", default="no")
 
     def on_closing(self):
-        self.save_data()
+        while self.loading:
+            self.load_chunk(self.core.LOAD_CHUNK)
+        if not self.save_before_exit():
+            return
+        if self.sync_after_id is not None:
+            self.root.after_cancel(self.sync_after_id)
+        if getattr(self, "api", None) is not None:
+            self.api.stop()
+        # Окно прячем сразу, а выходим после того, как поток записи допишет очередь
+        self.root.withdraw()
+        self.core.close()
         self.root.destroy()
 
     def edit_task_comment(self):
         try:
-            selected_item = self.task_tree.selection()[0]
-            index = self.task_tree.index(selected_item)
-            current_task = self.tasks[index]
+            current_task = self.selected_task()
 
             top = tk.Toplevel(self.root)
             top.title(f"Комментарий к задаче '{current_task.title}'")
@@ -757,7 +1598,8 @@ class PlannerApp:
 
             def save_comment():
                 comment = comment_text.get("1.0", tk.END).strip()
-                current_task.comment = comment
+                self.core.update_task(current_task, comment=comment)
+                self.refresh_task_row(current_task)
                 top.destroy()
 
             tk.Button(top, text="Сохранить", command=save_comment).pack(pady=5)
@@ -778,12 +1620,11 @@ class PlannerApp:
             if not new_category:
                 messagebox.showwarning("Ошибка", "Введите название категории!")
                 return
-            if new_category in self.categories:
+            if not self.core.add_category(new_category):
                 messagebox.showwarning("Ошибка", "Такая категория уже существует!")
                 return
-            self.categories.append(new_category)
             self.category_menu["menu"].delete(0, "end")  # Обновляем меню
-            for category in self.categories:
+            for category in self.core.categories:
                 self.category_menu["menu"].add_command(label=category,
                                                        command=lambda c=category: self.category_var.set(c))
             self.category_var.set(new_category)
@@ -792,6 +1633,8 @@ class PlannerApp:
         tk.Button(top, text="Сохранить", command=save_category).pack(pady=10)
 
     def add_task_window(self):
+        from tkcalendar import DateEntry
+
         top = tk.Toplevel(self.root)
         top.title("Добавить задачу")
         top.geometry("420x320")  # Оптимизируем размер окна
@@ -807,7 +1650,7 @@ class PlannerApp:
 
         tk.Label(top, text="Категория:").grid(row=2, column=0, sticky="w", padx=10, pady=5)
         category_var = tk.StringVar(value="Без категории")
-        category_menu = tk.OptionMenu(top, category_var, *self.categories)
+        category_menu = tk.OptionMenu(top, category_var, *self.core.categories)
         category_menu.grid(row=2, column=1, padx=10, pady=5, sticky="w")
 
         tk.Label(top, text="Комментарий:").grid(row=3, column=0, sticky="nw", padx=10, pady=5)
@@ -842,10 +1685,9 @@ class PlannerApp:
                 messagebox.showwarning("Ошибка", "Неверный формат даты! Используйте ГГГГ-ММ-ДД")
                 return
 
-            new_task = Task(title, due_date_formatted, category, comment, 0, importance, urgency)
-            self.tasks.append(new_task)
-            self.update_task_table()
-            self.save_data()
+            new_task = self.core.add_task(title, due_date_formatted, category, comment, importance, urgency)
+            self.reminders.schedule(new_task)
+            self.insert_task_row(new_task)
             top.destroy()
 
         # Кнопка сохранения
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# Нагрузочный тест HTTP API (planner_api.py).
+# Запуск:
+#   python api_loadtest.py                          — свой сервер во временной папке с --tasks задачами
+#   python api_loadtest.py --port 8765              — уже запущенный сервер (окно с PLANNER_API_PORT
+#                                                     или planner_cli.py serve)
+#   python api_loadtest.py --clients 200 --requests 50 --pollers 500
+# Клиенты держат соединения keep-alive и шлют смесь запросов: страницы задач и заметок, поиск,
+# создание и выполнение задач. Параллельно висят long-poll клиенты: по ним видно, как быстро
+# изменение доходит до ожидающих.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+WORDS = ["отчёт", "встреча", "книга", "пайтон", "проект", "заметка", "идея", "работа", "стратегия", "план"]
+
+
+class Client:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode("utf-8") + body)
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        length = 0
+        for line in lines[1:]:
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1])
+        data = json.loads(await self.reader.readexactly(length)) if length else None
+        return status, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def worker(host, port, requests, latencies, errors, task_ids):
+    client = Client(host, port)
+    try:
+        for i in range(requests):
+            roll = random.random()
+            if roll < 0.4:
+                method, path, payload = "GET", f"/api/tasks?offset={random.randrange(0, 1000)}&limit=50", None
+            elif roll < 0.55:
+                method, path, payload = "GET", "/api/notes?limit=50", None
+            elif roll < 0.8:
+                method, path, payload = "GET", f"/api/search?q={random.choice(WORDS)[:4]}&limit=20", None
+            elif roll < 0.9 or not task_ids:
+                method, path = "POST", "/api/tasks"
+                payload = {"title": f"Нагрузка {random.choice(WORDS)} {i}", "due_date": "2025-06-01 10:00",
+                           "category": "Работа", "importance": roll < 0.85}
+            else:
+                method, path, payload = "POST", f"/api/tasks/{random.choice(task_ids)}/complete", None
+            started = time.perf_counter()
+            try:
+                status, data = await client.request(method, path, payload)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                errors.append(str(e))
+                client.close()
+                client = Client(host, port)
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status >= 400:
+                errors.append(f"{status} {path}")
+            elif method == "POST" and path == "/api/tasks":
+                task_ids.append(data["id"])
+    finally:
+        client.close()
+
+
+async def poller(host, port, version, wakeups, stop):
+    # Long-poll клиент: ждёт изменения и меряет, сколько прошло от изменения до ответа
+    client = Client(host, port)
+    try:
+        while not stop.is_set():
+            status, data = await client.request("GET", f"/api/changes?since={version}&timeout=5")
+            if status == 200 and data["changes"]:
+                wakeups.append(time.perf_counter())
+                version = data["version"]
+    except (OSError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        client.close()
+
+
+async def run(host, port, clients, requests, pollers):
+    probe = Client(host, port)
+    _, data = await probe.request("GET", "/api/tasks?limit=200")
+    probe.close()
+    version = data["version"]
+    task_ids = [item["id"] for item in data["items"]]
+
+    stop = asyncio.Event()
+    wakeups = []
+    poll_tasks = [asyncio.ensure_future(poller(host, port, version, wakeups, stop)) for _ in range(pollers)]
+    await asyncio.sleep(0.5)  # Пусть long-poll клиенты подключатся
+
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, requests, latencies, errors, task_ids) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*poll_tasks, return_exceptions=True)
+
+    total = len(latencies)
+    print(f"клиентов: {clients}, запросов: {total}, ошибок: {len(errors)}, за {elapsed:.2f} с")
+    print(f"пропускная способность: {total / elapsed:.0f} запросов/с")
+    print(f"задержка, мс: p50 {percentile(latencies, 0.5):.1f}, p95 {percentile(latencies, 0.95):.1f}, "
+          f"p99 {percentile(latencies, 0.99):.1f}, max {max(latencies, default=0):.1f}")
+    if pollers:
+        print(f"long-poll клиентов: {pollers}, пробуждений: {len(wakeups)}")
+    for error in errors[:5]:
+        print(f"  {error}")
+
+
+def start_local_server(tasks):
+    # Свой сервер во временной папке: модель с tasks задачами, без окна, в отдельном потоке
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp(prefix="planner_api_load_"))
+    from planner_core import Note, PlannerCore
+    from planner_api import PlannerApiServer
+    from benchmark import make_tasks
+
+    core = PlannerCore()
+    core.loaded = True
+    core.tasks = make_tasks(tasks)
+    for i in range(tasks // 10):
+        text = f"{WORDS[i % 10]} {i}\n" + " ".join(WORDS[(i + k) % 10] for k in range(10))
+        core.notes.append(Note(text, "2025-01-01 10:00"))
+    core.rebuild_indexes()
+    core.save()
+    server = PlannerApiServer(core, port=0)
+    server.start_in_thread()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест HTTP API планировщика")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="порт запущенного сервера; без него поднимается свой")
+    parser.add_argument("--tasks", type=int, default=10000, help="задач в своём сервере")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=100, help="запросов на клиента")
+    parser.add_argument("--pollers", type=int, default=200, help="long-poll клиентов")
+    args = parser.parse_args()
+    port = args.port
+    if port is None:
+        server = start_local_server(args.tasks)
+        port = server.port
+        print(f"свой сервер: {args.tasks} задач, порт {port}")
+    asyncio.run(run(args.host, port, args.clients, args.requests, args.pollers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+# Холодный архив: выполненные задачи и ненужные заметки уходят из рабочего набора (tasks.json, таблицы,
+# напоминания, поиск) в сжатые сегменты archive/segment-NNNNNN.jsonl.gz. Сегменты только дописываются:
+# каждая архивация — отдельный член gzip (сегмент целиком читается и обычным zcat), восстановление —
+# член с отметками restore. Рядом index.jsonl — строка на запись (заголовок, категория, дата, где лежит).
+# Индекс читается только при первом обращении к архиву, а сама запись достаётся из своего члена gzip,
+# без распаковки остального сегмента.
+import json
+import os
+import re
+import time
+import zlib
+
+from file_lock import FileLock
+from search_index import SearchIndex, tokenize
+
+ARCHIVE_DIR = "archive"
+ARCHIVE_DAYS = 90  # Через сколько дней без изменений выполненные задачи и заметки уходят в архив
+SEGMENT_BYTES = 32 * 1024 * 1024  # Дальше начинается новый сегмент
+MEMBER_RECORDS = 1000  # Записей в одном члене gzip: восстановление распаковывает только свой член
+READ_CHUNK = 64 * 1024
+SEGMENT_RE = re.compile(r"segment-([0-9]{6})\.jsonl\.gz")
+ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+def archive_days():
+    # PLANNER_ARCHIVE_DAYS переопределяет возраст; 0 — не архивировать автоматически (PlannerCore.auto_archive)
+    try:
+        return int(os.environ.get("PLANNER_ARCHIVE_DAYS", ARCHIVE_DAYS))
+    except ValueError:
+        return ARCHIVE_DAYS
+
+
+def gzip_member(lines):
+    # Один член gzip (RFC 1952) со строками JSON; члены, записанные подряд, — корректный файл .gz
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(("\n".join(lines) + "\n").encode("utf-8")) + compressor.flush()
+
+
+def summary(kind, record):
+    # Поля записи индекса: по ним архив ищется и показывается, не распаковывая сегменты
+    if kind == "task":
+        title, date, body = record["title"], record["due_date"], record.get("comment", "")
+    else:
+        title = record["text"].split("\n", 1)[0].strip()
+        date, body = record["date"], record["text"]
+    category = record.get("category", "Без категории")
+    # Слова текста, которых нет в заголовке, — чтобы находилось и по комментарию, и по телу заметки
+    seen = set(tokenize(title)) | set(tokenize(category))
+    words = " ".join(word for word in dict.fromkeys(tokenize(body)) if word not in seen)
+    return {"id": record["id"], "kind": kind, "title": title, "category": category, "date": date, "words": words}
+
+
+class ArchiveStore:
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.jsonl")
+        self.lock = FileLock(directory + ".lock")  # Рядом с каталогом: каталога может ещё не быть
+        self.entries = None  # id -> запись индекса; None — индекс ещё не читали
+        self.search_index = None
+        self.index_offset = 0  # Сколько байт index.jsonl уже прочитано
+
+    # --- сегменты ---
+
+    def segments(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if SEGMENT_RE.fullmatch(name))
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, segment)
+
+    def current_segment(self):
+        segments = self.segments()
+        if segments and os.path.getsize(self.segment_path(segments[-1])) < SEGMENT_BYTES:
+            return segments[-1]
+        number = int(SEGMENT_RE.fullmatch(segments[-1]).group(1)) + 1 if segments else 1
+        return f"segment-{number:06d}.jsonl.gz"
+
+    def read_member(self, segment, offset):
+        # Строки одного члена gzip, начиная с offset; читается ровно столько сжатых данных, сколько в нём
+        decompressor = zlib.decompressobj(31)
+        data = []
+        with open(self.segment_path(segment), "rb") as f:
+            f.seek(offset)
+            while not decompressor.eof:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    raise zlib.error("член gzip оборван")
+                data.append(decompressor.decompress(chunk))
+        return b"".join(data).decode("utf-8").splitlines()
+
+    def scan_members(self, segment, start):
+        # (начало, конец, строки) членов сегмента от start до конца файла или до оборванного члена
+        with open(self.segment_path(segment), "rb") as f:
+            f.seek(start)
+            tail = f.read()
+        position = 0
+        while position < len(tail):
+            decompressor = zlib.decompressobj(31)
+            try:
+                data = decompressor.decompress(tail[position:])
+            except zlib.error:
+                return
+            if not decompressor.eof:
+                return
+            end = len(tail) - len(decompressor.unused_data)
+            yield start + position, start + end, data.decode("utf-8").splitlines()
+            position = end
+
+    # --- запись ---
+
+    def append(self, tasks=(), notes=(), now=None):
+        # Словари задач и заметок (to_dict) -> новый член сегмента и строки индекса. Возвращает число записей
+        now = now or time.time()
+        items = [("task", record) for record in tasks] + [("note", record) for record in notes]
+        if not items:
+            return 0
+        index_items = []
+        with self.lock.exclusive():
+            self.sync_tail()
+            for start in range(0, len(items), MEMBER_RECORDS):
+                chunk = items[start:start + MEMBER_RECORDS]
+                segment, offset, end = self.write_member([ENCODER.encode({"kind": kind, "archived_at": now,
+                                                                          "record": record})
+                                                          for kind, record in chunk])
+                index_items.extend(dict(summary(kind, record), archived_at=now, segment=segment, offset=offset)
+                                   for kind, record in chunk)
+                index_items.append({"segment": segment, "end": end})
+            self.write_index(index_items)
+        return len(items)
+
+    def mark_restored(self, ids, now=None):
+        # Архив только дописывается: восстановленные записи помечаются отметкой restore
+        now = now or time.time()
+        ids = list(ids)
+        if not ids:
+            return
+        marks = [{"restore": item_id, "at": now} for item_id in ids]
+        with self.lock.exclusive():
+            self.sync_tail()
+            segment, _, end = self.write_member([ENCODER.encode(mark) for mark in marks])
+            self.write_index(marks + [{"segment": segment, "end": end}])
+
+    def write_member(self, lines):
+        os.makedirs(self.directory, exist_ok=True)
+        segment = self.current_segment()
+        payload = gzip_member(lines)
+        with open(self.segment_path(segment), "ab") as f:
+            offset = f.tell()
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        return segment, offset, offset + len(payload)
+
+    def write_index(self, items):
+        with open(self.index_path, "ab") as f:
+            # После сбоя последняя строка могла остаться без перевода строки — не склеиваем с ней новые
+            if f.tell() and not self.index_ends_with_newline():
+                f.write(b"\n")
+            f.write("".join(ENCODER.encode(item) + "\n" for item in items).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def index_ends_with_newline(self):
+        with open(self.index_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def last_marker(self):
+        # Последняя отметка {"segment", "end"} в индексе: докуда сегменты уже проиндексированы
+        try:
+            with open(self.index_path, "rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - READ_CHUNK))
+                tail = f.read()
+        except FileNotFoundError:
+            return None, 0
+        for line in reversed(tail.splitlines()):
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            if "end" in item:
+                return item["segment"], item["end"]
+        return None, 0
+
+    def sync_tail(self):
+        # Сбой между записью сегмента и индекса: недостающие члены индексируются заново, оборванный
+        # последний член отрезается. Вызывается под блокировкой перед каждой записью в архив
+        segment, end = self.last_marker()
+        for name in self.segments():
+            if segment is not None and name < segment:
+                continue
+            start = end if name == segment else 0
+            good = start
+            for offset, member_end, lines in self.scan_members(name, start):
+                items = []
+                for line in lines:
+                    item = json.loads(line)
+                    if "record" in item:
+                        items.append(dict(summary(item["kind"], item["record"]), archived_at=item["archived_at"],
+                                          segment=name, offset=offset))
+                    else:
+                        items.append(item)
+                self.write_index(items + [{"segment": name, "end": member_end}])
+                good = member_end
+            if os.path.getsize(self.segment_path(name)) > good:
+                os.truncate(self.segment_path(name), good)
+
+    # --- чтение индекса (лениво) ---
+
+    def refresh(self):
+        # Первое обращение читает index.jsonl целиком, следующие — только дописанное (и другими процессами)
+        if self.entries is None:
+            self.entries = {}
+            self.search_index = SearchIndex()
+            self.index_offset = 0
+        try:
+            with open(self.index_path, "rb") as f:
+                f.seek(self.index_offset)
+                tail = f.read()
+        except FileNotFoundError:
+            return
+        end = tail.rfind(b"\n") + 1  # Недописанную строку оставляем на следующий раз
+        self.search_index.start_bulk()
+        for line in tail[:end].splitlines():
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            if "restore" in item:
+                entry = self.entries.get(item["restore"])
+                if entry is not None and entry["archived_at"] <= item["at"]:
+                    del self.entries[item["restore"]]
+                    self.search_index.remove(item["restore"])
+            elif "id" in item:
+                self.entries[item["id"]] = item  # Позднейшая архивация той же записи заменяет прежнюю
+                self.search_index.add(item["id"], item["kind"], item["category"],
+                                      ((item["title"], SearchIndex.TITLE_WEIGHT),
+                                       (item["category"], SearchIndex.CATEGORY_WEIGHT),
+                                       (item["words"], SearchIndex.BODY_WEIGHT)))
+        self.search_index.finish_bulk()
+        self.index_offset += end
+
+    def __len__(self):
+        self.refresh()
+        return len(self.entries)
+
+    def search(self, query="", category=None, kind=None):
+        # Записи индекса, лучшие совпадения первыми; пустой запрос — все, недавно архивированные первыми
+        self.refresh()
+        if not query.strip():
+            entries = [entry for entry in self.entries.values()
+                       if (category is None or entry["category"] == category)
+                       and (kind is None or entry["kind"] == kind)]
+            return sorted(entries, key=lambda entry: entry["archived_at"], reverse=True)
+        return [self.entries[doc_id] for doc_id in self.search_index.search(query, category, kind)]
+
+    def find(self, prefix):
+        # Записи, чей id начинается с prefix
+        self.refresh()
+        entry = self.entries.get(prefix)
+        if entry is not None:
+            return [entry]
+        return [entry for item_id, entry in self.entries.items() if item_id.startswith(prefix)]
+
+    def read(self, ids):
+        # Полные записи по id: {id: (вид, словарь)}. Распаковываются только члены, где они лежат
+        self.refresh()
+        members = {}
+        for item_id in ids:
+            entry = self.entries.get(item_id)
+            if entry is not None:
+                members.setdefault((entry["segment"], entry["offset"]), set()).add(item_id)
+        found = {}
+        for (segment, offset), wanted in members.items():
+            for line in self.read_member(segment, offset):
+                item = json.loads(line)
+                if "record" in item and item["record"]["id"] in wanted:
+                    found[item["record"]["id"]] = (item["kind"], item["record"])
+        return found
+
+    def size(self):
+        return sum(os.path.getsize(self.segment_path(segment)) for segment in self.segments())
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+import queue
+import threading
+import time
+import traceback
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    # Обёртка над JsonStorage/SqliteStorage: изменения уходят в очередь, на диск их пишет отдельный поток.
+    # Поток интерфейса только кладёт операцию в очередь и никогда не ждёт диска.
+    # Операции, пришедшие подряд в течение BATCH_DELAY, пишутся одной пачкой (одна запись и fsync),
+    # а уплотнение (полная перезапись снимка) откладывается, пока правки не стихнут на DEBOUNCE секунд.
+    BATCH_DELAY = 0.05
+    DEBOUNCE = 2.0
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.queue = queue.Queue()
+        self.compaction_pending = False
+        self.error = None  # Последняя ошибка записи (данные при этом остаются в памяти); её показывает окно
+        self.thread = threading.Thread(target=self._run, name="planner-writer", daemon=True)
+        self.thread.start()
+
+    # --- то же, что у хранилища ---
+
+    def put(self, kind, record):
+        self.queue.put(("op", {"op": "put", "kind": kind, "record": record}))
+
+    def delete(self, kind, record_id, at=None):
+        # Время удаления — момент вызова, а не записи на диск: по нему решаются конфликты с другими процессами
+        self.queue.put(("op", {"op": "delete", "kind": kind, "id": record_id, "at": at or time.time()}))
+
+    def set(self, key, value):
+        self.queue.put(("op", {"op": "set", "key": key, "value": value}))
+
+    def append(self, key, value):
+        self.queue.put(("op", {"op": "append", "key": key, "value": value}))
+
+    def write_batch(self, ops):
+        # Готовая пачка (массовое действие) уходит в очередь одним элементом и пишется одной записью
+        self.queue.put(("ops", list(ops)))
+
+    def needs_compaction(self):
+        # Пока уплотнение стоит в очереди, повторно его не просим
+        return not self.compaction_pending and self.storage.needs_compaction()
+
+    def has_journal(self):
+        self.flush()  # Операции из очереди тоже должны попасть в журнал
+        return self.storage.has_journal()
+
+    def compact(self, data):
+        # data — снимок или функция, которая его построит; строится он уже в потоке записи
+        self.compaction_pending = True
+        self.queue.put(("compact", data))
+
+    @property
+    def snapshots(self):
+        return self.storage.snapshots
+
+    @property
+    def compact_on_close(self):
+        return self.storage.compact_on_close
+
+    def poll_changes(self):
+        # Проверка чужих изменений идёт в потоке интерфейса: это stat() и чтение хвоста журнала,
+        # а если поток записи держит хранилище, проверка просто пропускается
+        return self.storage.poll_changes()
+
+    def iter_load(self):
+        self.flush()
+        return self.storage.iter_load()
+
+    def load(self):
+        self.flush()
+        return self.storage.load()
+
+    def recover(self):
+        self.flush()
+        return self.storage.recover()
+
+    @property
+    def indexed(self):
+        return self.storage.indexed
+
+    def query_tasks(self, **filters):
+        # Выборка должна видеть и правки, ещё стоящие в очереди
+        self.flush()
+        return self.storage.query_tasks(**filters)
+
+    def flush(self):
+        # Дождаться, пока всё поставленное в очередь будет записано (уплотнение — без задержки)
+        self.queue.put(("flush", None))
+        self.queue.join()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(("stop", _STOP))
+            self.thread.join()
+        self.storage.close()
+
+    # --- поток записи ---
+
+    def _run(self):
+        pending = None  # Отложенное уплотнение: снимок (или функция) на момент запроса
+        since_pending = []  # Операции, записанные в журнал после запроса уплотнения
+        compact_at = None
+        running = True
+        while running:
+            timeout = None if pending is None else max(0.0, compact_at - time.monotonic())
+            try:
+                items = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                self._compact(pending, since_pending)
+                pending, since_pending = None, []
+                continue
+            # Собираем всё, что успело прийти за BATCH_DELAY, в одну пачку
+            batch_end = time.monotonic() + self.BATCH_DELAY
+            while items[-1][0] in ("op", "ops"):
+                try:
+                    items.append(self.queue.get(timeout=max(0.0, batch_end - time.monotonic())))
+                except queue.Empty:
+                    break
+            ops = []
+            for kind, value in items:
+                if kind == "op":
+                    ops.append(value)
+                    continue
+                if kind == "ops":
+                    ops.extend(value)
+                    continue
+                self._write(ops)
+                if pending is not None:
+                    since_pending.extend(ops)
+                ops = []
+                if kind == "compact":
+                    # Новый запрос заменяет старый: его снимок включает всё, что было в старом
+                    pending, since_pending = value, []
+                    compact_at = time.monotonic() + self.DEBOUNCE
+                elif pending is not None:  # flush или stop
+                    self._compact(pending, since_pending)
+                    pending, since_pending = None, []
+                if kind == "stop":
+                    running = False
+            self._write(ops)
+            if pending is not None:
+                since_pending.extend(ops)
+            for _ in items:
+                self.queue.task_done()
+
+    def _write(self, ops):
+        if not ops:
+            return
+        try:
+            self.storage.write_batch(ops)
+        except Exception as e:
+            self.error = e
+            traceback.print_exc()
+
+    def _compact(self, data, since):
+        try:
+            self.storage.compact(data)
+            # Журнал после уплотнения пуст; операции, пришедшие после запроса, в снимок могли не попасть
+            if since:
+                self.storage.write_batch(since)
+        except Exception as e:
+            self.error = e
+            traceback.print_exc()
+        finally:
+            self.compaction_pending = False
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# Замеры производительности планировщика.
+# Запуск: python benchmark.py [имя_замера ...]
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SIZES = [100, 1000, 10000, 100000]
+
+
+def make_tasks(n):
+    from planner_core import Task
+    start = datetime(2025, 1, 1, 9, 0)
+    tasks = []
+    for i in range(n):
+        due = (start + timedelta(hours=i)).strftime("%Y-%m-%d %H:%M")
+        tasks.append(Task(f"Задача {i}", due, "Работа", "", 0, i % 2 == 0, i % 3 == 0))
+    return tasks
+
+
+def bench_table():
+    import tkinter as tk
+    from Planner import PlannerApp
+
+    print(f"{'задач':>8} {'полная перестройка, мс':>24} {'одна строка, мс':>17}")
+    for n in SIZES:
+        root = tk.Tk()
+        root.withdraw()
+        app = PlannerApp(root)
+        app.core.tasks = make_tasks(n)
+        app.core.rebuild_indexes()
+
+        started = time.perf_counter()
+        app.update_task_table()
+        root.update_idletasks()
+        full_ms = (time.perf_counter() - started) * 1000
+
+        task = app.core.tasks[n // 2]
+        repeats = 100
+        started = time.perf_counter()
+        for _ in range(repeats):
+            task.completed = not task.completed
+            app.refresh_task_row(task)
+        root.update_idletasks()
+        row_ms = (time.perf_counter() - started) * 1000 / repeats
+
+        print(f"{n:>8} {full_ms:>24.2f} {row_ms:>17.3f}")
+        root.destroy()
+
+
+def bench_startup():
+    # Время до первой отрисовки и до первого экрана данных при разном размере tasks.json
+    import tkinter as tk
+    from Planner import PlannerApp, StartupTimer
+    from planner_core import PlannerCore
+
+    print(f"{'задач':>8} {'первая отрисовка, мс':>22} {'первый экран, мс':>18} {'вся история, мс':>17}")
+    for n in SIZES:
+        core = PlannerCore()
+        core.loaded = True
+        core.tasks = make_tasks(n)
+        core.save()
+        core.storage.close()
+
+        startup = StartupTimer()
+        root = tk.Tk()
+        app = PlannerApp(root, startup)
+        while not startup.finished:
+            root.update()
+        totals = {phase: total_ms for phase, _, total_ms in startup.phases}
+        print(f"{n:>8} {totals['первая отрисовка']:>22.1f} {totals['первый экран данных']:>18.1f} "
+              f"{totals['история загружена']:>17.1f}")
+        root.destroy()
+
+
+def bench_search():
+    from planner_core import Note
+    from search_index import SearchIndex
+
+    words = ["отчёт", "встреча", "книга", "пайтон", "проект", "заметка", "идея", "работа", "стратегия", "план"]
+    for n in (1000, 10000, 50000):
+        notes = [Note(f"{words[i % 10]} номер {i}\n" + " ".join(words[(i + k) % 10] for k in range(30)),
+                      "2025-01-01 10:00", "Работа" if i % 3 else "Личное") for i in range(n)]
+        index = SearchIndex()
+        started = time.perf_counter()
+        for note in notes:
+            index.add_note(note)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        for query in ("отч", "книга план", "номер 4242"):
+            started = time.perf_counter()
+            found = index.search(query, "Работа")
+            query_ms = (time.perf_counter() - started) * 1000
+            print(f"{n:>6} заметок: индекс {build_ms:8.1f} мс, '{query}' -> {len(found)} за {query_ms:.2f} мс")
+
+        started = time.perf_counter()
+        notes[0].text = "изменённая заметка"
+        index.add_note(notes[0])
+        print(f"{n:>6} заметок: обновление одной заметки {(time.perf_counter() - started) * 1000:.3f} мс")
+
+
+class DictTask:
+    # Прежняя модель задачи с __dict__ у каждого экземпляра — для сравнения
+    def __init__(self, title, due_date, category, comment, time_spent, importance, urgency, task_id):
+        self.id = task_id
+        self.title = title
+        self.due_date = due_date
+        self.due_at = datetime.strptime(due_date, "%Y-%m-%d %H:%M")
+        self.category = category
+        self.completed = False
+        self.comment = comment
+        self.time_spent = time_spent
+        self.importance = importance
+        self.urgency = urgency
+
+
+def bench_memory():
+    import tracemalloc
+    import uuid
+    from planner_core import Task
+
+    n = 100000
+    due = "2025-01-01 10:00"
+    ids = [uuid.uuid4().hex for _ in range(n)]
+    titles = [f"Задача {i}" for i in range(n)]
+    for cls in (DictTask, Task):
+        tracemalloc.start()
+        objects = [cls(titles[i], due, "Работа", "", 0, i % 2 == 0, i % 3 == 0, ids[i]) for i in range(n)]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{cls.__name__:>9}: {size / n:6.1f} байт на объект, {size / 2 ** 20:6.1f} МБ на {n} задач")
+        del objects
+
+
+def bench_report():
+    # Отчёт по столбцам: с NumPy и без него (модуль array)
+    import reports
+
+    numpy = reports.np
+    print(f"{'задач':>8} {'движок':>7} {'столбцы, мс':>12} {'отчёт, мс':>10}")
+    for n in SIZES + [1000000]:
+        tasks = make_tasks(n)
+        for i, task in enumerate(tasks[::3]):
+            task.completed = True
+            task.completed_at = time.time() - i % 100 * 86400
+        for engine in ([numpy] if numpy is not None else []) + [None]:
+            reports.np = engine
+            timing = reports.build_report(tasks)["timing_ms"]
+            print(f"{n:>8} {'numpy' if engine is not None else 'array':>7} {timing['columns']:>12.1f} "
+                  f"{timing['report']:>10.1f}")
+        del tasks
+    reports.np = numpy
+
+
+def bench_import():
+    # Импорт CSV в пустое хранилище и повторный импорт того же файла (все строки — дубликаты)
+    import exporter
+    import importer
+    from planner_core import PlannerCore
+
+    print(f"{'строк':>8} {'импорт, с':>10} {'строк/с':>9} {'повторно, с':>12} {'строк/с':>9}")
+    for n in [10000, 100000, 500000]:
+        os.chdir(tempfile.mkdtemp(prefix=f"import_{n}_"))
+        records = (("task", task.to_dict()) for task in make_tasks(n))
+        exporter.export(records, "tasks.csv", "csv")
+        row = []
+        for _ in range(2):
+            core = PlannerCore()
+            core.load()
+            stats = importer.import_file(core, "tasks.csv")
+            row.append(f"{stats.seconds:>10.1f} {stats.rate:>9.0f}")
+            core.storage.close()
+        print(f"{n:>8} {row[0]} {row[1]:>22}")
+
+
+def bench_views():
+    # Сортировка по столбцу и смена вида: первая сортировка строит индекс, дальше — готовый порядок
+    from planner_core import PlannerCore
+    from storage import JsonStorage
+    from views import DEFAULT_VIEWS
+
+    print(f"{'задач':>8} {'индекс, мс':>11} {'пересортировка, мс':>19} {'правка+сорт, мс':>16} {'смена вида, мс':>15}")
+    for n in SIZES:
+        core = PlannerCore(JsonStorage(os.path.join(tempfile.mkdtemp(prefix="views_"), "tasks.json")))
+        core.tasks = make_tasks(n)
+        core.rebuild_indexes()
+        now = core.tasks[n // 2].due_at
+        started = time.perf_counter()
+        core.views.task_ids(None, "title")
+        build_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        core.views.task_ids(None, "title", reverse=True)
+        resort_ms = (time.perf_counter() - started) * 1000
+        task = core.tasks[n // 3]
+        started = time.perf_counter()
+        for i in range(100):
+            task.title = f"Правка {i}"
+            core.views.changed("task", task.id, "put")
+            core.views.task_ids(None, "title")
+        edit_ms = (time.perf_counter() - started) * 1000 / 100
+        started = time.perf_counter()
+        for view in DEFAULT_VIEWS:
+            core.views.task_ids(view, view.sort, view.reverse, now=now)
+        view_ms = (time.perf_counter() - started) * 1000 / len(DEFAULT_VIEWS)
+        print(f"{n:>8} {build_ms:>11.1f} {resort_ms:>19.1f} {edit_ms:>16.2f} {view_ms:>15.1f}")
+
+
+def bench_archive():
+    # Три четверти задач выполнены давно: загрузка до и после архивации, первый поиск по архиву
+    # (чтение индекса) и восстановление одной записи
+    from planner_core import PlannerCore
+
+    print(f"{'задач':>8} {'загрузка, мс':>13} {'архивация, мс':>14} {'загрузка после, мс':>19} "
+          f"{'поиск, мс':>10} {'восстановление, мс':>19}")
+    for n in SIZES:
+        os.chdir(tempfile.mkdtemp(prefix=f"archive_{n}_"))
+        core = PlannerCore()
+        core.load()
+        tasks = make_tasks(n)
+        core.import_batch(tasks)
+        core.finish_import()
+        for task in tasks[n // 4:]:
+            task.completed = True
+            task.completed_at = task.updated_at = time.time() - 365 * 86400
+        core.save()
+        timings = []
+        for step in ("load", "archive", "load", "search", "restore"):
+            started = time.perf_counter()
+            if step == "load":
+                core = PlannerCore()
+                core.load()
+            elif step == "archive":
+                core.archive_old(90)
+                core.save()
+            elif step == "search":
+                found = core.archive.search(f"Задача {n - 1}")
+            else:
+                core.restore_archived([found[0]["id"]])
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"{n:>8} {timings[0]:>13.1f} {timings[1]:>14.1f} {timings[2]:>19.1f} {timings[3]:>10.1f} "
+              f"{timings[4]:>19.1f}")
+
+
+BENCHMARKS = {
+    "table": bench_table,
+    "startup": bench_startup,
+    "search": bench_search,
+    "memory": bench_memory,
+    "report": bench_report,
+    "import": bench_import,
+    "views": bench_views,
+    "archive": bench_archive,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    # Работаем во временной папке, чтобы не трогать настоящий tasks.json
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp(prefix="planner_bench_"))
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
-import json
 import os
+import sys
+
+from migrations import migrate_file
+from storage import CorruptDataError, migrate_json_to_sqlite
 
 
 def convert_old_to_new():
+    # Тонкая обёртка над migrations.py: те же шаги обновления, что и при загрузке, один потоковый проход
     input_file = "tasks_old.json"
     output_file = "tasks.json"
 
@@ -13,55 +17,38 @@ def convert_old_to_new():
         return
 
     try:
-        # Читаем старый файл
-        with open(input_file, "r", encoding="utf-8") as f:
-            old_data = json.load(f)
-
-        # Проверяем, что данные в формате словаря
-        if not isinstance(old_data, dict) or "tasks" not in old_data:
-            print(f"Ошибка: {input_file} не в ожидаемом формате (должен быть словарь с 'tasks')!")
-            return
-
-        # Преобразуем задачи, добавляя time_spent
-        tasks = []
-        for old_task in old_data.get("tasks", []):
-            task = {
-                "title": old_task["title"],
-                "due_date": old_task["due_date"],
-                "category": old_task.get("category", "Без категории"),
-                "comment": old_task.get("comment", ""),
-                "time_spent": 0,  # Добавляем недостающее поле
-                "completed": old_task.get("completed", False)
-            }
-            tasks.append(task)
-
-        # Заметки остаются без изменений
-        notes = old_data.get("notes", [])
-
-        # Категории берём из старого файла или используем дефолтные
-        categories = old_data.get("categories", ["Без категории", "Работа", "Личное", "Срочное"])
+        version, target, count = migrate_file(input_file, output_file)
+        print(f"Успешно преобразовано (версия формата {version} -> {target}, записей {count})! "
+              f"Данные из {input_file} сохранены в {output_file}")
+    except CorruptDataError as e:
+        print(f"Ошибка: Не удалось разобрать {e}")
+    except Exception as e:
+        print(f"Неизвестная ошибка: {e}")
 
-        # Формируем новый словарь с free_time_entries
-        new_data = {
-            "tasks": tasks,
-            "notes": notes,
-            "categories": categories,
-            "free_time_entries": []  # Добавляем пустой список
-        }
 
-        # Сохраняем в новый файл
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(new_data, f, ensure_ascii=False, indent=4)
+def convert_json_to_sqlite():
+    input_file = "tasks.json"
+    output_file = "tasks.db"
 
-        print(f"Успешно преобразовано! Данные из {input_file} сохранены в {output_file}")
+    if os.path.exists(output_file):
+        print(f"Ошибка: {output_file} уже существует, перенос не выполнен!")
+        return
 
-    except json.JSONDecodeError as e:
-        print(f"Ошибка: Не удалось разобрать {input_file}: {e}")
-    except KeyError as e:
-        print(f"Ошибка: В {input_file} отсутствует обязательное поле {e}")
+    try:
+        data = migrate_json_to_sqlite(input_file, output_file)
+        print(f"Успешно перенесено: задач {len(data['tasks'])}, заметок {len(data['notes'])}. "
+              f"Данные из {input_file} сохранены в {output_file}")
+        print(f"Файл {input_file} можно оставить как резервную копию, планировщик теперь работает с {output_file}")
+    except CorruptDataError as e:
+        print(f"Ошибка: Не удалось разобрать {e}")
     except Exception as e:
         print(f"Неизвестная ошибка: {e}")
 
 
 if __name__ == "__main__":
-    convert_old_to_new()
\ No newline at end of file
+    # python convert_tasks.py          — tasks_old.json -> tasks.json
+    # python convert_tasks.py --sqlite — tasks.json -> tasks.db
+    if "--sqlite" in sys.argv[1:]:
+        convert_json_to_sqlite()
+    else:
+        convert_old_to_new()
\ No newline at end of file
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# Потоковый экспорт задач, заметок и записей «работы вне плана» в CSV, JSON Lines и iCalendar.
+# Записи пишутся по одной: словарь строится, записывается и забывается, так что память не растёт
+# с размером экспорта. Файл пишется во временный и заменяет целевой только после успешного окончания.
+# Без Tk: из окна экспорт запускается в фоновом потоке, из planner_cli.py export — напрямую.
+import csv
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+
+from storage import match_task, task_quadrant
+
+FORMATS = ("csv", "jsonl", "ics")
+KINDS = ("task", "note", "free_time")
+PROGRESS_EVERY = 1000  # Как часто (в записях) сообщать о ходе экспорта
+
+# Столбцы полного CSV: объединение полей всех видов записей; пустая ячейка — у записи нет такого поля
+CSV_FIELDS = ("kind", "id", "title", "due_date", "category", "comment", "time_spent", "completed", "completed_at",
+              "importance", "urgency", "updated_at", "text", "date", "description")
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportFilter:
+    # date_from / date_to — "ГГГГ-ММ-ДД" (включительно) или "ГГГГ-ММ-ДД ЧЧ:ММ": у задач по сроку, у заметок
+    # и записей времени — по дате. category — только записи этой категории (у записей времени категории нет).
+    # status — "open" или "done": отбирает задачи, заметки и записи времени при этом не выгружаются
+    def __init__(self, date_from=None, date_to=None, category=None, status=None, kinds=KINDS):
+        self.date_from = date_from
+        self.date_to = date_to + " 23:59" if date_to and len(date_to) == 10 else date_to
+        self.category = category
+        self.completed = {"open": False, "done": True}[status] if status else None
+        self.kinds = set(kinds)
+
+    def accepts(self, kind, record):
+        if kind not in self.kinds:
+            return False
+        if kind == "task":
+            return match_task(record, self.category, self.completed, None, self.date_from, self.date_to)
+        if self.completed is not None:
+            return False
+        if self.category is not None and record.get("category") != self.category:
+            return False
+        date = record.get("date", "")
+        if self.date_from is not None and date < self.date_from:
+            return False
+        if self.date_to is not None and date > self.date_to:
+            return False
+        return True
+
+
+def core_records(core):
+    # Источник записей модели: списки ссылок копируются сразу (вызывать в потоке, который владеет моделью),
+    # словари записей строятся по одному во время обхода. Возвращает (итератор (вид, запись), сколько записей)
+    tasks = list(core.tasks)
+    notes = list(core.notes)
+    entries = list(core.free_time_entries)
+
+    def records():
+        for task in tasks:
+            yield "task", task.to_dict()
+        for note in notes:
+            yield "note", note.to_dict()
+        for entry in entries:
+            yield "free_time", dict(entry)
+
+    return records(), len(tasks) + len(notes) + len(entries)
+
+
+def export(records, path, fmt="csv", export_filter=None, total=None, progress=None, cancel=None):
+    # records — итератор (вид, запись); progress(обработано, всего) вызывается из того же потока;
+    # cancel — threading.Event: экспорт прерывается, целевой файл не трогается.
+    # Возвращает число выгруженных записей
+    if fmt not in FORMATS:
+        raise ValueError(f"неизвестный формат: {fmt}")
+    export_filter = export_filter or ExportFilter()
+    writer_class = {"csv": CsvWriter, "jsonl": JsonlWriter, "ics": IcsWriter}[fmt]
+    tmp_path = path + ".tmp"
+    written = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = writer_class(f)
+            writer.begin()
+            for seen, (kind, record) in enumerate(records, 1):
+                if export_filter.accepts(kind, record):
+                    writer.write(kind, record)
+                    written += 1
+                if seen % PROGRESS_EVERY == 0:
+                    if cancel is not None and cancel.is_set():
+                        raise ExportCancelled()
+                    if progress:
+                        progress(seen, total)
+            writer.end()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if progress:
+        progress(total, total)
+    return written
+
+
+class CsvWriter:
+    def __init__(self, f):
+        self.writer = csv.DictWriter(f, CSV_FIELDS, extrasaction="ignore")
+
+    def begin(self):
+        self.writer.writeheader()
+
+    def write(self, kind, record):
+        self.writer.writerow(dict(record, kind=kind))
+
+    def end(self):
+        pass
+
+
+class JsonlWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def begin(self):
+        pass
+
+    def write(self, kind, record):
+        self.f.write(json.dumps(dict(record, kind=kind), ensure_ascii=False) + "\n")
+
+    def end(self):
+        pass
+
+
+# Квадрант Эйзенхауэра -> PRIORITY в iCalendar (1 — наивысший, 9 — наименьший)
+ICS_PRIORITY = {1: 1, 2: 3, 3: 5, 4: 9}
+
+
+def ics_escape(value):
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def ics_local(value):
+    # "ГГГГ-ММ-ДД ЧЧ:ММ" -> локальное («плавающее») время iCalendar
+    return value[:4] + value[5:7] + value[8:10] + "T" + value[11:13] + value[14:16] + "00"
+
+
+def ics_utc(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+class IcsWriter:
+    # Задачи — VTODO, заметки и записи «работы вне плана» — VJOURNAL. Поля, которых нет в стандарте
+    # (важность, срочность, затраченное время), идут в свойствах X-PLANNER-*
+    def __init__(self, f):
+        self.f = f
+        self.stamp = ics_utc(datetime.now(timezone.utc).timestamp())
+
+    def line(self, name, value):
+        # Строки длиннее 75 байт переносятся (RFC 5545, 3.1): продолжение начинается с пробела
+        data = f"{name}:{value}".encode("utf-8")
+        while len(data) > 75:
+            cut = 75
+            while data[cut] & 0xC0 == 0x80:  # Не режем символ UTF-8 посередине
+                cut -= 1
+            self.f.write(data[:cut].decode("utf-8") + "\r\n")
+            data = b" " + data[cut:]
+        self.f.write(data.decode("utf-8") + "\r\n")
+
+    def begin(self):
+        self.line("BEGIN", "VCALENDAR")
+        self.line("VERSION", "2.0")
+        self.line("PRODID", "-//Planner//RU")
+
+    def write(self, kind, record):
+        if kind == "task":
+            self.write_task(record)
+        else:
+            self.write_journal(kind, record)
+
+    def write_task(self, record):
+        self.line("BEGIN", "VTODO")
+        self.line("UID", f"{record['id']}@planner")
+        self.line("DTSTAMP", ics_utc(record["updated_at"]) if record.get("updated_at") else self.stamp)
+        self.line("SUMMARY", ics_escape(record["title"]))
+        self.line("DUE", ics_local(record["due_date"]))
+        self.line("CATEGORIES", ics_escape(record.get("category", "")))
+        if record.get("comment"):
+            self.line("DESCRIPTION", ics_escape(record["comment"]))
+        self.line("PRIORITY", ICS_PRIORITY[task_quadrant(record)])
+        if record.get("completed"):
+            self.line("STATUS", "COMPLETED")
+            if record.get("completed_at"):
+                self.line("COMPLETED", ics_utc(record["completed_at"]))
+        else:
+            self.line("STATUS", "NEEDS-ACTION")
+        self.line("X-PLANNER-IMPORTANCE", int(bool(record.get("importance"))))
+        self.line("X-PLANNER-URGENCY", int(bool(record.get("urgency"))))
+        self.line("X-PLANNER-TIME-SPENT", record.get("time_spent", 0))
+        self.line("END", "VTODO")
+
+    def write_journal(self, kind, record):
+        self.line("BEGIN", "VJOURNAL")
+        if kind == "note":
+            self.line("UID", f"{record['id']}@planner")
+            self.line("DTSTAMP", ics_utc(record["updated_at"]) if record.get("updated_at") else self.stamp)
+            self.line("SUMMARY", ics_escape(record["text"].split("\n", 1)[0]))
+            self.line("DESCRIPTION", ics_escape(record["text"]))
+            self.line("CATEGORIES", ics_escape(record.get("category", "")))
+        else:
+            # У записей времени нет id: UID собираем из даты и описания, чтобы повторный экспорт совпадал
+            crc = zlib.crc32(record["description"].encode("utf-8"))
+            self.line("UID", f"free-{ics_local(record['date'])}-{crc:08x}@planner")
+            self.line("DTSTAMP", self.stamp)
+            self.line("SUMMARY", ics_escape(record["description"]))
+            self.line("X-PLANNER-KIND", "free_time")
+            self.line("X-PLANNER-TIME-SPENT", record.get("time_spent", 0))
+        self.line("DTSTART", ics_local(record["date"]))
+        self.line("END", "VJOURNAL")
+
+    def end(self):
+        self.line("END", "VCALENDAR")
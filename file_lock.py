@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+
+class FileLock:
+    # Рекомендательная блокировка через отдельный файл (tasks.json.lock) для нескольких процессов.
+    # fcntl.flock различает общую (чтение) и исключительную (запись) блокировки; на Windows
+    # msvcrt.locking умеет только исключительную, поэтому там чтение тоже ждёт писателя.
+    # Внутри одного процесса потоки нужно разводить отдельно (threading.Lock) — flock этого не делает.
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def shared(self):
+        with self._locked(fcntl.LOCK_SH if fcntl else None):
+            yield
+
+    @contextmanager
+    def exclusive(self):
+        with self._locked(fcntl.LOCK_EX if fcntl else None):
+            yield
+
+    @contextmanager
+    def _locked(self, mode):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, mode)
+            elif msvcrt:
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)  # Сам повторяет попытки около 10 секунд
+                        break
+                    except OSError:
+                        continue
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            elif msvcrt:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            os.close(fd)
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+# Потоковый импорт задач, заметок и записей «работы вне плана» из CSV (свой полный формат и старый
+# planner_export.csv), JSON Lines, iCalendar и tasks.json старого формата (tasks_old.json).
+# Записи читаются по одной; в памяти держатся только текущая пачка и множество хешей содержимого,
+# по которому отсеиваются дубликаты — и уже существующие задачи, и повторы внутри файла.
+# Без Tk: разбор можно вести в фоновом потоке, а пачки применять (PlannerCore.import_batch,
+# в конце — finish_import) в потоке модели.
+import csv
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+
+from planner_core import Note, Task
+from storage import iter_snapshot
+
+FORMATS = ("csv", "jsonl", "ics", "json")
+BATCH_SIZE = 5000  # Записей в пачке: одна запись в журнал (одна транзакция SQLite) на пачку
+LEGACY_CSV_KINDS = {"Задача": "task", "Заметка": "note"}
+SNAPSHOT_KINDS = {"tasks": "task", "notes": "note", "free_time_entries": "free_time", "categories": "category"}
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0  # Прочитано записей
+        self.tasks = 0
+        self.notes = 0
+        self.free_time = 0
+        self.duplicates = 0
+        self.skipped = 0  # Записи без обязательных полей или с неверной датой
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def imported(self):
+        return self.tasks + self.notes + self.free_time
+
+    @property
+    def rate(self):
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"Прочитано {self.read}, добавлено задач {self.tasks}, заметок {self.notes}, "
+                f"записей времени {self.free_time}; дубликатов {self.duplicates}, пропущено {self.skipped}. "
+                f"{self.seconds:.1f} с, {self.rate:.0f} записей/с")
+
+
+class ImportBatch:
+    def __init__(self):
+        self.tasks = []
+        self.notes = []
+        self.free_time_entries = []
+        self.categories = []  # Новые категории
+
+    def __len__(self):
+        return len(self.tasks) + len(self.notes) + len(self.free_time_entries)
+
+
+# --- ключи дедупликации: содержимое, а не id (у одной и той же задачи в разных файлах id разные).
+# Кортеж целиком, а не его hash(): совпадение хешей разных записей молча отбросило бы одну как дубликат.
+# Строки в кортежах — те же объекты, что в задачах и заметках, копий текста не появляется ---
+
+def task_key(title, due_date, category):
+    return ("task", title, due_date, category)
+
+
+def note_key(text, date, category):
+    return ("note", text, date, category)
+
+
+def note_title_key(title, date, category):
+    # Старый CSV хранит у заметки только первую строку: сравнивать с ним можно лишь по заголовку
+    return ("note_title", title, date, category)
+
+
+def free_time_key(entry):
+    return ("free_time", entry["date"], entry["description"], entry["time_spent"])
+
+
+# --- приведение полей ---
+
+def normalize_date(value, day_end=True):
+    # "ГГГГ-ММ-ДД ЧЧ:ММ[:СС]", "ГГГГ-ММ-ДДTЧЧ:ММ" или "ГГГГ-ММ-ДД" -> "ГГГГ-ММ-ДД ЧЧ:ММ".
+    # Дата без времени — конец дня для сроков задач, начало дня для заметок
+    value = str(value or "").strip()
+    if len(value) == 10:
+        return value + (" 23:59" if day_end else " 00:00")
+    if len(value) >= 16 and value[10] in " T":
+        return value[:10] + " " + value[11:16]
+    return None
+
+
+def truthy(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "да", "выполнено")
+    return bool(value)
+
+
+def number(value, kind=int):
+    try:
+        return kind(float(value)) if value not in (None, "") else kind(0)
+    except (TypeError, ValueError):
+        return kind(0)
+
+
+def make_task(record):
+    # Словарь из любого источника -> Task; None — запись не годится
+    title = str(record.get("title") or "")
+    due_date = normalize_date(record.get("due_date"))
+    if not title.strip() or due_date is None:
+        return None
+    try:
+        task = Task(title, due_date, record.get("category") or "Без категории", record.get("comment") or "",
+                    number(record.get("time_spent")), truthy(record.get("importance")),
+                    truthy(record.get("urgency")), record.get("id") or None)
+    except ValueError:
+        return None
+    task.completed = truthy(record.get("completed"))
+    task.completed_at = number(record.get("completed_at"), float)
+    return task
+
+
+def make_note(record):
+    text = str(record.get("text") or record.get("title") or "")
+    date = normalize_date(record.get("date") or record.get("due_date"), day_end=False)
+    if not text.strip() or date is None:
+        return None
+    try:
+        datetime.strptime(date, "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+    return Note(text, date, record.get("category") or "Без категории", record.get("id") or None)
+
+
+def make_free_time(record):
+    date = normalize_date(record.get("date"), day_end=False)
+    description = str(record.get("description") or record.get("title") or "")
+    if date is None or not description.strip():
+        return None
+    return {"date": date, "description": description, "time_spent": number(record.get("time_spent"))}
+
+
+# --- чтение форматов: каждый читатель отдаёт (вид, словарь) по одной записи ---
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in ("ics", "ical", "ifb"):
+        return "ics"
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension in FORMATS:
+        return extension
+    raise ValueError(f"не удалось определить формат файла {path}, укажите его явно")
+
+
+def read_records(path, fmt=None):
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"неизвестный формат: {fmt}")
+    return {"csv": read_csv, "jsonl": read_jsonl, "ics": read_ics, "json": read_snapshot}[fmt](path)
+
+
+def read_csv(path):
+    # utf-8-sig: CSV, сохранённый из Excel, начинается с BOM
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        legacy = bool(reader.fieldnames) and reader.fieldnames[0] == "Тип"
+        for row in reader:
+            if legacy:
+                # Старый экспорт: Тип, Название, Срок/Дата, Категория, Статус; у заметки в названии — её заголовок
+                kind = LEGACY_CSV_KINDS.get(row.get("Тип"))
+                if kind is None:
+                    yield None, row
+                    continue
+                yield kind, {"title": row.get("Название"), "text": row.get("Название"),
+                             "due_date": row.get("Срок/Дата"), "date": row.get("Срок/Дата"),
+                             "category": row.get("Категория"), "completed": row.get("Статус") == "Выполнено",
+                             "title_only": True}
+            else:
+                yield row.get("kind") or "task", row
+
+
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield None, line
+                continue
+            if isinstance(record, dict):
+                yield record.get("kind") or "task", record
+            else:
+                yield None, record
+
+
+def read_snapshot(path):
+    # tasks.json любого поколения, в том числе tasks_old.json без time_spent и id
+    for key, value in iter_snapshot(path):
+        kind = SNAPSHOT_KINDS.get(key)
+        if kind is not None:
+            yield kind, value
+
+
+# --- iCalendar ---
+
+ICS_UNESCAPE_RE = re.compile(r"\\([\\;,nN])")
+ICS_SPLIT_RE = re.compile(r"(?<!\\),")
+
+
+def ics_unescape(value):
+    return ICS_UNESCAPE_RE.sub(lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+
+def ics_date(value, day_end=True):
+    # 20250324T102000, 20250324T102000Z (UTC -> местное время) или 20250324 -> "ГГГГ-ММ-ДД ЧЧ:ММ".
+    # TZID не учитываем: такое время считаем местным
+    value = value.strip()
+    if len(value) == 8:
+        return f"{value[:4]}-{value[4:6]}-{value[6:8]}" + (" 23:59" if day_end else " 00:00")
+    if len(value) >= 13 and value[8] == "T":
+        if value.endswith("Z"):
+            moment = datetime.strptime(value[:15], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc).astimezone()
+            return moment.strftime("%Y-%m-%d %H:%M")
+        return f"{value[:4]}-{value[4:6]}-{value[6:8]} {value[9:11]}:{value[11:13]}"
+    return None
+
+
+def ics_timestamp(value):
+    try:
+        return datetime.strptime(value.strip()[:15], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def ics_lines(f):
+    # Склейка перенесённых строк (RFC 5545, 3.1): продолжение начинается с пробела или табуляции
+    current = None
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def ics_property(line):
+    # "NAME;PARAM=...:value" -> (NAME, {PARAM: ...}, value); двоеточие в кавычках параметра не разделитель
+    quoted = False
+    for i, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ":" and not quoted:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return None, {}, ""
+    name, *params = head.split(";")
+    return name.upper(), dict(param.partition("=")[::2] for param in params), value
+
+
+# PRIORITY iCalendar (1 — наивысший, 0 — не задан) -> (важность, срочность); обратное отображению в exporter.py
+def ics_quadrant(priority):
+    priority = number(priority)
+    if 1 <= priority <= 2:
+        return True, True
+    if 3 <= priority <= 4:
+        return True, False
+    if 5 <= priority <= 6:
+        return False, True
+    return False, False
+
+
+def read_ics(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        component = None
+        props = {}
+        for line in ics_lines(f):
+            name, params, value = ics_property(line)
+            if name == "BEGIN" and value.upper() in ("VTODO", "VJOURNAL", "VEVENT"):
+                component = value.upper()
+                props = {}
+            elif name == "END" and value.upper() == component:
+                yield ics_record(component, props)
+                component = None
+            elif component is not None and name and name not in props:
+                props[name] = (params, value)
+
+
+def ics_record(component, props):
+    def text(name):
+        return ics_unescape(props[name][1]) if name in props else ""
+
+    def date(name, day_end=True):
+        return ics_date(props[name][1], day_end) if name in props else None
+
+    categories = ICS_SPLIT_RE.split(props["CATEGORIES"][1]) if "CATEGORIES" in props else [""]
+    category = ics_unescape(categories[0]) or "Без категории"
+    if component == "VJOURNAL":
+        if text("X-PLANNER-KIND") == "free_time":
+            return "free_time", {"date": date("DTSTART", False), "description": text("SUMMARY"),
+                                 "time_spent": text("X-PLANNER-TIME-SPENT")}
+        uid = text("UID")
+        return "note", {"id": uid[:-len("@planner")] if uid.endswith("@planner") else None,
+                        "text": text("DESCRIPTION") or text("SUMMARY"), "date": date("DTSTART", False),
+                        "category": category}
+    # VTODO — задача; у VEVENT срока нет, берём начало события
+    importance, urgency = ics_quadrant(text("PRIORITY"))
+    if "X-PLANNER-IMPORTANCE" in props:
+        importance, urgency = truthy(text("X-PLANNER-IMPORTANCE")), truthy(text("X-PLANNER-URGENCY"))
+    uid = text("UID")
+    return "task", {"id": uid[:-len("@planner")] if uid.endswith("@planner") else None,
+                    "title": text("SUMMARY"), "due_date": date("DUE") or date("DTSTART"), "category": category,
+                    "comment": text("DESCRIPTION"), "time_spent": text("X-PLANNER-TIME-SPENT"),
+                    "completed": text("STATUS").upper() == "COMPLETED" or "COMPLETED" in props,
+                    "completed_at": ics_timestamp(props["COMPLETED"][1]) if "COMPLETED" in props else 0.0,
+                    "importance": importance, "urgency": urgency}
+
+
+# --- импорт ---
+
+class Importer:
+    # Создаётся в потоке, который владеет моделью (снимает с неё множества хешей, id и категорий);
+    # batches() затем можно выполнять в любом потоке — модель он не трогает
+    def __init__(self, core, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.keys = {task_key(task.title, task.due_date, task.category) for task in core.tasks}
+        self.keys.update(note_key(note.text, note.date, note.category) for note in core.notes)
+        self.keys.update(note_title_key(note.title, note.date, note.category) for note in core.notes)
+        self.keys.update(free_time_key(entry) for entry in core.free_time_entries)
+        self.ids = set(core.task_index)
+        self.ids.update(core.note_index)
+        self.categories = set(core.categories)
+        self.stats = ImportStats()
+
+    def batches(self, path, fmt=None, cancel=None):
+        # Пачки ImportBatch; cancel — threading.Event, прерывает импорт между пачками
+        batch = ImportBatch()
+        for kind, record in read_records(path, fmt):
+            self.add(batch, kind, record)
+            if len(batch) >= self.batch_size:
+                self.stats.seconds = time.perf_counter() - self.stats.started
+                yield batch
+                if cancel is not None and cancel.is_set():
+                    return
+                batch = ImportBatch()
+        self.stats.seconds = time.perf_counter() - self.stats.started
+        if len(batch) or batch.categories:
+            yield batch
+
+    def add(self, batch, kind, record):
+        if kind == "category":
+            if isinstance(record, str) and record not in self.categories:
+                self.categories.add(record)
+                batch.categories.append(record)
+            return
+        self.stats.read += 1
+        if kind == "task":
+            item = make_task(record)
+            key = item and task_key(item.title, item.due_date, item.category)
+        elif kind == "note":
+            item = make_note(record)
+            if item is not None and record.get("title_only"):
+                key = note_title_key(item.title, item.date, item.category)
+            else:
+                key = item and note_key(item.text, item.date, item.category)
+        elif kind == "free_time":
+            item = make_free_time(record)
+            key = item and free_time_key(item)
+        else:
+            item = None
+        if item is None:
+            self.stats.skipped += 1
+            return
+        if key in self.keys:
+            self.stats.duplicates += 1
+            return
+        self.keys.add(key)
+        if kind == "note":
+            self.keys.add(note_title_key(item.title, item.date, item.category))  # Для строк старого CSV дальше
+        if kind == "free_time":
+            batch.free_time_entries.append(item)
+            self.stats.free_time += 1
+            return
+        # Свой id сохраняем, только если он ещё не занят; иначе запись получает новый
+        if item.id in self.ids:
+            item.id = uuid.uuid4().hex
+        self.ids.add(item.id)
+        if item.category not in self.categories:
+            self.categories.add(item.category)
+            batch.categories.append(item.category)
+        if kind == "task":
+            batch.tasks.append(item)
+            self.stats.tasks += 1
+        else:
+            batch.notes.append(item)
+            self.stats.notes += 1
+
+
+def import_file(core, path, fmt=None, progress=None):
+    # Импорт без окна: пачки применяются сразу. progress(stats) — после каждой пачки
+    importer = Importer(core)
+    for batch in importer.batches(path, fmt):
+        core.import_batch(batch.tasks, batch.notes, batch.free_time_entries, batch.categories)
+        if progress:
+            progress(importer.stats)
+    core.finish_import()
+    importer.stats.seconds = time.perf_counter() - importer.stats.started
+    return importer.stats
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Версии формата tasks.json. В файле хранится schema_version (первым ключом), а каждый шаг обновления
+# зарегистрирован здесь со своим номером. Шаги работают над отдельными записями, поэтому все нужные
+# применяются за один потоковый проход: запись прочитана, обновлена всеми шагами и сразу записана.
+# Файл переписывается атомарно и один раз — дальше загрузка не латает старые записи при каждом запуске.
+import uuid
+
+from storage import DEFAULT_CATEGORIES, LIST_KEYS, atomic_json, iter_snapshot
+
+
+class Migration:
+    def __init__(self, version, description, step):
+        self.version = version  # Версия формата после этого шага
+        self.description = description
+        self.step = step  # step(ключ, элемент) -> элемент; меняет запись на месте
+
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    # Регистрация шага; шаги применяются по возрастанию версии
+    def register(step):
+        if any(existing.version == version for existing in MIGRATIONS):
+            raise ValueError(f"версия {version} уже зарегистрирована")
+        MIGRATIONS.append(Migration(version, description, step))
+        MIGRATIONS.sort(key=lambda item: item.version)
+        return step
+    return register
+
+
+@migration(1, "затраченное время у задач, список free_time_entries")
+def add_time_spent(key, value):
+    # Бывший convert_tasks.py. Недостающие списки (free_time_entries) добавляет сам проход
+    if key == "tasks":
+        value.setdefault("time_spent", 0)
+    return value
+
+
+@migration(2, "постоянные id у задач и заметок")
+def add_ids(key, value):
+    # Раньше id выдавались при каждой загрузке файла, в котором их не было
+    if key in ("tasks", "notes") and not value.get("id"):
+        value["id"] = uuid.uuid4().hex
+    return value
+
+
+TASK_DEFAULTS = {"category": "Без категории", "comment": "", "time_spent": 0, "completed": False,
+                 "importance": False, "urgency": False, "updated_at": 0.0, "completed_at": 0.0}
+NOTE_DEFAULTS = {"category": "Без категории", "updated_at": 0.0}
+
+
+@migration(3, "все поля задач и заметок заполнены явно")
+def fill_defaults(key, value):
+    defaults = TASK_DEFAULTS if key == "tasks" else NOTE_DEFAULTS if key == "notes" else None
+    if defaults:
+        for name, default in defaults.items():
+            value.setdefault(name, default)
+    return value
+
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def pending(version):
+    return [item for item in MIGRATIONS if item.version > version]
+
+
+def migrate_pairs(pairs):
+    # (ключ, элемент) в порядке iter_snapshot -> те же пары в текущей версии. Версию источника задаёт
+    # первая пара schema_version; её нет — файл старше версий (0). schema_version отдаётся первой
+    pairs = iter(pairs)
+    first = next(pairs, None)
+    version = 0
+    if first is not None:
+        if first[0] == "schema_version":
+            version = first[1]
+        else:
+            pairs = _chain(first, pairs)
+    yield "schema_version", SCHEMA_VERSION
+    steps = [item.step for item in pending(version)]
+    for key, value in pairs:
+        if key == "schema_version":
+            continue  # Версия не первым ключом (файл правили вручную) — её заменила текущая
+        if steps and isinstance(value, dict):
+            for step in steps:
+                value = step(key, value)
+        yield key, value
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def migrate_data(data):
+    # Словарь, уже загруженный целиком (резервная копия прежнего формата), — на месте
+    version = data.get("schema_version", 0)
+    for item in pending(version):
+        for key in LIST_KEYS:
+            data[key] = [item.step(key, value) if isinstance(value, dict) else value for value in data.get(key, [])]
+    data["schema_version"] = SCHEMA_VERSION
+    return data
+
+
+def file_version(path):
+    # Версия формата файла по первой паре, без чтения остального; None — файла нет или он пуст
+    for key, value in iter_snapshot(path):
+        return value if key == "schema_version" else 0
+    return None
+
+
+def migrate_file(path, output=None):
+    # Один потоковый проход: путь -> output (по умолчанию на место path), запись через временный файл.
+    # Память не зависит от размера файла. Возвращает (версия была, версия стала, записей)
+    version = file_version(path)
+    if version is None:
+        version = 0
+    count = 0
+    seen = set()
+    with atomic_json(output or path) as writer:
+        for key, value in migrate_pairs(iter_snapshot(path)):
+            if key in LIST_KEYS:
+                writer.item(key, value)
+                seen.add(key)
+                count += 1
+            else:
+                writer.value(key, value)
+        # Пустые и отсутствовавшие списки в потоке не видны — дописываем их, чтобы формат был полным
+        for key in LIST_KEYS:
+            if key not in seen:
+                writer.value(key, list(DEFAULT_CATEGORIES) if key == "categories" else [])
+    return version, SCHEMA_VERSION, count
@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+# Локальный HTTP/JSON API планировщика на asyncio (только stdlib, только 127.0.0.1).
+#
+#   GET  /api/tasks?offset=0&limit=50&status=open|done|all&category=...   список задач по страницам
+#                  &sort=due|-due|title|...                                  порядок (views.TASK_SORT_KEYS)
+#   GET  /api/notes?offset=0&limit=50&category=...                         список заметок
+#   GET  /api/search?q=...&category=...&limit=20                           поиск
+#   POST /api/tasks            {"title", "due_date", "category", "comment", "importance", "urgency"}
+#   POST /api/tasks/<id>/complete
+#   GET  /api/pomodoro                                                     состояние таймера
+#   GET  /api/changes?since=<версия>&timeout=25                            long-poll изменений
+#   GET  /api/events                                                       то же через SSE
+#
+# Сервер работает в своём потоке со своим циклом asyncio. Модель (PlannerCore) трогает только поток Tk:
+# запросы передаются туда через TkBridge и выполняются пачками, поэтому окно не ждёт сети,
+# а сеть не ждёт ничего, кроме короткого обращения к модели. Без окна (planner_cli.py serve)
+# модель принадлежит потоку asyncio, и функции вызываются напрямую.
+import asyncio
+import concurrent.futures
+import json
+import queue
+import threading
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+from planner_core import parse_due
+from views import TASK_SORT_KEYS, TaskView
+
+DEFAULT_PORT = 8765
+MAX_HEADER = 64 * 1024
+MAX_BODY = 1024 * 1024
+MAX_PAGE = 500
+KEEPALIVE_SECONDS = 15  # Пустое событие SSE, чтобы прокси и клиенты не рвали соединение
+
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class TkBridge:
+    # Очередь вызовов в поток Tk. Tk не потокобезопасен, поэтому очередь разбирает сам поток Tk
+    # по root.after: часто, пока идут запросы, и редко, когда их нет.
+    BUSY_MS = 5
+    IDLE_MS = 100
+
+    def __init__(self, root):
+        self.root = root
+        self.calls = queue.SimpleQueue()
+        self.after_id = self.root.after(self.IDLE_MS, self._drain)
+
+    def submit(self, fn):
+        future = concurrent.futures.Future()
+        self.calls.put((fn, future))
+        return future
+
+    def _drain(self):
+        handled = 0
+        while True:
+            try:
+                fn, future = self.calls.get_nowait()
+            except queue.Empty:
+                break
+            handled += 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+        self.after_id = self.root.after(self.BUSY_MS if handled else self.IDLE_MS, self._drain)
+
+    def close(self):
+        self.root.after_cancel(self.after_id)
+
+
+def task_json(task, now=None):
+    data = task.to_dict()
+    data["priority"] = task.priority
+    data["overdue"] = not task.completed and task.due_at < (now or datetime.now())
+    return data
+
+
+def note_json(note):
+    data = note.to_dict()
+    data["title"] = note.title
+    return data
+
+
+def int_param(params, name, default, low=0, high=None):
+    try:
+        value = int(params.get(name, [default])[0])
+    except ValueError:
+        raise HttpError(400, f"{name}: ожидалось целое число")
+    value = max(low, value)
+    return min(value, high) if high is not None else value
+
+
+class PlannerApiServer:
+    def __init__(self, core, bridge=None, pomodoro_state=None, on_task_saved=None, host="127.0.0.1",
+                 port=DEFAULT_PORT):
+        self.core = core
+        self.bridge = bridge  # None — модель живёт в потоке asyncio
+        self.pomodoro_state = pomodoro_state  # Функция без аргументов -> словарь или None
+        self.on_task_saved = on_task_saved  # Функция (задача, добавлена ли) — окно обновляет таблицу и напоминания
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.server = None
+        self.change_event = None
+        self.thread = None
+
+    # --- доступ к модели ---
+
+    async def call(self, fn):
+        if self.bridge is None:
+            return fn()
+        return await asyncio.wrap_future(self.bridge.submit(fn))
+
+    def on_core_changed(self, version):
+        # Вызывается в потоке модели; будим ожидающих long-poll и SSE в потоке asyncio
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        event, self.change_event = self.change_event, asyncio.Event()
+        event.set()
+
+    # --- запуск ---
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.change_event = asyncio.Event()
+        self.core.listeners.append(self.on_core_changed)
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  # Если просили порт 0
+
+    def start_in_thread(self):
+        # Для окна: свой поток и свой цикл asyncio; возвращается, когда порт уже слушается
+        started = threading.Event()
+
+        def run():
+            async def main():
+                await self.start()
+                started.set()
+                async with self.server:
+                    await self.server.serve_forever()
+            try:
+                asyncio.run(main())
+            except asyncio.CancelledError:
+                pass
+
+        self.thread = threading.Thread(target=run, name="planner-api", daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def stop(self):
+        if self.on_core_changed in self.core.listeners:
+            self.core.listeners.remove(self.on_core_changed)
+        if self.loop is not None and self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+    # --- HTTP ---
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self.send_json(writer, 413, {"error": "слишком длинные заголовки"}, False)
+                    return
+                if len(head) > MAX_HEADER:
+                    await self.send_json(writer, 413, {"error": "слишком длинные заголовки"}, False)
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self.send_json(writer, 400, {"error": "неверная строка запроса"}, False)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    await self.send_json(writer, 400, {"error": "неверный Content-Length"}, False)
+                    return
+                if length > MAX_BODY:
+                    await self.send_json(writer, 413, {"error": "слишком большое тело запроса"}, False)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+                # Клиенты вроде curl шлют кириллицу в адресе без %-кодирования, как UTF-8
+                url = urlsplit(target.encode("latin-1").decode("utf-8", "replace"))
+                if method == "GET" and url.path == "/api/events":
+                    await self.stream_events(writer, parse_qs(url.query))
+                    return
+                try:
+                    status, payload = await self.route(method, url.path, parse_qs(url.query), body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                await self.send_json(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def send_json(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+    async def route(self, method, path, params, body):
+        parts = [part for part in path.split("/") if part]
+        if parts[:1] != ["api"]:
+            raise HttpError(404, "нет такого адреса")
+        parts = parts[1:]
+        if parts == ["tasks"] and method == "GET":
+            return 200, await self.call(lambda: self.list_tasks(params))
+        if parts == ["tasks"] and method == "POST":
+            data = self.parse_body(body)
+            return 201, await self.call(lambda: self.create_task(data))
+        if len(parts) == 3 and parts[0] == "tasks" and parts[2] == "complete" and method == "POST":
+            return 200, await self.call(lambda: self.complete_task(parts[1]))
+        if parts == ["notes"] and method == "GET":
+            return 200, await self.call(lambda: self.list_notes(params))
+        if parts == ["search"] and method == "GET":
+            return 200, await self.call(lambda: self.search(params))
+        if parts == ["pomodoro"] and method == "GET":
+            return 200, await self.call(self.pomodoro)
+        if parts == ["changes"] and method == "GET":
+            return 200, await self.wait_changes(params)
+        if parts and parts[0] in ("tasks", "notes", "search", "pomodoro", "changes"):
+            raise HttpError(405, "метод не поддерживается")
+        raise HttpError(404, "нет такого адреса")
+
+    def parse_body(self, body):
+        try:
+            data = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HttpError(400, f"неверный JSON: {e}")
+        if not isinstance(data, dict):
+            raise HttpError(400, "ожидался JSON-объект")
+        return data
+
+    # --- обработчики (выполняются в потоке модели) ---
+
+    def page(self, items, params):
+        offset = int_param(params, "offset", 0)
+        limit = int_param(params, "limit", 50, 1, MAX_PAGE)
+        return offset, limit, items[offset:offset + limit]
+
+    def list_tasks(self, params):
+        status = params.get("status", ["all"])[0]
+        category = params.get("category", [None])[0]
+        sort = params.get("sort", [""])[0]
+        reverse = sort.startswith("-")
+        sort = sort.lstrip("-") or None
+        if sort is not None and sort not in TASK_SORT_KEYS:
+            raise HttpError(400, f"неизвестный столбец сортировки: {sort}")
+        # Отбор и порядок — по индексам сортировки модели, страница нарезается из готового списка id
+        # Неизвестный статус, как и раньше, означает невыполненные
+        view = TaskView("", category=category,
+                        status=None if status == "all" else "done" if status == "done" else "open")
+        task_ids = self.core.views.task_ids(view, sort, reverse)
+        offset, limit, chunk = self.page(task_ids, params)
+        chunk = [self.core.task_index[task_id] for task_id in chunk]
+        now = datetime.now()
+        return {"version": self.core.version, "total": len(task_ids), "offset": offset, "limit": limit,
+                "items": [task_json(task, now) for task in chunk]}
+
+    def list_notes(self, params):
+        category = params.get("category", [None])[0]
+        notes = self.core.notes
+        if category is not None:
+            notes = [note for note in notes if note.category == category]
+        offset, limit, chunk = self.page(notes, params)
+        return {"version": self.core.version, "total": len(notes), "offset": offset, "limit": limit,
+                "items": [note_json(note) for note in chunk]}
+
+    def search(self, params):
+        query = params.get("q", [""])[0]
+        limit = int_param(params, "limit", 20, 1, MAX_PAGE)
+        tasks, notes = self.core.search(query, params.get("category", [None])[0])
+        now = datetime.now()
+        return {"version": self.core.version, "total_tasks": len(tasks), "total_notes": len(notes),
+                "tasks": [task_json(task, now) for task in tasks[:limit]],
+                "notes": [note_json(note) for note in notes[:limit]]}
+
+    def create_task(self, data):
+        # Все поля проверяются до обращения к модели: задача либо добавляется целиком, либо ответ 400
+        title = data.get("title", "")
+        if not isinstance(title, str) or not title.strip():
+            raise HttpError(400, "title: нужно название задачи")
+        try:
+            _, due_date = parse_due(str(data.get("due_date", "")))
+        except ValueError:
+            raise HttpError(400, "due_date: ожидался формат ГГГГ-ММ-ДД ЧЧ:ММ")
+        category = data.get("category", "Без категории")
+        if not isinstance(category, str) or not category.strip():
+            raise HttpError(400, "category: ожидалась непустая строка")
+        comment = data.get("comment", "")
+        if not isinstance(comment, str):
+            raise HttpError(400, "comment: ожидалась строка")
+        for name in ("importance", "urgency"):
+            if not isinstance(data.get(name, False), bool):
+                raise HttpError(400, f"{name}: ожидалось true или false")
+        try:
+            task = self.core.add_task(title.strip(), due_date, category, comment, data.get("importance", False),
+                                      data.get("urgency", False))
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        if self.on_task_saved is not None:
+            self.on_task_saved(task, True)
+        return task_json(task)
+
+    def complete_task(self, task_id):
+        task = self.core.task_index.get(task_id)
+        if task is None:
+            raise HttpError(404, "нет такой задачи")
+        if not task.completed:
+            self.core.complete_task(task)
+            if self.on_task_saved is not None:
+                self.on_task_saved(task, False)
+        return task_json(task)
+
+    def pomodoro(self):
+        state = self.pomodoro_state() if self.pomodoro_state else None
+        return {"version": self.core.version, "timer": state}
+
+    # --- изменения ---
+
+    async def wait_changes(self, params):
+        since = int_param(params, "since", 0)
+        timeout = int_param(params, "timeout", 25, 0, 120)
+        deadline = self.loop.time() + timeout
+        while True:
+            event = self.change_event  # Берём до проверки, чтобы не пропустить изменение между ними
+            changes, complete = await self.call(lambda: self.core.changes_since(since))
+            remaining = deadline - self.loop.time()
+            if changes or remaining <= 0:
+                return {"version": changes[-1][0] if changes else since, "complete": complete,
+                        "changes": [{"version": v, "kind": kind, "id": item_id, "action": action}
+                                    for v, kind, item_id, action in changes]}
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stream_events(self, writer, params):
+        # Server-Sent Events: по событию на изменение, пустой комментарий раз в KEEPALIVE_SECONDS
+        since = int_param(params, "since", -1, -1)
+        if since < 0:
+            since = await self.call(lambda: self.core.version)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        try:
+            await writer.drain()
+            while True:
+                event = self.change_event
+                changes, complete = await self.call(lambda: self.core.changes_since(since))
+                if not complete and changes:
+                    writer.write(b"event: reset\ndata: {}\n\n")
+                for version, kind, item_id, action in changes:
+                    data = json.dumps({"kind": kind, "id": item_id, "action": action}, ensure_ascii=False)
+                    writer.write(f"id: {version}\nevent: change\ndata: {data}\n\n".encode("utf-8"))
+                    since = version
+                if not changes:
+                    try:
+                        await asyncio.wait_for(event.wait(), KEEPALIVE_SECONDS)
+                        continue
+                    except asyncio.TimeoutError:
+                        writer.write(b": keepalive\n\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+
+def serve(core, port=DEFAULT_PORT, host="127.0.0.1"):
+    # Без окна: модель принадлежит потоку asyncio; изменения от других процессов подхватываются тем же циклом
+    server = PlannerApiServer(core, host=host, port=port)
+
+    async def main():
+        await server.start()
+        print(f"API планировщика: http://{server.host}:{server.port}/api/tasks")
+
+        async def sync_loop():
+            while True:
+                await asyncio.sleep(2)
+                core.sync()
+
+        sync_task = asyncio.ensure_future(sync_loop())
+        try:
+            async with server.server:
+                await server.server.serve_forever()
+        finally:
+            sync_task.cancel()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
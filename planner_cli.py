@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+# Планировщик из командной строки, без окна и без tkinter.
+# Примеры:
+#   python planner_cli.py add "Сдать отчёт" 2025-05-20 --category Работа --important
+#   python planner_cli.py list --overdue
+#   python planner_cli.py list --view "Открытые Q1 на этой неделе" --sort title
+#   python planner_cli.py done 3f2a
+#   python planner_cli.py search отчёт
+#   python planner_cli.py export --path out.csv
+#   python planner_cli.py export --format ics --from 2025-05-01 --to 2025-05-31 --status open
+#   python planner_cli.py import planner_export.csv
+#   python planner_cli.py snapshot create --label "перед импортом"
+#   python planner_cli.py snapshot restore 20250520-1830
+#   python planner_cli.py migrate tasks_old.json --output tasks.json
+#   python planner_cli.py archive run --days 30
+#   python planner_cli.py archive notes 7d4e
+#   python planner_cli.py archive search отчёт
+#   python planner_cli.py archive restore 3f2a 9c1b
+#   python planner_cli.py stats
+#   python planner_cli.py report --json --output report.json
+#   python planner_cli.py serve --port 8765
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+import archive
+import exporter
+import importer
+import migrations
+import views
+from file_lock import FileLock
+from planner_core import PlannerCore, format_duration, parse_due as core_parse_due
+from snapshots import SnapshotError
+from storage import CorruptDataError
+
+ID_WIDTH = 8  # Сколько символов id показывать; в командах достаточно любого однозначного префикса
+
+
+def parse_due(value):
+    # Срок как в окне и в API (planner_core.parse_due, "2025-3-5 9:00" тоже); просто "ГГГГ-ММ-ДД" — конец дня,
+    # как в окне добавления
+    try:
+        return core_parse_due(value)[1]
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d 23:59")
+    except ValueError:
+        raise argparse.ArgumentTypeError("неверный формат даты, используйте ГГГГ-ММ-ДД или \"ГГГГ-ММ-ДД ЧЧ:ММ\"")
+
+
+def parse_day(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError("неверный формат даты, используйте ГГГГ-ММ-ДД")
+
+
+def parse_kinds(value):
+    kinds = [kind.strip() for kind in value.split(",") if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in exporter.KINDS]
+    if unknown or not kinds:
+        raise argparse.ArgumentTypeError(f"неизвестный вид записей: {', '.join(unknown)}; "
+                                         f"допустимо: {','.join(exporter.KINDS)}")
+    return kinds
+
+
+def task_line(task, now):
+    status = "✓" if task.completed else "✗"
+    overdue = " (просрочена)" if not task.completed and task.due_at < now else ""
+    return f"{task.id[:ID_WIDTH]}  {status} [{task.priority}] {task.due_date}  {task.title} | {task.category}{overdue}"
+
+
+def archive_line(entry):
+    kind = "задача" if entry["kind"] == "task" else "заметка"
+    archived = datetime.fromtimestamp(entry["archived_at"]).strftime("%Y-%m-%d")
+    return (f"{entry['id'][:ID_WIDTH]}  {kind:<7} {entry['date']}  {entry['title']} | {entry['category']}"
+            f"  (в архиве с {archived})")
+
+
+def note_line(note):
+    return f"{note.id[:ID_WIDTH]}  {note.date}  {note.title} | {note.category}"
+
+
+def cmd_add(core, args):
+    task = core.add_task(args.title, args.due, args.category, args.comment, args.important, args.urgent)
+    print(f"Задача добавлена: {task_line(task, datetime.now())}")
+
+
+def cmd_list(core, args):
+    now = datetime.now()
+    if args.view:
+        # Сохранённый вид — тот же, что в меню «Вид» окна (views.json)
+        view = next((view for view in views.load_views() if view.name == args.view), None)
+        if view is None:
+            names = ", ".join(view.name for view in views.load_views())
+            print(f"Ошибка: нет вида {args.view}; есть: {names}", file=sys.stderr)
+            return 1
+    else:
+        view = views.TaskView("", category=args.category, status=None if args.all else "open",
+                              quadrant=args.quadrant, due="overdue" if args.overdue else None)
+    sort, reverse = (args.sort, args.desc) if args.sort else (view.sort, view.reverse)
+    tasks = core.views.tasks(view, sort, reverse, now=now)
+    for task in tasks:
+        print(task_line(task, now))
+    print(f"Задач: {len(tasks)}")
+
+
+def cmd_done(core, args):
+    failed = False
+    tasks = []
+    for prefix in args.ids:
+        found = core.find_tasks(prefix)
+        if len(found) != 1:
+            print(f"Ошибка: {'нет задачи' if not found else 'несколько задач'} с id {prefix}", file=sys.stderr)
+            failed = True
+            continue
+        tasks.append(found[0])
+    # Все найденные задачи — одной записью на диск
+    core.complete_tasks(tasks)
+    for task in tasks:
+        print(f"Выполнено: {task.title}")
+    return 1 if failed else 0
+
+
+def cmd_search(core, args):
+    now = datetime.now()
+    tasks, notes = core.search(args.query, args.category)
+    for task in tasks[:args.limit]:
+        print(task_line(task, now))
+    for note in notes[:args.limit]:
+        print(note_line(note))
+    print(f"Найдено задач: {len(tasks)}, заметок: {len(notes)}")
+
+
+def cmd_export(core, args):
+    path = args.path or f"planner_export.{args.format}"
+    export_filter = exporter.ExportFilter(args.date_from, args.date_to, args.category, args.status, args.kinds)
+    records, total = exporter.core_records(core)
+    written = exporter.export(records, path, args.format, export_filter, total)
+    print(f"Записей экспортировано: {written}, файл {path}")
+
+
+def cmd_import(core, args):
+    def progress(stats):
+        print(f"\rПрочитано {stats.read}...", end="", file=sys.stderr, flush=True)
+
+    try:
+        stats = importer.import_file(core, args.path, args.format, progress if sys.stderr.isatty() else None)
+    except (OSError, ValueError, CorruptDataError) as e:
+        print(f"Ошибка импорта: {e}", file=sys.stderr)
+        return 1
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    print(stats.summary())
+
+
+def cmd_snapshot(core, args):
+    if args.action == "create":
+        manifest = core.create_snapshot(args.label)
+        if manifest.get("unchanged"):
+            print(f"Данные не изменились со снимка {manifest['id']}")
+        else:
+            print(f"Снимок {manifest['id']}: новых байт {manifest['new_bytes']}")
+        return 0
+    if args.action == "list":
+        for manifest in core.snapshots.list():
+            created = datetime.fromtimestamp(manifest["created"]).strftime("%Y-%m-%d %H:%M:%S")
+            counts = manifest["counts"]
+            print(f"{manifest['id']}  {created}  задач {counts.get('tasks', 0)}, заметок {counts.get('notes', 0)}"
+                  f"{'  ' + manifest['label'] if manifest['label'] else ''}")
+        print(f"На диске: {core.snapshots.size() / 1048576:.1f} МБ")
+        return 0
+    # restore: как и для задач, достаточно однозначного префикса id
+    found = [snapshot_id for snapshot_id in core.snapshots.ids() if snapshot_id.startswith(args.snapshot_id or "")]
+    if len(found) != 1 or not args.snapshot_id:
+        print(f"Ошибка: {'нет снимка' if not found else 'укажите один снимок'} {args.snapshot_id or ''}",
+              file=sys.stderr)
+        return 1
+    try:
+        core.restore_snapshot(found[0])
+    except SnapshotError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    print(f"Восстановлено из {found[0]}: задач {len(core.tasks)}, заметок {len(core.notes)}")
+
+
+def cmd_migrate(core, args):
+    # Без загрузки планировщика: файл обновляется одним потоковым проходом. Файл на месте переписывается
+    # под той же блокировкой, что берёт хранилище, — открытое окно не увидит его наполовину записанным
+    version = migrations.file_version(args.path)
+    if version is None:
+        print(f"Ошибка: {args.path} не найден или пуст", file=sys.stderr)
+        return 1
+    if version >= migrations.SCHEMA_VERSION and not args.output:
+        print(f"{args.path}: версия формата {version}, обновление не требуется")
+        return 0
+    try:
+        with FileLock((args.output or args.path) + ".lock").exclusive():
+            version, target, count = migrations.migrate_file(args.path, args.output)
+    except (OSError, CorruptDataError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.path}: версия формата {version} -> {target}, записей {count}, файл {args.output or args.path}")
+    for step in migrations.pending(version):
+        print(f"  {step.version}: {step.description}")
+
+
+def cmd_archive(core, args):
+    if args.action == "run":
+        tasks, notes = core.archive_old(args.days)
+        print(f"В архив: задач {len(tasks)}, заметок {len(notes)} (не менялись {args.days} дн.)")
+        return 0
+    if args.action == "search":
+        entries = core.archive.search(" ".join(args.terms), args.category)
+        for entry in entries[:args.limit]:
+            print(archive_line(entry))
+        print(f"В архиве найдено: {len(entries)}; всего записей {len(core.archive)}, "
+              f"на диске {core.archive.size() / 1048576:.1f} МБ")
+        return 0
+    if args.action == "notes":
+        # Выбранные заметки — сразу, не дожидаясь возраста
+        if not args.terms:
+            print("Ошибка: укажите id заметок", file=sys.stderr)
+            return 1
+        notes = []
+        for prefix in args.terms:
+            found = core.find_notes(prefix)
+            if len(found) != 1:
+                print(f"Ошибка: {'нет заметки' if not found else 'несколько заметок'} с id {prefix}",
+                      file=sys.stderr)
+                return 1
+            notes.append(found[0])
+        core.archive_notes(notes)
+        print(f"В архив: заметок {len(notes)}")
+        return 0
+    # restore: по id или однозначному префиксу, как в done
+    if not args.terms:
+        print("Ошибка: укажите id записей архива", file=sys.stderr)
+        return 1
+    ids = []
+    for prefix in args.terms:
+        found = core.archive.find(prefix)
+        if len(found) != 1:
+            print(f"Ошибка: {'нет записи' if not found else 'неоднозначный id'} {prefix}", file=sys.stderr)
+            return 1
+        ids.append(found[0]["id"])
+    tasks, notes = core.restore_archived(ids)
+    print(f"Восстановлено из архива: задач {len(tasks)}, заметок {len(notes)}")
+
+
+def cmd_stats(core, args):
+    stats = core.stats(top=args.top)
+    print(f"Задач: {stats['tasks']}, выполнено: {stats['completed']}, просрочено: {stats['overdue']}")
+    print(f"Заметок: {stats['notes']}")
+    print("Открытые задачи по квадрантам: " +
+          ", ".join(f"{quadrant}: {count}" for quadrant, count in stats["open_by_quadrant"].items()))
+    if stats["time_by_category"]:
+        print("Время по категориям:")
+        for category, seconds in sorted(stats["time_by_category"].items(), key=lambda item: item[1], reverse=True):
+            print(f"- {category}: {format_duration(seconds)}")
+    if stats["time_by_task"]:
+        print("Время по задачам:")
+        for task, seconds in stats["time_by_task"]:
+            print(f"- {task.title}: {format_duration(seconds)}")
+    print(f"Работа вне плана: {format_duration(stats['free_time'])}")
+    print(f"Помидоро: сегодня {format_duration(round(stats['work_today']))}, "
+          f"за неделю {format_duration(round(stats['work_week']))}, "
+          f"за месяц {format_duration(round(stats['work_month']))}")
+    for category, seconds in sorted(stats["month_by_category"].items(), key=lambda item: item[1], reverse=True):
+        print(f"- {category}: {format_duration(round(seconds))} за месяц")
+
+
+def cmd_report(core, args):
+    from reports import build_report, format_report
+    report = build_report(core.tasks, core.free_time_entries, weeks=args.weeks)
+    if args.json:
+        text = json.dumps(report, ensure_ascii=False, indent=4)
+    else:
+        text = "\n".join(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Отчёт сохранён в {args.output}")
+    else:
+        print(text)
+
+
+def cmd_serve(core, args):
+    from planner_api import serve
+    serve(core, args.port)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Планировщик дел без графического интерфейса")
+    parser.add_argument("-C", "--dir", help="папка с tasks.json (по умолчанию текущая)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="добавить задачу")
+    add.add_argument("title")
+    add.add_argument("due", type=parse_due, help="срок: ГГГГ-ММ-ДД или \"ГГГГ-ММ-ДД ЧЧ:ММ\"")
+    add.add_argument("--category", default="Без категории")
+    add.add_argument("--comment", default="")
+    add.add_argument("--important", action="store_true")
+    add.add_argument("--urgent", action="store_true")
+    add.set_defaults(handler=cmd_add, writes=True)
+
+    show = commands.add_parser("list", help="список задач (по умолчанию невыполненные)")
+    show.add_argument("--all", action="store_true", help="включая выполненные")
+    show.add_argument("--overdue", action="store_true", help="только просроченные")
+    show.add_argument("--category")
+    show.add_argument("--quadrant", type=int, choices=(1, 2, 3, 4), help="квадрант Эйзенхауэра")
+    show.add_argument("--view", help="сохранённый вид (вместо фильтров выше)")
+    show.add_argument("--sort", choices=tuple(views.TASK_SORT_KEYS), help="столбец сортировки")
+    show.add_argument("--desc", action="store_true", help="по убыванию")
+    show.set_defaults(handler=cmd_list)
+
+    done = commands.add_parser("done", help="отметить задачи выполненными")
+    done.add_argument("ids", nargs="+", help="id задачи или его начало")
+    done.set_defaults(handler=cmd_done, writes=True)
+
+    search = commands.add_parser("search", help="поиск по задачам и заметкам")
+    search.add_argument("query")
+    search.add_argument("--category")
+    search.add_argument("--limit", type=int, default=20)
+    search.set_defaults(handler=cmd_search)
+
+    export = commands.add_parser("export", help="экспорт в CSV, JSON Lines или iCalendar")
+    export.add_argument("--format", choices=exporter.FORMATS, default="csv")
+    export.add_argument("--path", help="файл (по умолчанию planner_export.<формат>)")
+    export.add_argument("--from", dest="date_from", type=parse_day, help="с даты ГГГГ-ММ-ДД")
+    export.add_argument("--to", dest="date_to", type=parse_day, help="по дату ГГГГ-ММ-ДД включительно")
+    export.add_argument("--category")
+    export.add_argument("--status", choices=("open", "done"), help="только задачи: открытые или выполненные")
+    export.add_argument("--kinds", type=parse_kinds, default=exporter.KINDS,
+                        help="что выгружать через запятую: task,note,free_time (по умолчанию всё)")
+    export.set_defaults(handler=cmd_export)
+
+    load = commands.add_parser("import", help="импорт из CSV, JSON Lines, iCalendar или tasks.json (без дубликатов)")
+    load.add_argument("path")
+    load.add_argument("--format", choices=importer.FORMATS, help="по умолчанию — по расширению файла")
+    load.set_defaults(handler=cmd_import, writes=True)
+
+    snapshot = commands.add_parser("snapshot", help="резервные снимки: список, создание, восстановление")
+    snapshot.add_argument("action", choices=("list", "create", "restore"))
+    snapshot.add_argument("snapshot_id", nargs="?", help="id снимка для restore (достаточно префикса)")
+    snapshot.add_argument("--label", default="", help="метка нового снимка")
+    snapshot.set_defaults(handler=cmd_snapshot)
+
+    store = commands.add_parser("archive", help="архив выполненных задач и заметок: run, notes, search, restore")
+    store.add_argument("action", choices=("run", "notes", "search", "restore"))
+    store.add_argument("terms", nargs="*", help="запрос для search, id (или префиксы) для notes и restore")
+    store.add_argument("--days", type=int, default=archive.archive_days(),
+                       help="run: выполненные задачи и заметки старше стольких дней (0 — все выполненные)")
+    store.add_argument("--category")
+    store.add_argument("--limit", type=int, default=50)
+    store.set_defaults(handler=cmd_archive)
+
+    migrate = commands.add_parser("migrate", help="обновить файл данных до текущей версии формата")
+    migrate.add_argument("path", nargs="?", default="tasks.json")
+    migrate.add_argument("--output", help="записать в другой файл (по умолчанию — на место исходного)")
+    migrate.set_defaults(handler=cmd_migrate, standalone=True)
+
+    stats = commands.add_parser("stats", help="статистика по задачам и времени")
+    stats.add_argument("--top", type=int, default=10)
+    stats.set_defaults(handler=cmd_stats)
+
+    report = commands.add_parser("report", help="отчёт: выполнение по неделям, просрочки, квадранты, время")
+    report.add_argument("--weeks", type=int, default=12, help="сколько недель показывать")
+    report.add_argument("--json", action="store_true", help="в формате JSON")
+    report.add_argument("--output", help="записать в файл, а не выводить")
+    report.set_defaults(handler=cmd_report)
+
+    api = commands.add_parser("serve", help="локальный HTTP/JSON API (planner_api.py)")
+    api.add_argument("--port", type=int, default=8765)
+    api.set_defaults(handler=cmd_serve, writes=True)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.dir:
+        os.chdir(args.dir)
+    if getattr(args, "standalone", False):
+        return args.handler(None, args) or 0
+    core = PlannerCore()
+    recovered = core.load()
+    if recovered:
+        error, corrupt_path = recovered
+        print(f"Файл данных повреждён: {error}\nОн сохранён как {corrupt_path}, "
+              f"данные восстановлены из резервной копии.", file=sys.stderr)
+    try:
+        if getattr(args, "writes", False):
+            # Команды, которые и так меняют данные, заодно уносят в архив давно выполненное (auto_archive);
+            # команды только для чтения файлы не трогают
+            core.auto_archive()
+        return args.handler(core, args) or 0
+    finally:
+        core.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
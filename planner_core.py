@@ -0,0 +1,853 @@
+# -*- coding: utf-8 -*-
+# Ядро планировщика без интерфейса: модели, индексы, хранение, поиск и статистика (экспорт — exporter.py).
+# Не импортирует tkinter — им пользуются и окно (Planner.py), и командная строка (planner_cli.py).
+import bisect
+import collections
+import itertools
+import re
+import time
+import uuid
+from datetime import datetime
+
+from archive import ArchiveStore, archive_days
+from storage import open_storage, CorruptDataError, DEFAULT_CATEGORIES, iter_data
+from migrations import SCHEMA_VERSION, migrate_pairs
+from search_index import SearchIndex
+from sessions import NO_TASK, SessionLog
+from views import ViewIndex
+
+
+# Срок задачи в каноническом виде "ГГГГ-ММ-ДД ЧЧ:ММ"
+DUE_FORMAT = "%Y-%m-%d %H:%M"
+DUE_RE = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2}) ([0-9]{2}):([0-9]{2})")
+
+
+def parse_due(value):
+    # Срок -> (datetime, канонический текст). Принимает всё, что принимает strptime с DUE_FORMAT
+    # ("2025-3-5 9:00" тоже), и приводит к виду "2025-03-05 09:00". Канонический срок разбирается
+    # регулярным выражением: при загрузке и импорте сотен тысяч задач strptime был самой дорогой частью
+    # конструктора. ValueError — срок не разобран
+    try:
+        match = DUE_RE.fullmatch(value)
+        if match is not None:
+            return datetime(*map(int, match.groups())), value  # ValueError и на несуществующую дату
+        moment = datetime.strptime(value, DUE_FORMAT)
+    except (TypeError, ValueError):
+        raise ValueError(f"неверный срок: {value!r}")
+    return moment, moment.strftime(DUE_FORMAT)
+
+
+def format_duration(seconds):
+    return f"{seconds // 60} мин {seconds % 60} сек"
+
+
+class Task:
+    # __slots__ вместо __dict__ у каждого экземпляра: на сотнях тысяч задач это заметная экономия памяти
+    __slots__ = ("id", "title", "_due_date", "due_at", "category", "completed", "comment", "time_spent",
+                 "_importance", "_urgency", "priority", "updated_at", "completed_at")
+
+    def __init__(self, title, due_date, category="Без категории", comment="", time_spent=0, importance=False, urgency=False,
+                 task_id=None):
+        self.id = task_id or uuid.uuid4().hex  # Постоянный идентификатор, хранится в tasks.json
+        self.title = title
+        self.due_date = due_date
+        self.category = category
+        self.completed = False
+        self.comment = comment
+        self.time_spent = time_spent  # Время в секундах
+        self._importance = bool(importance)  # True = Важно, False = Не важно
+        self._urgency = bool(urgency)  # True = Срочно, False = Не срочно
+        self._update_priority()
+        self.updated_at = 0.0  # Время последнего сохранения (time.time()), по нему решаются конфликты
+        self.completed_at = 0.0  # Когда задачу отметили выполненной (time.time()); 0 — неизвестно или не выполнена
+
+    @property
+    def due_date(self):
+        return self._due_date
+
+    @due_date.setter
+    def due_date(self, value):
+        # Срок разбираем один раз при создании или изменении задачи, а не при каждой перерисовке
+        self.due_at, self._due_date = parse_due(value)
+
+    @property
+    def importance(self):
+        return self._importance
+
+    @importance.setter
+    def importance(self, value):
+        self._importance = bool(value)
+        self._update_priority()
+
+    @property
+    def urgency(self):
+        return self._urgency
+
+    @urgency.setter
+    def urgency(self, value):
+        self._urgency = bool(value)
+        self._update_priority()
+
+    def _update_priority(self):
+        # Квадрант Эйзенхауэра считаем при изменении важности/срочности, а не при каждой отрисовке
+        if self._importance:
+            self.priority = 1 if self._urgency else 2  # Важно и Срочно / Важно, Не срочно
+        else:
+            self.priority = 3 if self._urgency else 4  # Не важно, Срочно / Не важно, Не срочно
+
+    def to_dict(self):
+        return {"id": self.id, "title": self.title, "due_date": self.due_date, "category": self.category,
+                "comment": self.comment, "time_spent": self.time_spent, "completed": self.completed,
+                "importance": self.importance, "urgency": self.urgency, "updated_at": self.updated_at,
+                "completed_at": self.completed_at}
+
+    @classmethod
+    def from_dict(cls, data):
+        task = cls(data["title"], data["due_date"], data.get("category", "Без категории"), data.get("comment", ""),
+                   data.get("time_spent", 0), data.get("importance", False), data.get("urgency", False),
+                   data.get("id"))
+        task.completed = data.get("completed", False)
+        task.updated_at = data.get("updated_at", 0.0)
+        task.completed_at = data.get("completed_at", 0.0)
+        return task
+
+    def update_from_dict(self, data):
+        # Применить версию задачи, пришедшую из другого процесса
+        self.title = data["title"]
+        self.due_date = data["due_date"]
+        self.category = data.get("category", "Без категории")
+        self.comment = data.get("comment", "")
+        self.time_spent = data.get("time_spent", 0)
+        self.completed = data.get("completed", False)
+        self.importance = data.get("importance", False)
+        self.urgency = data.get("urgency", False)
+        self.updated_at = data.get("updated_at", 0.0)
+        self.completed_at = data.get("completed_at", 0.0)
+
+    def __str__(self):
+        status = "✓" if self.completed else "✗"
+        return f"{self.title} | {self.due_date} | {self.category} | {status}"
+
+class Note:
+    __slots__ = ("id", "_text", "_title", "date", "category", "updated_at")
+
+    def __init__(self, text, date, category="Без категории", note_id=None):
+        self.id = note_id or uuid.uuid4().hex
+        self.text = text
+        self.date = date
+        self.category = category
+        self.updated_at = 0.0
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value
+        self._title = None  # Заголовок пересчитается при следующем обращении
+
+    @property
+    def title(self):
+        if self._title is None:
+            self._title = self._text.split("\n", 1)[0].strip() if self._text else ""
+        return self._title
+
+    def to_dict(self):
+        return {"id": self.id, "text": self.text, "date": self.date, "category": self.category,
+                "updated_at": self.updated_at}
+
+    @classmethod
+    def from_dict(cls, data):
+        note = cls(data["text"], data["date"], data.get("category", "Без категории"), data.get("id"))
+        note.updated_at = data.get("updated_at", 0.0)
+        return note
+
+    def update_from_dict(self, data):
+        self.text = data["text"]
+        self.date = data["date"]
+        self.category = data.get("category", "Без категории")
+        self.updated_at = data.get("updated_at", 0.0)
+
+    def __str__(self):
+        return f"{self.title} | {self.date} | {self.category}"
+
+class DueIndex:
+    # Отсортированный по сроку индекс открытых задач: запросы по диапазону дат через bisect
+    def __init__(self, tasks=()):
+        self._keys = []  # Отсортированные пары (due_at, id)
+        self._by_id = {}  # id -> пара в _keys
+        for task in tasks:
+            if not task.completed:
+                self._by_id[task.id] = (task.due_at, task.id)
+        self._keys = sorted(self._by_id.values())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, task):
+        self.discard(task.id)
+        if not task.completed:
+            key = (task.due_at, task.id)
+            bisect.insort(self._keys, key)
+            self._by_id[task.id] = key
+
+    def add_many(self, tasks):
+        # Пачка новых задач (которых в индексе ещё нет): ключи дописываются в конец и сортируются один раз —
+        # timsort сливает два упорядоченных куска за линейное время, а не вставкой по одной
+        added = sorted((task.due_at, task.id) for task in tasks if not task.completed)
+        for key in added:
+            self._by_id[key[1]] = key
+        if added:
+            self._keys.extend(added)
+            self._keys.sort()
+
+    def discard(self, task_id):
+        key = self._by_id.pop(task_id, None)
+        if key is not None:
+            del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def ids_between(self, start, end):
+        # id задач со сроком start <= due_at <= end
+        lo = bisect.bisect_left(self._keys, (start,))
+        hi = bisect.bisect_right(self._keys, (end, "\U0010ffff"))
+        return [task_id for _, task_id in self._keys[lo:hi]]
+
+    def ids_before(self, moment):
+        # id задач со сроком раньше moment (просроченные)
+        hi = bisect.bisect_left(self._keys, (moment,))
+        return [task_id for _, task_id in self._keys[:hi]]
+
+
+class PlannerCore:
+    LOAD_CHUNK = 5000  # Записей за один шаг потоковой загрузки
+    CHANGE_LOG_SIZE = 1000  # Сколько последних изменений помнить для клиентов API
+    BULK_FORGET = 2000  # С какого размера пачки удаления словарь поиска пересобирается целиком
+    TOMBSTONE_DAYS = 30  # Сколько дней помнить удаление: столько другой процесс может не сливать свои правки
+
+    def __init__(self, storage=None, sessions=None, archive=None):
+        self.storage = storage if storage is not None else open_storage()
+        self.sessions = sessions if sessions is not None else SessionLog()  # Журнал сессий Помидоро
+        self.archive = archive if archive is not None else ArchiveStore()  # Выполненное и старое — вне памяти
+        self.tasks = []
+        self.notes = []
+        self.categories = list(DEFAULT_CATEGORIES)
+        self.free_time_entries = []
+        self.tombstones = {}  # id удалённой записи -> {"kind", "id", "deleted_at"}, как в tasks.json
+        self.task_index = {}  # id -> Task
+        self.note_index = {}  # id -> Note
+        self.due_index = DueIndex()
+        self.search_index = SearchIndex()
+        self.views = ViewIndex(self)  # Индексы сортировки таблиц и отбор по сохранённым видам
+        self.loading = False
+        self.loaded = False  # Данные с диска прочитаны целиком
+        self.restoring = False  # Идёт загрузка из резервного снимка, а не из хранилища
+        self.records = None
+        self.version = 0  # Растёт на каждое изменение
+        self.change_log = collections.deque(maxlen=self.CHANGE_LOG_SIZE)  # (версия, вид, id, действие)
+        self.listeners = []  # Вызываются с новой версией после каждого изменения
+
+    # --- загрузка ---
+
+    def load(self):
+        # Полная загрузка без интерфейса. Возвращает None или (ошибка, куда сохранён повреждённый файл),
+        # если данные пришлось восстановить из резервной копии
+        recovered = None
+        self.begin_load(self.storage.iter_load())
+        while self.loading:
+            try:
+                self.load_records(self.LOAD_CHUNK)
+            except CorruptDataError as e:
+                recovered = (e, self.recover())
+        return recovered
+
+    def begin_load(self, records):
+        # Потоковая загрузка: записи превращаются в объекты по одной, порциями через load_records
+        self.tasks = []
+        self.notes = []
+        self.categories = list(DEFAULT_CATEGORIES)
+        self.categories_loaded = False
+        self.free_time_entries = []
+        self.tombstones = {}
+        self.rebuild_indexes()
+        self.views.reset()
+        self.search_index.start_bulk()
+        self.records = records
+        self.loading = True
+
+    def load_records(self, limit):
+        # Возвращает id загруженных задач и заметок; после последней порции загрузка завершается сама
+        new_task_ids = []
+        new_note_ids = []
+        if not self.loading:
+            return new_task_ids, new_note_ids
+        consumed = 0
+        for key, value in itertools.islice(self.records, limit):
+            consumed += 1
+            if key == "tasks":
+                task = Task.from_dict(value)
+                self.tasks.append(task)
+                self.task_index[task.id] = task
+                self.search_index.add_task(task)
+                new_task_ids.append(task.id)
+            elif key == "notes":
+                note = Note.from_dict(value)
+                self.notes.append(note)
+                self.note_index[note.id] = note
+                self.search_index.add_note(note)
+                new_note_ids.append(note.id)
+            elif key == "categories":
+                if not self.categories_loaded:
+                    self.categories = []
+                    self.categories_loaded = True
+                self.categories.append(value)
+            elif key == "free_time_entries":
+                self.free_time_entries.append(value)
+            elif key == "tombstones":
+                self.tombstones[value["id"]] = value
+        if consumed < limit:
+            self.finish_load()
+        return new_task_ids, new_note_ids
+
+    def recover(self):
+        # Повреждённый файл откладывается в сторону, загрузка начинается заново с резервной копии
+        corrupt_path, data = self.storage.recover()
+        self.begin_load(iter_data(data))
+        return corrupt_path
+
+    def finish_load(self):
+        self.loading = False
+        self.loaded = True
+        self.records = None
+        self.search_index.finish_bulk()
+        # Индекс сроков строим один раз по всем задачам, а не вставкой по одной
+        self.due_index = DueIndex(self.tasks)
+        if self.restoring:
+            self.restoring = False
+            self.changed("all", None, "reset")
+            self.save()  # Восстановленные данные заменяют хранилище целиком
+        else:
+            self.changed("all", None, "load")
+            self.after_persist()  # Журнал другого процесса мог разрастись — свернём его сразу
+
+    def rebuild_indexes(self):
+        self.task_index = {task.id: task for task in self.tasks}
+        self.note_index = {note.id: note for note in self.notes}
+        self.due_index = DueIndex(self.tasks)
+        self.search_index.rebuild(self.tasks, self.notes)
+
+    # --- сохранение ---
+
+    def persist_task(self, task):
+        # Одна строка в журнал вместо перезаписи всего tasks.json
+        task.updated_at = time.time()
+        self.storage.put("task", task.to_dict())
+        self.changed("task", task.id, "put")
+        self.after_persist()
+
+    def persist_note(self, note):
+        note.updated_at = time.time()
+        self.storage.put("note", note.to_dict())
+        self.changed("note", note.id, "put")
+        self.after_persist()
+
+    def changed(self, kind, item_id, action):
+        # kind: task, note, free_time, categories, lists, pomodoro, session, all (перечитать всё);
+        # action: put, delete, append, set, load, reset, а для pomodoro — смена фазы или паузы
+        self.version += 1
+        self.change_log.append((self.version, kind, item_id, action))
+        self.views.changed(kind, item_id, action)
+        for listener in self.listeners:
+            listener(self.version)
+
+    def changes_since(self, version):
+        # Изменения после version. Второе значение False — журнал изменений короче, чем нужно,
+        # и клиенту стоит перечитать данные целиком
+        if version >= self.version:
+            return [], True
+        complete = bool(self.change_log) and self.change_log[0][0] <= version + 1
+        return [change for change in self.change_log if change[0] > version], complete
+
+    def after_persist(self):
+        if self.storage.needs_compaction():
+            self.save()
+
+    def snapshot(self):
+        return self.snapshot_builder()()
+
+    def snapshot_builder(self):
+        # Списки ссылок копируются сразу (это быстро), а словари записей строит тот, кто вызовет
+        # результат, — при фоновой записи это поток записи, а не поток интерфейса
+        tasks = list(self.tasks)
+        notes = list(self.notes)
+        categories = list(self.categories)
+        free_time_entries = list(self.free_time_entries)
+        # Старые удаления забываем: правки, которые могли бы их воскресить, давно слиты
+        cutoff = time.time() - self.TOMBSTONE_DAYS * 86400
+        self.tombstones = {item_id: tombstone for item_id, tombstone in self.tombstones.items()
+                           if tombstone["deleted_at"] >= cutoff}
+        tombstones = list(self.tombstones.values())
+        return lambda: {
+            "schema_version": SCHEMA_VERSION,
+            "tasks": [task.to_dict() for task in tasks],
+            "notes": [note.to_dict() for note in notes],
+            "categories": categories,
+            "free_time_entries": free_time_entries,
+            "tombstones": tombstones
+        }
+
+    def save(self):
+        # Уплотнение: журнал сворачивается в новый снимок tasks.json.
+        # Пока история догружается, в памяти не всё — сначала дочитываем её до конца
+        while self.loading:
+            self.load_records(self.LOAD_CHUNK)
+        if not self.loaded:
+            return  # Загрузка ещё не начиналась: пустой снимок затёр бы данные на диске
+        self.storage.compact(self.snapshot_builder())
+
+    def close(self):
+        # Сворачиваем журнал, только если он есть: команда, которая ничего не меняла, файл не переписывает
+        if self.storage.compact_on_close and self.storage.has_journal():
+            self.save()
+        self.storage.close()
+        self.sessions.close()
+
+    # --- другие процессы ---
+
+    def sync(self):
+        # Подхватить изменения, сделанные другим процессом (второе окно, planner_cli.py).
+        # Возвращает None, если ничего не изменилось, иначе описание изменений для интерфейса
+        ops = self.storage.poll_changes()
+        if not ops:
+            return None
+        return self.apply_external(ops)
+
+    def apply_external(self, ops):
+        # Конфликт решается по записи: остаётся более поздняя правка (updated_at), как и в apply_ops хранилища
+        changes = {"added": {"task": [], "note": []}, "updated": {"task": [], "note": []},
+                   "removed": {"task": [], "note": []}, "lists": False}
+        for op in ops:
+            if op["op"] == "put":
+                self.apply_put(op["kind"], op["record"], changes)
+            elif op["op"] == "delete":
+                if "at" in op:
+                    self.bury(op["kind"], op["id"], op["at"])
+                item = self.index_for(op["kind"]).get(op["id"])
+                if item is not None and item.updated_at <= op.get("at", float("inf")):
+                    self.forget(op["kind"], item)
+                    changes["removed"][op["kind"]].append(item.id)
+            elif op["op"] == "set":
+                if op["key"] in ("categories", "free_time_entries"):
+                    setattr(self, op["key"], list(op["value"]))
+                    changes["lists"] = True
+            elif op["op"] == "append":
+                if op["key"] == "free_time_entries":
+                    self.free_time_entries.append(op["value"])
+                    changes["lists"] = True
+            elif op["op"] == "snapshot":
+                # Чего нет в чужом снимке и что здесь не менялось после since — удалено в другом процессе
+                for kind, items in (("task", self.tasks), ("note", self.notes)):
+                    present = op["ids"][kind]
+                    for item in [item for item in items if item.id not in present and item.updated_at <= op["since"]]:
+                        self.forget(kind, item)
+                        changes["removed"][kind].append(item.id)
+        for action, key in (("put", "added"), ("put", "updated"), ("delete", "removed")):
+            for kind in ("task", "note"):
+                for item_id in changes[key][kind]:
+                    self.changed(kind, item_id, action)
+        if changes["lists"]:
+            self.changed("lists", None, "set")
+        return changes
+
+    def apply_put(self, kind, record, changes):
+        tombstone = self.tombstones.get(record["id"])
+        if tombstone is not None and record.get("updated_at", 0.0) <= tombstone["deleted_at"]:
+            return  # Запись удалена позже этой правки
+        index = self.index_for(kind)
+        item = index.get(record["id"])
+        if item is not None and item.updated_at >= record.get("updated_at", 0.0):
+            return  # Здесь версия не старее
+        if item is None:
+            item = Task.from_dict(record) if kind == "task" else Note.from_dict(record)
+            (self.tasks if kind == "task" else self.notes).append(item)
+            index[item.id] = item
+            changes["added"][kind].append(item.id)
+        else:
+            item.update_from_dict(record)
+            changes["updated"][kind].append(item.id)
+        if kind == "task":
+            self.due_index.update(item)
+            self.search_index.add_task(item)
+        else:
+            self.search_index.add_note(item)
+
+    def bury(self, kind, item_id, at):
+        # Запомнить удаление: правка записи не позже at её уже не вернёт (apply_put, storage.apply_ops)
+        tombstone = self.tombstones.get(item_id)
+        if tombstone is None or tombstone["deleted_at"] < at:
+            self.tombstones[item_id] = {"kind": kind, "id": item_id, "deleted_at": at}
+
+    def index_for(self, kind):
+        return self.task_index if kind == "task" else self.note_index
+
+    def forget(self, kind, item):
+        # Убрать задачу или заметку из памяти и индексов (без записи на диск)
+        if kind == "task":
+            self.tasks.remove(item)
+            del self.task_index[item.id]
+            self.due_index.discard(item.id)
+        else:
+            self.notes.remove(item)
+            del self.note_index[item.id]
+        self.search_index.remove(item.id)
+
+    # --- задачи ---
+
+    def add_task(self, title, due_date, category="Без категории", comment="", importance=False, urgency=False):
+        task = Task(title, due_date, category, comment, 0, importance, urgency)
+        self.tasks.append(task)
+        self.task_index[task.id] = task
+        self.due_index.update(task)
+        self.search_index.add_task(task)
+        self.persist_task(task)
+        return task
+
+    def update_task(self, task, **fields):
+        # fields: title, due_date, category, comment, importance, urgency
+        for name, value in fields.items():
+            setattr(task, name, value)
+        self.due_index.update(task)
+        self.search_index.add_task(task)
+        self.persist_task(task)
+
+    def complete_task(self, task):
+        task.completed = True
+        task.completed_at = time.time()
+        self.due_index.discard(task.id)
+        self.persist_task(task)
+
+    def delete_task(self, task):
+        now = time.time()
+        self.forget("task", task)
+        self.bury("task", task.id, now)
+        self.storage.delete("task", task.id, now)
+        self.changed("task", task.id, "delete")
+        self.after_persist()
+
+    def add_time(self, task, seconds):
+        task.time_spent += round(seconds)
+        self.persist_task(task)
+
+    def log_session(self, kind, start, end, task=None):
+        # Интервал работы или отдыха (секунды эпохи) -> строка в журнале сессий и сводки.
+        # Категория запоминается на момент сессии: перенос задачи в другую категорию историю не меняет
+        event = self.sessions.record(kind, start, end, task.id if task else None,
+                                     task.category if task else NO_TASK)
+        self.changed("session", task.id if task else None, "append")
+        return event
+
+    def find_tasks(self, prefix):
+        # Задачи, чей id начинается с prefix (в командной строке достаточно первых символов id)
+        task = self.task_index.get(prefix)
+        if task is not None:
+            return [task]
+        return [task for task in self.tasks if task.id.startswith(prefix)]
+
+    def find_notes(self, prefix):
+        note = self.note_index.get(prefix)
+        if note is not None:
+            return [note]
+        return [note for note in self.notes if note.id.startswith(prefix)]
+
+    def overdue_tasks(self, now=None):
+        return [self.task_index[task_id] for task_id in self.due_index.ids_before(now or datetime.now())]
+
+    def tasks_due_between(self, start, end):
+        return [self.task_index[task_id] for task_id in self.due_index.ids_between(start, end)]
+
+    # --- заметки ---
+
+    def add_note(self, text, category="Без категории"):
+        note = Note(text, datetime.now().strftime("%Y-%m-%d %H:%M"), category)
+        self.notes.append(note)
+        self.note_index[note.id] = note
+        self.search_index.add_note(note)
+        self.persist_note(note)
+        return note
+
+    def update_note(self, note, **fields):
+        # fields: text, category
+        for name, value in fields.items():
+            setattr(note, name, value)
+        self.search_index.add_note(note)
+        self.persist_note(note)
+
+    def delete_note(self, note):
+        now = time.time()
+        self.forget("note", note)
+        self.bury("note", note.id, now)
+        self.storage.delete("note", note.id, now)
+        self.changed("note", note.id, "delete")
+        self.after_persist()
+
+    # --- массовые действия над выделением ---
+    # Вся пачка применяется к памяти целиком и уходит на диск одной записью в журнал
+    # (или одной транзакцией SQLite); интерфейс после неё перерисовывается один раз
+
+    def complete_tasks(self, tasks):
+        tasks = [task for task in tasks if not task.completed]
+        now = time.time()
+        for task in tasks:
+            task.completed = True
+            task.completed_at = now
+            self.due_index.discard(task.id)
+        self.persist_batch("task", tasks)
+        return tasks
+
+    def update_tasks(self, tasks, **fields):
+        # fields: category, importance, urgency (смена квадранта) и т. п., одинаковые для всех задач
+        for task in tasks:
+            for name, value in fields.items():
+                setattr(task, name, value)
+            self.due_index.update(task)
+            self.search_index.add_task(task)
+        self.persist_batch("task", tasks)
+
+    def set_quadrant(self, tasks, quadrant):
+        # Квадрант Эйзенхауэра 1–4 -> важность и срочность
+        self.update_tasks(tasks, importance=quadrant in (1, 2), urgency=quadrant in (1, 3))
+
+    def delete_tasks(self, tasks):
+        self.forget_many("task", tasks)
+
+    def update_notes(self, notes, **fields):
+        for note in notes:
+            for name, value in fields.items():
+                setattr(note, name, value)
+            self.search_index.add_note(note)
+        self.persist_batch("note", notes)
+
+    def delete_notes(self, notes):
+        self.forget_many("note", notes)
+
+    def persist_batch(self, kind, items):
+        if not items:
+            return
+        now = time.time()
+        for item in items:
+            item.updated_at = now
+        self.storage.write_batch([{"op": "put", "kind": kind, "record": item.to_dict()} for item in items])
+        for item in items:
+            self.changed(kind, item.id, "put")
+        self.after_persist()
+
+    def forget_many(self, kind, items):
+        # Как forget, но список задач или заметок пересобирается один раз на всю пачку
+        if not items:
+            return
+        index = self.index_for(kind)
+        removed = dict.fromkeys(item.id for item in items)
+        records = self.tasks if kind == "task" else self.notes
+        records[:] = [item for item in records if item.id not in removed]
+        # Большая пачка (архивация): словарь поиска пересортируем один раз, а не удаляем слова по одному
+        bulk = len(removed) >= self.BULK_FORGET
+        if bulk:
+            self.search_index.start_bulk()
+        for item_id in removed:
+            del index[item_id]
+            if kind == "task":
+                self.due_index.discard(item_id)
+            self.search_index.remove(item_id)
+        if bulk:
+            self.search_index.finish_bulk()
+        now = time.time()
+        for item_id in removed:
+            self.bury(kind, item_id, now)
+        self.storage.write_batch([{"op": "delete", "kind": kind, "id": item_id, "at": now} for item_id in removed])
+        for item_id in removed:
+            self.changed(kind, item_id, "delete")
+        self.after_persist()
+
+    def import_batch(self, tasks, notes=(), free_time_entries=(), categories=()):
+        # Пачка импорта (importer.py): новые задачи, заметки, записи времени и категории — в память, индексы
+        # и одной записью на диск. Словарь поиска и снимок доводятся один раз в finish_import: иначе каждая
+        # пачка пересортировывала бы весь словарь, а на JSON-хранилище — переписывала бы весь tasks.json
+        now = time.time()
+        ops = []
+        self.tasks.extend(tasks)
+        self.notes.extend(notes)
+        self.search_index.start_bulk()  # До finish_import новые слова находятся только после его вызова
+        for task in tasks:
+            task.updated_at = now
+            self.task_index[task.id] = task
+            self.search_index.add_task(task)
+            ops.append({"op": "put", "kind": "task", "record": task.to_dict()})
+        for note in notes:
+            note.updated_at = now
+            self.note_index[note.id] = note
+            self.search_index.add_note(note)
+            ops.append({"op": "put", "kind": "note", "record": note.to_dict()})
+        self.due_index.add_many(tasks)
+        for entry in free_time_entries:
+            self.free_time_entries.append(entry)
+            ops.append({"op": "append", "key": "free_time_entries", "value": entry})
+        new_categories = [category for category in categories if category not in self.categories]
+        if new_categories:
+            self.categories.extend(new_categories)
+            ops.append({"op": "set", "key": "categories", "value": list(self.categories)})
+        if ops:
+            self.storage.write_batch(ops)
+            self.changed("all", None, "import")
+
+    def finish_import(self):
+        self.search_index.finish_bulk()
+        self.after_persist()
+
+    # --- архив (archive.py) ---
+
+    def archive_candidates(self, days, now=None):
+        # Выполненные задачи и заметки, которые не менялись больше days дней (восстановленная из архива
+        # запись получает новое updated_at и остаётся в работе ещё на days дней). У выполненных задач
+        # из старых версий время выполнения неизвестно — они считаются старыми
+        cutoff = (now or time.time()) - days * 86400
+        cutoff_date = datetime.fromtimestamp(cutoff).strftime("%Y-%m-%d %H:%M")
+        tasks = [task for task in self.tasks if task.completed and max(task.completed_at, task.updated_at) < cutoff]
+        notes = [note for note in self.notes if note.date < cutoff_date and note.updated_at < cutoff]
+        return tasks, notes
+
+    def archive_old(self, days, now=None):
+        tasks, notes = self.archive_candidates(days, now)
+        self.archive_items(tasks, notes, now)
+        return tasks, notes
+
+    def auto_archive(self, now=None):
+        # Архивация по возрасту (PLANNER_ARCHIVE_DAYS, 0 — выключена). Её вызывают окно после загрузки,
+        # API-сервер при запуске и команды planner_cli.py, которые и так пишут данные; сама загрузка
+        # ничего не архивирует, так что list, search и другие команды только для чтения файлы не трогают
+        days = archive_days()
+        if days <= 0 or self.loading or not self.loaded:
+            return [], []
+        return self.archive_old(days, now)
+
+    def archive_notes(self, notes, now=None):
+        self.archive_items([], list(notes), now)
+        return notes
+
+    def archive_items(self, tasks, notes, now=None):
+        # Сначала записи надёжно уходят в архив, потом удаляются из рабочего набора одной пачкой:
+        # при сбое между шагами запись окажется в обоих местах, но не пропадёт
+        if not tasks and not notes:
+            return
+        self.archive.append([task.to_dict() for task in tasks], [note.to_dict() for note in notes], now)
+        self.forget_many("task", tasks)
+        self.forget_many("note", notes)
+
+    def restore_archived(self, ids):
+        # Вернуть записи из архива в рабочий набор. Уже живые (не успели удалить при сбое) пропускаются.
+        # Возвращает (задачи, заметки)
+        records = self.archive.read(ids)
+        tasks = [Task.from_dict(record) for item_id, (kind, record) in records.items()
+                 if kind == "task" and item_id not in self.task_index]
+        notes = [Note.from_dict(record) for item_id, (kind, record) in records.items()
+                 if kind == "note" and item_id not in self.note_index]
+        categories = {item.category for item in tasks + notes} - set(self.categories)
+        self.import_batch(tasks, notes, categories=sorted(categories))
+        self.finish_import()
+        self.archive.mark_restored(records)
+        return tasks, notes
+
+    # --- прочее ---
+
+    def log_free_time(self, description, seconds):
+        entry = {
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "description": description,
+            "time_spent": seconds
+        }
+        self.free_time_entries.append(entry)
+        self.storage.append("free_time_entries", entry)
+        self.changed("free_time", None, "append")
+        self.after_persist()
+        return entry
+
+    def add_category(self, category):
+        if category in self.categories:
+            return False
+        self.categories.append(category)
+        self.storage.set("categories", self.categories)
+        self.changed("categories", None, "set")
+        self.after_persist()
+        return True
+
+    def search(self, query, category=None):
+        # Возвращает найденные задачи и заметки, лучшие совпадения первыми
+        found = self.search_index.search(query, category)
+        return ([self.task_index[doc_id] for doc_id in found if doc_id in self.task_index],
+                [self.note_index[doc_id] for doc_id in found if doc_id in self.note_index])
+
+    def top_tasks_by_time(self, limit):
+        # Задачи с наибольшим Task.time_spent (время до журнала сессий и все рабочие фазы). Индекс сортировки
+        # по времени строится один раз и дальше обновляется по изменениям, так что это limit шагов, а не обход
+        task_ids = self.views.task_sort("time").top(limit, reverse=True)
+        return [task for task in map(self.task_index.__getitem__, task_ids) if task.time_spent]
+
+    def stats(self, now=None, top=20):
+        now = now or datetime.now()
+        by_quadrant = dict.fromkeys((1, 2, 3, 4), 0)
+        time_by_category = {}
+        completed = 0
+        for task in self.tasks:
+            if task.completed:
+                completed += 1
+            else:
+                by_quadrant[task.priority] += 1
+            if task.time_spent:
+                time_by_category[task.category] = time_by_category.get(task.category, 0) + task.time_spent
+        return {
+            "tasks": len(self.tasks),
+            "completed": completed,
+            "overdue": len(self.due_index.ids_before(now)),
+            "notes": len(self.notes),
+            "open_by_quadrant": by_quadrant,  # Квадрант Эйзенхауэра -> открытых задач
+            "time_by_category": time_by_category,  # Категория -> секунд
+            "time_by_task": [(task, task.time_spent) for task in self.top_tasks_by_time(top)],  # Первые top
+            "free_time": sum(entry["time_spent"] for entry in self.free_time_entries),
+            # По журналу сессий: готовые сводки, без обхода истории
+            "work_today": self.sessions.day_total(now),
+            "work_week": self.sessions.week_total(now),
+            "work_month": self.sessions.month_total(now),
+            "month_by_category": self.sessions.month_by_category(now)  # Категория -> секунд за месяц
+        }
+
+    # --- резервные снимки (snapshots.py) ---
+
+    @property
+    def snapshots(self):
+        return self.storage.snapshots
+
+    def create_snapshot(self, label=""):
+        # Без окна: словари записей строятся здесь же. Окно строит снимок в фоновом потоке через snapshot_builder
+        return self.snapshots.create(self.snapshot_builder(), label)
+
+    def begin_restore(self, snapshot_id):
+        # Восстановление в полной точности: записи поколения читаются из сжатых кусков по одной и загружаются
+        # так же, как tasks.json при запуске (порциями через load_records); в конце хранилище переписывается.
+        # Восстановленная версия должна победить при слиянии с другими процессами — записи получают новое
+        # updated_at. Поколение старой версии формата обновляется на лету.
+        # SnapshotError — поколения нет или его куски потеряны (данные при этом не тронуты)
+        self.snapshots.verify(snapshot_id)
+        now = time.time()
+
+        def records():
+            for key, value in migrate_pairs(self.snapshots.iter_records(snapshot_id)):
+                if key in ("tasks", "notes"):
+                    value["updated_at"] = now
+                yield key, value
+
+        self.begin_load(records())
+        self.restoring = True
+
+    def restore_snapshot(self, snapshot_id):
+        self.begin_restore(snapshot_id)
+        while self.loading:
+            self.load_records(self.LOAD_CHUNK)
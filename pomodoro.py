@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import time
+
+WORK = "work"
+REST = "rest"
+
+
+class PomodoroTimer:
+    # Таймер Помидоро без Tk. Оставшееся время считается от дедлайнов time.monotonic(),
+    # поэтому задержки главного цикла не растягивают фазы, а отработанное время не теряется.
+    def __init__(self, work_seconds, rest_seconds, long_break_seconds, cycles_per_set=4, clock=time.monotonic):
+        self.work_seconds = work_seconds
+        self.rest_seconds = rest_seconds
+        self.long_break_seconds = long_break_seconds
+        self.cycles_per_set = cycles_per_set
+        self.clock = clock
+        self.cycles = 0  # Завершённых рабочих фаз в текущем наборе
+        self.total_work = 0.0  # Отработано за всю сессию в завершённых рабочих фазах, сек
+        self.paused_at = None
+        self.running = True
+        self._start_phase(WORK, clock())
+
+    def _start_phase(self, phase, started):
+        self.phase = phase
+        if phase == WORK:
+            self.phase_length = self.work_seconds
+        elif self.cycles >= self.cycles_per_set:
+            self.phase_length = self.long_break_seconds
+        else:
+            self.phase_length = self.rest_seconds
+        self.phase_started = started
+        self.deadline = started + self.phase_length
+
+    @property
+    def paused(self):
+        return self.paused_at is not None
+
+    def now(self):
+        return self.paused_at if self.paused else self.clock()
+
+    def advance(self):
+        # Закрывает все фазы, чьи дедлайны уже прошли, даже если главный цикл долго не просыпался.
+        # Следующая фаза начинается ровно в момент дедлайна предыдущей.
+        # Возвращает список завершённых фаз: (фаза, длительность в секундах, момент окончания по clock).
+        ended = []
+        if not self.running:
+            return ended
+        now = self.now()
+        while now >= self.deadline:
+            ended.append((self.phase, self.phase_length, self.deadline))
+            if self.phase == WORK:
+                self.total_work += self.phase_length
+                self.cycles += 1
+                self._start_phase(REST, self.deadline)
+            else:
+                if self.cycles >= self.cycles_per_set:
+                    self.cycles = 0
+                self._start_phase(WORK, self.deadline)
+        return ended
+
+    def remaining(self):
+        return max(0.0, self.deadline - self.now())
+
+    def elapsed(self):
+        # Сколько прошло в текущей фазе без учёта пауз
+        return self.phase_length - self.remaining()
+
+    def progress(self):
+        return self.elapsed() / self.phase_length * 100
+
+    def current_work(self):
+        return self.elapsed() if self.phase == WORK else 0.0
+
+    def wall_time(self, moment):
+        # Момент по clock -> секунды эпохи (для журнала сессий)
+        return time.time() - (self.clock() - moment)
+
+    def pause(self):
+        if self.running and not self.paused:
+            self.paused_at = self.clock()
+
+    def resume(self):
+        if self.paused:
+            shift = self.clock() - self.paused_at
+            self.phase_started += shift
+            self.deadline += shift
+            self.paused_at = None
+
+    def toggle_pause(self):
+        if self.paused:
+            self.resume()
+        else:
+            self.pause()
+
+    def stop(self):
+        # Возвращает завершённые к этому моменту фазы и точное время незавершённой рабочей фазы
+        ended = self.advance()
+        partial = self.current_work()
+        self.running = False
+        return ended, partial
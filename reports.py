@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# Отчёты по задачам и учтённому времени. Задачи раскладываются по столбцам (срок, статус, время выполнения,
+# квадрант, категория, затраченное время), и каждая метрика считается сразу по целому столбцу:
+# с NumPy — векторными операциями, без него — массивами модуля array и одним общим проходом по задачам.
+# Окно не нужно: отчёт строит planner_cli.py report (например, по расписанию).
+import time
+from array import array
+from datetime import datetime, timedelta
+from operator import attrgetter
+
+try:
+    import numpy as np
+except ImportError:  # Без NumPy те же отчёты, только медленнее
+    np = None
+
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+# Границы корзин гистограммы затраченного времени, сек
+TIME_BINS = (15 * 60, 30 * 60, 3600, 2 * 3600, 4 * 3600, 8 * 3600)
+TIME_BIN_NAMES = ("до 15 мин", "15–30 мин", "30 мин – 1 ч", "1–2 ч", "2–4 ч", "4–8 ч", "8 ч и больше")
+
+
+def local_minutes(moment):
+    # Минуты от 1970-01-01 00:00 по местным часам — в этой шкале хранятся сроки задач
+    return (moment.toordinal() - EPOCH_ORDINAL) * DAY_MINUTES + moment.hour * 60 + moment.minute
+
+
+def due_minutes(due_dates):
+    # "ГГГГ-ММ-ДД ЧЧ:ММ" -> минуты по местным часам
+    if np is not None:
+        return np.array(due_dates, dtype="datetime64[m]").astype(np.int64)
+    return array("q", ((datetime(int(value[:4]), int(value[5:7]), int(value[8:10])).toordinal() - EPOCH_ORDINAL)
+                       * DAY_MINUTES + int(value[11:13]) * 60 + int(value[14:16]) for value in due_dates))
+
+
+def column(typecode, values, count):
+    if np is not None:
+        return np.fromiter(values, dtype={"b": np.int8, "i": np.int32, "q": np.int64, "d": np.float64}[typecode],
+                           count=count)
+    return array(typecode, values)
+
+
+class TaskColumns:
+    # Столбцы по задачам; категории закодированы номерами (categories[код] -> название)
+    def __init__(self, due_dates, completed, completed_at, quadrants, categories, time_spent):
+        # Каждый аргумент — последовательность значений по задачам в одном порядке; categories — список
+        count = len(due_dates)
+        self.size = count
+        self.due = due_minutes(due_dates)
+        self.completed = column("b", completed, count)
+        # Время выполнения переводим из секунд эпохи в минуты по местным часам, как у сроков
+        # (по текущему смещению часового пояса; переход на летнее время даёт погрешность в час).
+        # -1 — время выполнения неизвестно
+        offset = time.localtime().tm_gmtoff / 60
+        if np is not None:
+            seconds = column("d", completed_at, count)
+            self.completed_at = np.where(seconds > 0, seconds / 60 + offset, -1.0)
+        else:
+            self.completed_at = array("d", (value / 60 + offset if value else -1.0 for value in completed_at))
+        self.quadrant = column("b", quadrants, count)
+        self.categories = sorted(set(categories))
+        codes = {name: code for code, name in enumerate(self.categories)}
+        self.category = column("i", map(codes.__getitem__, categories), count)
+        self.time_spent = column("q", time_spent, count)
+
+    @classmethod
+    def from_tasks(cls, tasks):
+        return cls([task.due_date for task in tasks], map(attrgetter("completed"), tasks),
+                   map(attrgetter("completed_at"), tasks), map(attrgetter("priority"), tasks),
+                   [task.category for task in tasks], map(attrgetter("time_spent"), tasks))
+
+
+def build_report(tasks, free_time_entries=(), now=None, weeks=12):
+    # Сводный отчёт в виде словаря (годится и для JSON). tasks — задачи модели (Task)
+    now = now or datetime.now()
+    started = time.perf_counter()
+    columns = TaskColumns.from_tasks(tasks)
+    columns_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    week_start = local_minutes(now.replace(hour=0, minute=0)) - now.weekday() * DAY_MINUTES
+    if np is not None:
+        report = numpy_report(columns, local_minutes(now), week_start, weeks)
+    else:
+        report = python_report(columns, local_minutes(now), week_start, weeks)
+    monday = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=now.weekday())
+    report["throughput"] = [((monday - timedelta(weeks=weeks - 1 - i)).strftime("%Y-%m-%d"), count)
+                            for i, count in enumerate(report["throughput"])]
+    report["free_time"] = sum(entry["time_spent"] for entry in free_time_entries)
+    report["free_time_entries"] = len(free_time_entries)
+    report["generated"] = now.strftime("%Y-%m-%d %H:%M")
+    report["timing_ms"] = {"columns": round(columns_ms, 1),
+                           "report": round((time.perf_counter() - started) * 1000, 1)}
+    return report
+
+
+def numpy_report(columns, now, week_start, weeks):
+    completed = columns.completed.astype(bool)
+    open_ = ~completed
+    overdue = open_ & (columns.due < now)
+    known = completed & (columns.completed_at >= 0)
+    late = known & (columns.completed_at > columns.due)
+    quadrant = columns.quadrant.astype(np.int64)
+    category = columns.category
+    slots = len(columns.categories)
+    # Выполненные за последние weeks недель: номер недели от начала текущей (0 — текущая, -1 — прошлая ...)
+    week = np.floor_divide(columns.completed_at[known] - week_start, WEEK_MINUTES).astype(np.int64) + weeks - 1
+    week = week[(week >= 0) & (week < weeks)]
+    spent = columns.time_spent[columns.time_spent > 0]
+    bins = np.searchsorted(np.array(TIME_BINS), spent, side="right")
+    return summary(
+        size=columns.size, completed=int(completed.sum()), overdue=int(overdue.sum()),
+        known=int(known.sum()), late=int(late.sum()),
+        quadrant_open=np.bincount(quadrant[open_], minlength=5).tolist(),
+        quadrant_completed=np.bincount(quadrant[completed], minlength=5).tolist(),
+        category_tasks=np.bincount(category, minlength=slots).tolist(),
+        category_open=np.bincount(category[open_], minlength=slots).tolist(),
+        category_overdue=np.bincount(category[overdue], minlength=slots).tolist(),
+        category_time=np.bincount(category, weights=columns.time_spent, minlength=slots).tolist(),
+        throughput=np.bincount(week, minlength=weeks).tolist(),
+        bin_count=np.bincount(bins, minlength=len(TIME_BIN_NAMES)).tolist(),
+        bin_time=np.bincount(bins, weights=spent, minlength=len(TIME_BIN_NAMES)).tolist(),
+        categories=columns.categories)
+
+
+def python_report(columns, now, week_start, weeks):
+    slots = len(columns.categories)
+    completed = overdue = known = late = 0
+    quadrant_open, quadrant_completed = [0] * 5, [0] * 5
+    category_tasks, category_open, category_overdue = [0] * slots, [0] * slots, [0] * slots
+    category_time = [0] * slots
+    throughput = [0] * weeks
+    bin_count, bin_time = [0] * len(TIME_BIN_NAMES), [0] * len(TIME_BIN_NAMES)
+    for due, done, done_at, quadrant, category, spent in zip(columns.due, columns.completed, columns.completed_at,
+                                                             columns.quadrant, columns.category, columns.time_spent):
+        category_tasks[category] += 1
+        category_time[category] += spent
+        if done:
+            completed += 1
+            quadrant_completed[quadrant] += 1
+            if done_at >= 0:
+                known += 1
+                if done_at > due:
+                    late += 1
+                week = int((done_at - week_start) // WEEK_MINUTES) + weeks - 1
+                if 0 <= week < weeks:
+                    throughput[week] += 1
+        else:
+            quadrant_open[quadrant] += 1
+            category_open[category] += 1
+            if due < now:
+                overdue += 1
+                category_overdue[category] += 1
+        if spent > 0:
+            slot = 0
+            while slot < len(TIME_BINS) and spent >= TIME_BINS[slot]:
+                slot += 1
+            bin_count[slot] += 1
+            bin_time[slot] += spent
+    return summary(size=columns.size, completed=completed, overdue=overdue, known=known, late=late,
+                   quadrant_open=quadrant_open, quadrant_completed=quadrant_completed,
+                   category_tasks=category_tasks, category_open=category_open, category_overdue=category_overdue,
+                   category_time=category_time, throughput=throughput, bin_count=bin_count, bin_time=bin_time,
+                   categories=columns.categories)
+
+
+def summary(size, completed, overdue, known, late, quadrant_open, quadrant_completed, category_tasks, category_open,
+            category_overdue, category_time, throughput, bin_count, bin_time, categories):
+    open_count = size - completed
+    return {
+        "tasks": size,
+        "completed": completed,
+        "open": open_count,
+        "overdue": overdue,
+        "completion_rate": completed / size if size else 0.0,
+        "overdue_rate": overdue / open_count if open_count else 0.0,  # Доля просроченных среди открытых
+        # Доля выполненных позже срока — среди задач, у которых известно время выполнения
+        "late_rate": late / known if known else 0.0,
+        "quadrants": {quadrant: {"open": quadrant_open[quadrant], "completed": quadrant_completed[quadrant]}
+                      for quadrant in (1, 2, 3, 4)},
+        "categories": {name: {"tasks": category_tasks[code], "open": category_open[code],
+                              "overdue": category_overdue[code], "time_spent": int(category_time[code])}
+                       for code, name in enumerate(categories)},
+        "throughput": throughput,  # Выполнено задач по неделям, от старых к текущей
+        "time_histogram": [{"range": name, "tasks": bin_count[slot], "time_spent": int(bin_time[slot])}
+                           for slot, name in enumerate(TIME_BIN_NAMES)],
+    }
+
+
+def format_report(report):
+    # Текстовый вид отчёта (для окна статистики и командной строки)
+    lines = [
+        f"Отчёт на {report['generated']}",
+        f"Задач: {report['tasks']}, выполнено: {report['completed']} ({report['completion_rate']:.0%}), "
+        f"открыто: {report['open']}",
+        f"Просрочено: {report['overdue']} ({report['overdue_rate']:.0%} открытых), "
+        f"выполнено позже срока: {report['late_rate']:.0%}",
+        "Квадранты (открыто / выполнено): " + ", ".join(f"{quadrant}: {counts['open']} / {counts['completed']}"
+                                                       for quadrant, counts in report["quadrants"].items()),
+        "Выполнено по неделям:",
+    ]
+    peak = max((count for _, count in report["throughput"]), default=0)
+    for week, count in report["throughput"]:
+        bar = "█" * round(count / peak * 30) if peak else ""
+        lines.append(f"  {week}  {count:>6}  {bar}")
+    lines.append("Время по категориям:")
+    for name, row in sorted(report["categories"].items(), key=lambda item: item[1]["time_spent"], reverse=True):
+        lines.append(f"  {name}: {row['time_spent'] / 3600:.1f} ч, задач {row['tasks']}, "
+                     f"открыто {row['open']}, просрочено {row['overdue']}")
+    lines.append(f"  Работа вне плана: {report['free_time'] / 3600:.1f} ч, записей {report['free_time_entries']}")
+    lines.append("Задачи по затраченному времени:")
+    for row in report["time_histogram"]:
+        lines.append(f"  {row['range']:>14}: {row['tasks']:>6} задач, {row['time_spent'] / 3600:.1f} ч")
+    return lines
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import bisect
+import re
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    # \w в Python понимает кириллицу; ё приводим к е, чтобы "ещё" находилось по "еще"
+    return TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+
+class SearchIndex:
+    # Инвертированный индекс: слово -> {id документа: вес}. Документы — задачи и заметки,
+    # обновляются по одному при каждом изменении, без пересборки всего индекса.
+    TITLE_WEIGHT = 3
+    CATEGORY_WEIGHT = 2
+    BODY_WEIGHT = 1
+
+    def __init__(self):
+        self.postings = {}  # слово -> {id: вес}
+        self.vocabulary = []  # Отсортированные слова для поиска по префиксу
+        self.doc_tokens = {}  # id -> слова документа (для удаления)
+        self.doc_kind = {}  # id -> "task" | "note"
+        self.doc_category = {}  # id -> категория
+        self.bulk_loading = False
+
+    def __len__(self):
+        return len(self.doc_kind)
+
+    def rebuild(self, tasks, notes):
+        self.__init__()
+        self.start_bulk()
+        for task in tasks:
+            self.add_task(task)
+        for note in notes:
+            self.add_note(note)
+        self.finish_bulk()
+
+    def start_bulk(self):
+        # Массовая загрузка: словарь сортируем один раз в конце, а не вставкой на каждое слово
+        self.bulk_loading = True
+
+    def finish_bulk(self):
+        self.bulk_loading = False
+        self.vocabulary = sorted(self.postings)
+
+    def add_task(self, task):
+        self.add(task.id, "task", task.category,
+                 ((task.title, self.TITLE_WEIGHT), (task.category, self.CATEGORY_WEIGHT),
+                  (task.comment, self.BODY_WEIGHT)))
+
+    def add_note(self, note):
+        self.add(note.id, "note", note.category,
+                 ((note.title, self.TITLE_WEIGHT - self.BODY_WEIGHT), (note.category, self.CATEGORY_WEIGHT),
+                  (note.text, self.BODY_WEIGHT)))
+
+    def add(self, doc_id, kind, category, fields):
+        self.remove(doc_id)
+        weights = {}
+        for text, weight in fields:
+            for token in tokenize(text or ""):
+                weights[token] = weights.get(token, 0) + weight
+        for token, weight in weights.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                if not self.bulk_loading:
+                    bisect.insort(self.vocabulary, token)
+            posting[doc_id] = weight
+        self.doc_tokens[doc_id] = tuple(weights)
+        self.doc_kind[doc_id] = kind
+        self.doc_category[doc_id] = category
+
+    def remove(self, doc_id):
+        tokens = self.doc_tokens.pop(doc_id, None)
+        if tokens is None:
+            return
+        del self.doc_kind[doc_id]
+        del self.doc_category[doc_id]
+        for token in tokens:
+            posting = self.postings[token]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[token]
+                if not self.bulk_loading:
+                    del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def _term_scores(self, term):
+        # Точное совпадение слова весит вдвое больше, чем совпадение по префиксу
+        scores = {}
+        start = bisect.bisect_left(self.vocabulary, term)
+        for i in range(start, len(self.vocabulary)):
+            token = self.vocabulary[i]
+            if not token.startswith(term):
+                break
+            posting = self.postings.get(token)
+            if posting is None:
+                continue  # Массовая загрузка: удалённое слово ещё в словаре, он пересортируется в finish_bulk
+            factor = 2 if token == term else 1
+            for doc_id, weight in posting.items():
+                score = weight * factor
+                if score > scores.get(doc_id, 0):
+                    scores[doc_id] = score
+        return scores
+
+    def search(self, query, category=None, kind=None):
+        # Все слова запроса должны встретиться (И); каждое слово ищется как префикс.
+        # Возвращает id документов, лучшие совпадения первыми.
+        terms = tokenize(query)
+        if terms:
+            # Начинаем с самого редкого слова, чтобы пересечения были короче
+            term_scores = sorted((self._term_scores(term) for term in set(terms)), key=len)
+            result = dict(term_scores[0])
+            for scores in term_scores[1:]:
+                result = {doc_id: score + scores[doc_id] for doc_id, score in result.items() if doc_id in scores}
+                if not result:
+                    break
+        else:
+            result = dict.fromkeys(self.doc_kind, 0)
+        if category is not None:
+            result = {doc_id: score for doc_id, score in result.items() if self.doc_category[doc_id] == category}
+        if kind is not None:
+            result = {doc_id: score for doc_id, score in result.items() if self.doc_kind[doc_id] == kind}
+        return sorted(result, key=result.get, reverse=True)
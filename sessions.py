@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+from datetime import datetime, timedelta
+
+from file_lock import FileLock
+from pomodoro import REST, WORK
+from storage import write_json_atomic
+
+NO_TASK = "Без задачи"  # Категория сессий, запущенных без выбранной задачи
+ROLLUPS = ("day", "week", "month", "task", "category", "month_category")
+
+
+def empty_rollups():
+    return {kind: {name: {} for name in ROLLUPS} for kind in (WORK, REST)}
+
+
+def day_key(moment):
+    return moment.strftime("%Y-%m-%d")
+
+
+def week_key(moment):
+    year, week, _ = moment.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(moment):
+    return moment.strftime("%Y-%m")
+
+
+def split_by_day(start, end):
+    # Интервал [start, end) в секундах эпохи -> куски по локальным суткам: (начало куска, секунд)
+    while start < end:
+        moment = datetime.fromtimestamp(start)
+        midnight = datetime(moment.year, moment.month, moment.day) + timedelta(days=1)
+        piece_end = min(end, midnight.timestamp())
+        yield moment, piece_end - start
+        start = piece_end
+
+
+class SessionLog:
+    # Журнал сессий Помидоро: каждая рабочая фаза и каждый отдых — строка в sessions.jsonl,
+    # файл только дописывается. По мере записи ведутся сводки (за день, неделю, месяц, по задаче,
+    # по категории, по категории за месяц), так что статистика не пересчитывает историю.
+    # Сводки сохраняются в sessions_rollup.json вместе со смещением в журнале; при следующем запуске
+    # дочитывается только хвост журнала — в том числе сессии, записанные другими процессами.
+    SAVE_EVERY = 50  # Через сколько новых сессий сохранять сводки, не дожидаясь закрытия
+
+    def __init__(self, path="sessions.jsonl"):
+        self.path = path
+        self.rollup_path = os.path.splitext(path)[0] + "_rollup.json"
+        self.lock = FileLock(path + ".lock")
+        self.rollups = empty_rollups()
+        self.offset = 0  # Сколько байт журнала уже учтено в сводках
+        self.unsaved = 0
+        self.loaded = False
+
+    # --- запись ---
+
+    def record(self, kind, start, end, task_id=None, category=NO_TASK):
+        # kind: work или rest; start и end — секунды эпохи
+        self.ensure_loaded()
+        event = {"kind": kind, "start": round(start, 3), "end": round(end, 3), "task_id": task_id,
+                 "category": category}
+        with self.lock.exclusive():
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.refresh()
+        return event
+
+    def refresh(self):
+        # Учесть строки, дописанные после offset (свои и чужие). Незаконченную последнюю строку
+        # (другой процесс ещё пишет) оставляем на следующий раз
+        self.ensure_loaded()
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                tail = f.read()
+        except FileNotFoundError:
+            return 0
+        end = tail.rfind(b"\n") + 1
+        added = 0
+        for line in tail[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self.add(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                continue  # Битую строку пропускаем, а не теряем весь журнал
+            added += 1
+        self.offset += end
+        self.unsaved += added
+        if self.unsaved >= self.SAVE_EVERY:
+            self.save()
+        return added
+
+    def add(self, event):
+        rollups = self.rollups[event["kind"]]
+        category = event.get("category") or NO_TASK
+        for moment, seconds in split_by_day(float(event["start"]), float(event["end"])):
+            month = month_key(moment)
+            self.bump(rollups["day"], day_key(moment), seconds)
+            self.bump(rollups["week"], week_key(moment), seconds)
+            self.bump(rollups["month"], month, seconds)
+            self.bump(rollups["category"], category, seconds)
+            self.bump(rollups["month_category"].setdefault(month, {}), category, seconds)
+            if event.get("task_id"):
+                self.bump(rollups["task"], event["task_id"], seconds)
+
+    @staticmethod
+    def bump(totals, key, seconds):
+        totals[key] = totals.get(key, 0.0) + seconds
+
+    # --- сводки: каждая — одно обращение к словарю ---
+
+    def day_total(self, moment=None, kind=WORK):
+        return self.total("day", day_key(moment or datetime.now()), kind)
+
+    def week_total(self, moment=None, kind=WORK):
+        return self.total("week", week_key(moment or datetime.now()), kind)
+
+    def month_total(self, moment=None, kind=WORK):
+        return self.total("month", month_key(moment or datetime.now()), kind)
+
+    def task_total(self, task_id, kind=WORK):
+        return self.total("task", task_id, kind)
+
+    def category_total(self, category, kind=WORK):
+        return self.total("category", category, kind)
+
+    def category_month_total(self, category, moment=None, kind=WORK):
+        self.ensure_loaded()
+        return self.rollups[kind]["month_category"].get(month_key(moment or datetime.now()), {}).get(category, 0.0)
+
+    def month_by_category(self, moment=None, kind=WORK):
+        # Категория -> секунд за месяц
+        self.ensure_loaded()
+        return dict(self.rollups[kind]["month_category"].get(month_key(moment or datetime.now()), {}))
+
+    def by_task(self, kind=WORK):
+        self.ensure_loaded()
+        return dict(self.rollups[kind]["task"])
+
+    def total(self, rollup, key, kind=WORK):
+        self.ensure_loaded()
+        return self.rollups[kind][rollup].get(key, 0.0)
+
+    # --- чтение журнала целиком (для отчётов) ---
+
+    def iter_events(self):
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    # --- сводки на диске ---
+
+    def ensure_loaded(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        try:
+            with open(self.rollup_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            size = os.path.getsize(self.path)
+            # Журнал заменили или обрезали — сводки к нему не относятся, пересчитываем с начала
+            if cached["offset"] <= size and cached.get("head") == self.head():
+                self.rollups = cached["rollups"]
+                self.offset = cached["offset"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.rollups = empty_rollups()
+            self.offset = 0
+        self.refresh()
+
+    def head(self):
+        # Первая строка журнала отличает «тот же журнал, дописанный» от «другого журнала»
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return f.readline()
+        except OSError:
+            return ""
+
+    def save(self):
+        if not self.loaded or not self.offset:
+            return
+        write_json_atomic(self.rollup_path, {"offset": self.offset, "head": self.head(), "rollups": self.rollups})
+        self.unsaved = 0
+
+    def close(self):
+        if self.unsaved:
+            self.save()
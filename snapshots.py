@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# Резервные снимки данных: несколько поколений, сжатых gzip или lzma, с дедупликацией по содержимому.
+# Списки записей (задачи, заметки, категории, записи времени) режутся на куски по границам, которые
+# задают сами записи (по crc32 id), поэтому правка или удаление задачи меняет только свой кусок.
+# Кусок хранится один раз под хешем своего содержимого: неизменённые данные новых байт не добавляют.
+# Поколение — манифест со списками хешей; восстановление читает куски потоково, запись за записью.
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import time
+import uuid
+import zlib
+from datetime import datetime
+
+from file_lock import FileLock
+
+CODECS = {"gzip": ".jsonl.gz", "lzma": ".jsonl.xz"}
+KEEP = 10  # Сколько поколений хранить
+CHUNK_RECORDS = 512  # Средний размер куска в записях
+MAX_CHUNK_RECORDS = 4 * CHUNK_RECORDS
+SECTIONS = ("categories", "free_time_entries", "tasks", "notes", "tombstones")  # Порядок, в котором их ждёт загрузка
+ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def chunk_records(records):
+    # Куски закодированных записей. Кусок заканчивается на записи, crc32 id (или содержимого) которой
+    # делится на CHUNK_RECORDS, — границы не сдвигаются, когда в начало списка вставляют или из него удаляют
+    chunk = []
+    for record in records:
+        line = ENCODER.encode(record)
+        chunk.append(line)
+        key = record.get("id") if isinstance(record, dict) else None
+        crc = zlib.crc32((key or line).encode("utf-8"))
+        if crc % CHUNK_RECORDS == 0 or len(chunk) >= MAX_CHUNK_RECORDS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def open_object(path, mode):
+    if ".xz" in path:
+        return lzma.open(path, mode)
+    return gzip.open(path, mode, compresslevel=6)  # 9 по умолчанию заметно медленнее при почти том же размере
+
+
+class SnapshotStore:
+    def __init__(self, directory="snapshots", keep=KEEP, codec="gzip"):
+        if codec not in CODECS:
+            raise ValueError(f"неизвестное сжатие: {codec}")
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.manifests_dir = os.path.join(directory, "manifests")
+        self.keep = keep
+        self.codec = codec
+        self.lock_path = directory + ".lock"
+
+    @property
+    def lock(self):
+        # Файл блокировки рядом с каталогом, а не внутри: каталога может ещё не быть
+        return FileLock(self.lock_path)
+
+    # --- создание ---
+
+    def create(self, data, label=""):
+        # data — словарь в формате tasks.json или функция, которая его построит. Возвращает описание
+        # поколения; если данные не изменились с последнего снимка, новое поколение не создаётся
+        # и возвращается последнее (с unchanged=True)
+        if callable(data):
+            data = data()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        with self.lock.exclusive():
+            sections, values, counts = {}, {}, {}
+            written = 0
+            for key, value in data.items():
+                if not isinstance(value, list):
+                    values[key] = value
+                    continue
+                sections[key] = []
+                counts[key] = len(value)
+                for chunk in chunk_records(value):
+                    digest, size = self.put_object(chunk)
+                    sections[key].append(digest)
+                    written += size
+            latest = self.latest()
+            if latest is not None and latest["sections"] == sections and latest["values"] == values:
+                return dict(latest, unchanged=True)
+            now = time.time()
+            snapshot_id = datetime.fromtimestamp(now).strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+            manifest = {"id": snapshot_id, "created": now, "label": label, "codec": self.codec,
+                        "sections": sections, "values": values, "counts": counts, "new_bytes": written}
+            tmp_path = self.manifest_path(snapshot_id) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.manifest_path(snapshot_id))
+            self.prune()
+        return manifest
+
+    def create_if_due(self, data, interval, label=""):
+        # Не чаще раза в interval секунд (по времени последнего поколения)
+        latest = self.latest()
+        if latest is not None and time.time() - latest["created"] < interval:
+            return None
+        return self.create(data, label)
+
+    def put_object(self, lines):
+        # Возвращает хеш куска и сколько байт записано (0 — такой кусок уже есть)
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+        digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+        if self.object_path(digest) is not None:
+            return digest, 0
+        path = os.path.join(self.objects_dir, digest[:2], digest + CODECS[self.codec])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open_object(path + ".tmp", "wb") as f:
+            f.write(payload)
+        os.replace(path + ".tmp", path)
+        return digest, os.path.getsize(path)
+
+    def object_path(self, digest):
+        for extension in CODECS.values():
+            path = os.path.join(self.objects_dir, digest[:2], digest + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def manifest_path(self, snapshot_id):
+        return os.path.join(self.manifests_dir, snapshot_id + ".json")
+
+    # --- список и чтение ---
+
+    def ids(self):
+        # Поколения от старых к новым: имя манифеста начинается с даты и времени
+        try:
+            names = os.listdir(self.manifests_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(".json")] for name in names if name.endswith(".json"))
+
+    def manifest(self, snapshot_id):
+        try:
+            with open(self.manifest_path(snapshot_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise SnapshotError(f"снимок {snapshot_id} не найден")
+        except ValueError as e:
+            raise SnapshotError(f"снимок {snapshot_id} повреждён: {e}")
+
+    def latest(self):
+        ids = self.ids()
+        return self.manifest(ids[-1]) if ids else None
+
+    def list(self):
+        # Описания поколений, новые первыми
+        return [self.manifest(snapshot_id) for snapshot_id in reversed(self.ids())]
+
+    def iter_records(self, snapshot_id):
+        # (ключ, элемент) по одному — как storage.iter_snapshot, но из сжатых кусков
+        manifest = self.manifest(snapshot_id)
+        for key, value in manifest["values"].items():
+            yield key, value
+        sections = manifest["sections"]
+        for key in [key for key in SECTIONS if key in sections] + [key for key in sections if key not in SECTIONS]:
+            for digest in sections[key]:
+                path = self.object_path(digest)
+                if path is None:
+                    raise SnapshotError(f"снимок {snapshot_id}: нет куска {digest}")
+                with open_object(path, "rb") as f:
+                    for line in f:
+                        yield key, json.loads(line)
+
+    def verify(self, snapshot_id):
+        # Все ли куски поколения на месте — до того, как восстановление начнёт заменять данные
+        manifest = self.manifest(snapshot_id)
+        for digests in manifest["sections"].values():
+            for digest in digests:
+                if self.object_path(digest) is None:
+                    raise SnapshotError(f"снимок {snapshot_id}: нет куска {digest}")
+        return manifest
+
+    def load(self, snapshot_id):
+        # Снимок целиком в виде словаря (для восстановления после повреждения tasks.json)
+        data = {}
+        sections = self.manifest(snapshot_id)["sections"]
+        for key, value in self.iter_records(snapshot_id):
+            if key in sections:
+                data.setdefault(key, []).append(value)
+            else:
+                data[key] = value
+        return data
+
+    # --- хранение N поколений ---
+
+    def prune(self):
+        # Старые поколения удаляются, затем куски, на которые больше не ссылается ни одно поколение
+        ids = self.ids()
+        for snapshot_id in ids[:-self.keep] if self.keep else []:
+            os.remove(self.manifest_path(snapshot_id))
+        used = set()
+        for snapshot_id in self.ids():
+            for digests in self.manifest(snapshot_id)["sections"].values():
+                used.update(digests)
+        removed = 0
+        for root, _, names in os.walk(self.objects_dir):
+            for name in names:
+                if name.split(".", 1)[0] not in used:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+        return removed
+
+    def size(self):
+        # Сколько байт занимают все поколения вместе
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+        return total
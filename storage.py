@@ -0,0 +1,837 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from file_lock import FileLock
+from snapshots import SnapshotError, SnapshotStore
+
+DEFAULT_CATEGORIES = ["Без категории", "Работа", "Личное", "Срочное"]
+# Списки в tasks.json, в порядке загрузки; tombstones — удалённые записи (kind, id, deleted_at)
+LIST_KEYS = ("categories", "free_time_entries", "tasks", "notes", "tombstones")
+# Один кодировщик на все записи журнала и снимка: json.dumps с ensure_ascii=False создаёт новый на каждый вызов
+ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+class CorruptDataError(Exception):
+    pass
+
+
+def empty_data():
+    return {"tasks": [], "notes": [], "categories": list(DEFAULT_CATEGORIES), "free_time_entries": [],
+            "tombstones": []}
+
+
+def read_snapshot(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+    except FileNotFoundError:
+        return empty_data()
+    if not content:
+        return empty_data()
+    try:
+        raw = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise CorruptDataError(f"{path}: {e}")
+    if not isinstance(raw, dict):
+        raise CorruptDataError(f"{path}: ожидался словарь с 'tasks'")
+    data = empty_data()
+    if "schema_version" in raw:
+        data = {"schema_version": raw["schema_version"], **data}  # Порядок ключей как в файле: версия первой
+    data.update(raw)
+    return data
+
+
+WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+NUMBER_TAIL_RE = re.compile(r"[0-9.eE+\-]*")
+
+
+class StreamReader:
+    # Читает JSON-файл кусками и разбирает значения по одному через raw_decode,
+    # так что в памяти одновременно только текущий кусок текста и текущая запись.
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        # Следующий значащий символ (без пробелов) или None в конце файла
+        while True:
+            self.pos = WHITESPACE_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise CorruptDataError(f"ожидался '{char}' в позиции {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self.fill():
+                    continue  # Значение обрезано границей куска — дочитываем
+                raise CorruptDataError(str(e))
+            # Число на границе куска могло быть обрезано ("2." из "2.5e3") — дочитываем и разбираем заново
+            if (isinstance(value, (int, float)) and NUMBER_TAIL_RE.fullmatch(self.buf, end)
+                    and not self.eof and self.fill()):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_snapshot(path):
+    # Потоковый разбор tasks.json: для списков (tasks, notes, categories, free_time_entries)
+    # отдаёт (ключ, элемент) по одному элементу, для прочих значений — (ключ, значение).
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        reader = StreamReader(f)
+        if reader.peek() is None:
+            return  # Пустой файл
+        try:
+            reader.expect("{")
+            if reader.peek() == "}":
+                return
+            while True:
+                key = reader.value()
+                reader.expect(":")
+                if reader.peek() == "[":
+                    reader.pos += 1
+                    if reader.peek() == "]":
+                        reader.pos += 1
+                    else:
+                        while True:
+                            yield key, reader.value()
+                            if reader.peek() == ",":
+                                reader.pos += 1
+                                continue
+                            reader.expect("]")
+                            break
+                else:
+                    yield key, reader.value()
+                if reader.peek() == ",":
+                    reader.pos += 1
+                    continue
+                reader.expect("}")
+                break
+        except CorruptDataError as e:
+            raise CorruptDataError(f"{path}: {e}")
+
+
+def iter_data(data):
+    # То же, что iter_snapshot, но для уже загруженного словаря
+    for key in LIST_KEYS:
+        for item in data[key]:
+            yield key, item
+
+
+class JsonWriter:
+    # Потоковая запись файла в формате tasks.json: словарь верхнего уровня с отступами, элементы списков —
+    # по одному в строке. json.dump с indent кодирует на чистом Python, и после импорта сотен тысяч задач
+    # снимок писался дольше самого импорта; здесь каждая запись кодируется на C
+    def __init__(self, f):
+        self.f = f
+        self.keys = 0
+        self.list_key = None  # Ключ открытого списка
+        self.items = 0
+
+    def value(self, key, value):
+        self.close_list()
+        self.write_key(key)
+        self.f.write(ENCODER.encode(value))
+
+    def item(self, key, item):
+        # Элементы одного списка должны идти подряд
+        if self.list_key != key:
+            self.close_list()
+            self.write_key(key)
+            self.f.write("[")
+            self.list_key = key
+            self.items = 0
+        self.f.write(("," if self.items else "") + "\n        " + ENCODER.encode(item))
+        self.items += 1
+
+    def write_key(self, key):
+        self.f.write(("," if self.keys else "{") + "\n    " + ENCODER.encode(key) + ": ")
+        self.keys += 1
+
+    def close_list(self):
+        if self.list_key is not None:
+            self.f.write("\n    ]")
+            self.list_key = None
+
+    def close(self):
+        self.close_list()
+        self.f.write("\n}\n" if self.keys else "{}\n")
+
+
+@contextmanager
+def atomic_json(path):
+    # JsonWriter во временный файл, который заменяет path только после успешной записи
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            writer = JsonWriter(f)
+            yield writer
+            writer.close()
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data):
+    # schema_version — всегда первым ключом: migrations.file_version читает только первую пару
+    with atomic_json(path) as writer:
+        for key in sorted(data, key=lambda key: key != "schema_version"):
+            value = data[key]
+            if isinstance(value, list) and value:
+                for item in value:
+                    writer.item(key, item)
+            else:
+                writer.value(key, value)
+
+
+def snapshot_store(path):
+    # Поколения резервных снимков лежат в каталоге snapshots рядом с файлом данных
+    return SnapshotStore(os.path.join(os.path.dirname(path), "snapshots"))
+
+
+def read_backup(snapshots, legacy_path):
+    # Последнее поколение снимков; пока их нет — резервная копия прежнего формата (tasks_backup.json).
+    # Копия могла быть сделана до обновления формата — приводим её к текущей версии.
+    # Нет ни того ни другого (или всё повреждено) — пустые данные
+    from migrations import migrate_data
+    try:
+        latest = snapshots.latest()
+        if latest is None:
+            data = read_snapshot(legacy_path)
+        else:
+            data = empty_data()
+            data.update(snapshots.load(latest["id"]))
+    except (CorruptDataError, SnapshotError):
+        data = empty_data()
+    return migrate_data(data)
+
+
+def task_quadrant(record):
+    # Квадрант Эйзенхауэра: 1 — важно и срочно, 2 — важно, 3 — срочно, 4 — ни то ни другое
+    importance = record.get("importance", False)
+    urgency = record.get("urgency", False)
+    if importance:
+        return 1 if urgency else 2
+    return 3 if urgency else 4
+
+
+def match_task(record, category=None, completed=None, quadrant=None, due_from=None, due_to=None):
+    if category is not None and record.get("category", "Без категории") != category:
+        return False
+    if completed is not None and bool(record.get("completed", False)) != completed:
+        return False
+    if quadrant is not None and task_quadrant(record) != quadrant:
+        return False
+    # Срок хранится как "YYYY-MM-DD HH:MM", такие строки сравниваются как даты
+    if due_from is not None and record["due_date"] < due_from:
+        return False
+    if due_to is not None and record["due_date"] > due_to:
+        return False
+    return True
+
+
+def apply_ops(data, ops):
+    # Накладывает операции журнала на словарь данных. Конфликты решаются по записи, а не по файлу:
+    # из двух правок одной задачи остаётся более поздняя (updated_at), удаление не отменяет более позднюю правку.
+    # Удаления запоминаются (tombstones): запись, удалённая в одном процессе, не вернётся из более старой
+    # правки другого, в каком бы порядке ни сливались их журналы и снимки
+    collections = {"task": {record["id"]: record for record in data["tasks"]},
+                   "note": {record["id"]: record for record in data["notes"]}}
+    tombstones = {tombstone["id"]: tombstone for tombstone in data.get("tombstones", [])}
+    for op in ops:
+        if op["op"] == "put":
+            records = collections[op["kind"]]
+            current = records.get(op["record"]["id"])
+            tombstone = tombstones.get(op["record"]["id"])
+            if tombstone is not None and op["record"].get("updated_at", 0) <= tombstone["deleted_at"]:
+                continue
+            if current is None or op["record"].get("updated_at", 0) >= current.get("updated_at", 0):
+                records[op["record"]["id"]] = op["record"]
+        elif op["op"] == "delete":
+            records = collections[op["kind"]]
+            current = records.get(op["id"])
+            at = op.get("at", float("inf"))
+            if current is not None and current.get("updated_at", 0) <= at:
+                del records[op["id"]]
+            if at != float("inf") and (op["id"] not in tombstones or tombstones[op["id"]]["deleted_at"] < at):
+                tombstones[op["id"]] = {"kind": op["kind"], "id": op["id"], "deleted_at": at}
+        elif op["op"] == "set":
+            data[op["key"]] = op["value"]
+        elif op["op"] == "append":
+            data[op["key"]].append(op["value"])
+        elif op["op"] == "snapshot":
+            # Записи, которых нет в чужом снимке и которые здесь не менялись после since, удалены там
+            for kind, records in collections.items():
+                for record_id in [record_id for record_id, record in records.items()
+                                  if record_id not in op["ids"][kind] and record.get("updated_at", 0) <= op["since"]]:
+                    del records[record_id]
+    data["tasks"] = list(collections["task"].values())
+    data["notes"] = list(collections["note"].values())
+    data["tombstones"] = list(tombstones.values())
+
+
+def snapshot_ops(data, since):
+    # Чужой снимок в виде операций: записи — put, списки — set, запомненные удаления — delete
+    # и отметка snapshot со всеми id, по которой видно, какие записи удалены в другом процессе
+    ops = [{"op": "set", "key": "categories", "value": data["categories"]},
+           {"op": "set", "key": "free_time_entries", "value": data["free_time_entries"]}]
+    ops.extend({"op": "put", "kind": "task", "record": record} for record in data["tasks"])
+    ops.extend({"op": "put", "kind": "note", "record": record} for record in data["notes"])
+    ops.extend({"op": "delete", "kind": tombstone["kind"], "id": tombstone["id"], "at": tombstone["deleted_at"]}
+               for tombstone in data.get("tombstones", []))
+    ops.append({"op": "snapshot", "since": since,
+                "ids": {"task": {record["id"] for record in data["tasks"]},
+                        "note": {record["id"] for record in data["notes"]}}})
+    return ops
+
+
+class JsonStorage:
+    # Снимок tasks.json + журнал операций рядом с ним (tasks.json.journal).
+    # Каждое изменение дописывается в журнал одной строкой, снимок переписывается
+    # только при уплотнении — через временный файл и os.replace.
+    # С файлами могут работать несколько процессов (два окна, окно и planner_cli.py): запись в журнал
+    # и уплотнение идут под блокировкой tasks.json.lock, чужие изменения обнаруживаются по stat() снимка
+    # и размеру журнала и сливаются по записям (apply_ops), а не затирают файл целиком.
+    COMPACT_AFTER = 500  # Операций в журнале, после которых стоит уплотнить
+    BACKUP_INTERVAL = 3600  # Резервный снимок создаётся не чаще раза в час, сек
+    SYNC_MARGIN = 5.0  # Записи, изменённые здесь за столько секунд до синхронизации, чужой снимок не удаляет
+    compact_on_close = True  # Журнал при выходе сворачиваем в снимок, чтобы следующий запуск читал его потоково
+
+    def __init__(self, path="tasks.json", backup_path="tasks_backup.json", snapshots=None):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.backup_path = backup_path  # Резервная копия прежнего формата: читается, пока нет снимков
+        self.snapshots = snapshots if snapshots is not None else snapshot_store(path)
+        self.lock = FileLock(path + ".lock")
+        self.mutex = threading.RLock()  # Между потоком интерфейса и потоком записи
+        self.source = uuid.uuid4().hex  # Метка этого процесса в строках журнала
+        self.identity = None  # stat() снимка на момент последней синхронизации
+        self.journal_offset = 0  # Докуда журнал уже прочитан, байт
+        self.synced_at = 0.0  # Когда последний раз видели состояние диска целиком
+        self.incoming = []  # Чужие изменения, слитые при уплотнении, — их заберёт poll_changes
+        self.pending_ops = 0
+
+    def snapshot_identity(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def ensure_schema(self):
+        # Файл старой версии формата обновляется один раз: потоково и под исключительной блокировкой
+        from migrations import SCHEMA_VERSION, file_version, migrate_file
+        version = file_version(self.path)
+        if version is None or version >= SCHEMA_VERSION:
+            return
+        with self.mutex, self.lock.exclusive():
+            version = file_version(self.path)  # Другой процесс мог обновить файл раньше
+            if version is not None and version < SCHEMA_VERSION:
+                migrate_file(self.path)
+
+    def iter_load(self):
+        self.ensure_schema()
+        if os.path.exists(self.journal_path):
+            # После сбоя журнал нужно наложить на весь снимок — здесь загружаем целиком
+            yield from iter_data(self.load())
+            return
+        # Снимок заменяется только через os.replace, так что открытый файл читается целиком
+        # в одной версии и без блокировки; изменения после этого момента найдёт poll_changes
+        with self.mutex:
+            self.identity = self.snapshot_identity()
+            self.journal_offset = 0
+            self.synced_at = time.time()
+        yield from iter_snapshot(self.path)
+
+    def load(self):
+        self.ensure_schema()
+        with self.mutex, self.lock.shared():
+            self.identity = self.snapshot_identity()
+            self.synced_at = time.time()
+            data = read_snapshot(self.path)
+            self.journal_offset = self.replay_journal(data)
+        if self.journal_offset:
+            self.compact(data)
+        return data
+
+    def read_journal(self, start=0, foreign_only=False):
+        # Возвращает операции с позиции start и позицию после последней целой строки.
+        # foreign_only — только чужие операции: свои строки узнаются по концу (src пишется последним)
+        # и не разбираются — после импорта их сотни тысяч
+        try:
+            f = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return [], 0
+        own = (', "src": ' + ENCODER.encode(self.source) + "}\n").encode("utf-8") if foreign_only else None
+        ops = []
+        offset = start
+        with f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Строку ещё дописывают или она оборвана сбоем
+                if own is not None and line.endswith(own):
+                    offset += len(line)
+                    continue
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                ops.append(op)
+                offset += len(line)
+        return ops, offset
+
+    def replay_journal(self, data):
+        # Возвращает, сколько байт журнала наложено (0 — журнала нет)
+        ops, offset = self.read_journal()
+        apply_ops(data, ops)
+        return offset
+
+    def write_op(self, op):
+        self.write_batch([op])
+
+    def write_batch(self, ops):
+        # Пачка операций — одна запись в журнал и один fsync. Файл открывается заново на каждую пачку:
+        # другой процесс мог уплотнить данные и начать новый журнал
+        encode = ENCODER.encode
+        lines = "".join(encode(dict(op, src=self.source)) + "\n" for op in ops)
+        with self.mutex, self.lock.exclusive():
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending_ops += len(ops)
+
+    def put(self, kind, record):
+        self.write_op({"op": "put", "kind": kind, "record": record})
+
+    def delete(self, kind, record_id, at=None):
+        self.write_op({"op": "delete", "kind": kind, "id": record_id, "at": at or time.time()})
+
+    def set(self, key, value):
+        self.write_op({"op": "set", "key": key, "value": value})
+
+    def append(self, key, value):
+        self.write_op({"op": "append", "key": key, "value": value})
+
+    def needs_compaction(self):
+        return self.pending_ops >= self.COMPACT_AFTER
+
+    def has_journal(self):
+        # Есть изменения, ещё не свёрнутые в снимок (свои или чужие)
+        return os.path.exists(self.journal_path)
+
+    def poll_changes(self):
+        # Дешёвая проверка: stat() снимка и размер журнала. Возвращает операции других процессов
+        # с прошлой проверки; если другой процесс уплотнил данные — его снимок в виде операций
+        if not self.mutex.acquire(blocking=False):
+            return []  # Поток записи занят диском — проверим в следующий раз
+        try:
+            now = time.time()
+            ops, self.incoming = self.incoming, []
+            if self.snapshot_identity() != self.identity:
+                with self.lock.shared():
+                    identity = self.snapshot_identity()
+                    data = read_snapshot(self.path)
+                    journal_ops, offset = self.read_journal(foreign_only=True)
+                ops.extend(snapshot_ops(data, self.synced_at - self.SYNC_MARGIN))
+                ops.extend(journal_ops)
+                self.identity = identity
+                self.journal_offset = offset
+            elif os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > self.journal_offset:
+                with self.lock.shared():
+                    journal_ops, self.journal_offset = self.read_journal(self.journal_offset, foreign_only=True)
+                ops.extend(journal_ops)
+            self.synced_at = now
+            return ops
+        finally:
+            self.mutex.release()
+
+    def merge_foreign(self, data):
+        # Перед уплотнением (под исключительной блокировкой) вливаем в снимок чужие изменения,
+        # чтобы не затереть их своим состоянием
+        identity = self.snapshot_identity()
+        if identity is not None and identity != self.identity:
+            try:
+                disk = read_snapshot(self.path)
+            except CorruptDataError:
+                return  # Повреждённый чужой снимок заменяем своим целиком
+            self.replay_journal(disk)
+            ops = snapshot_ops(disk, self.synced_at - self.SYNC_MARGIN)
+        else:
+            ops, _ = self.read_journal(self.journal_offset, foreign_only=True)
+        if ops:
+            apply_ops(data, ops)
+            self.incoming.extend(ops)
+
+    def compact(self, data):
+        # data — снимок или функция, которая его построит (так снимок собирается в потоке записи)
+        if callable(data):
+            data = data()
+        with self.mutex, self.lock.exclusive():
+            self.merge_foreign(data)
+            self.write_snapshot(data)
+
+    def write_snapshot(self, data):
+        now = time.time()
+        write_json_atomic(self.path, data)
+        # Снимок на диске, журнал больше не нужен
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.identity = self.snapshot_identity()
+        self.journal_offset = 0
+        self.synced_at = now
+        self.pending_ops = 0
+        # Неизменённые куски данных в новом поколении места не занимают
+        self.snapshots.create_if_due(data, self.BACKUP_INTERVAL)
+
+    def recover(self):
+        # Повреждённый снимок не перезаписываем, а откладываем рядом для ручного разбора;
+        # данные собираем из последнего резервного снимка и журнала
+        corrupt_path = self.path + ".corrupt"
+        with self.mutex, self.lock.exclusive():
+            os.replace(self.path, corrupt_path)
+            data = read_backup(self.snapshots, self.backup_path)
+            self.replay_journal(data)
+            self.write_snapshot(data)
+        return corrupt_path, data
+
+    indexed = False  # query_tasks — полный проход по файлу: отбор в памяти (views.py) быстрее
+
+    def query_tasks(self, order="due_date", **filters):
+        # Без индексов: полный проход по снимку с журналом
+        with self.lock.shared():
+            data = read_snapshot(self.path)
+            self.replay_journal(data)
+        tasks = [record for record in data["tasks"] if match_task(record, **filters)]
+        if order == "due_date":
+            tasks.sort(key=lambda record: (record["due_date"], record["id"]))
+        return tasks
+
+    def close(self):
+        pass
+
+
+class SqliteStorage:
+    # Хранилище в tasks.db (stdlib sqlite3). Каждая операция — отдельная короткая транзакция,
+    # выборки по сроку, категории, статусу и квадранту (query_tasks) идут по индексам.
+    TASK_FIELDS = ("id", "title", "due_date", "category", "comment", "time_spent", "completed", "importance",
+                   "urgency", "completed_at", "updated_at")
+    TASK_COLUMNS = ", ".join(TASK_FIELDS)
+    NOTE_FIELDS = ("id", "text", "date", "category", "updated_at")
+    NOTE_COLUMNS = ", ".join(NOTE_FIELDS)
+    BACKUP_INTERVAL = 3600  # Резервный снимок создаётся не чаще раза в час, сек
+    # Каждая операция — своя транзакция под блокировками SQLite; полная синхронизация при выходе
+    # затёрла бы строки, записанные другим процессом
+    compact_on_close = False
+
+    def __init__(self, path="tasks.db", backup_path="tasks_backup.json", snapshots=None):
+        self.path = path
+        self.backup_path = backup_path
+        self.snapshots = snapshots if snapshots is not None else snapshot_store(path)
+        self.db = None
+
+    def connect(self):
+        if self.db is None:
+            # Читает поток интерфейса, пишет фоновый поток (BackgroundWriter) — по очереди, не одновременно
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.create_schema()
+        return self.db
+
+    def create_schema(self):
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    due_date TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    comment TEXT NOT NULL DEFAULT '',
+                    time_spent INTEGER NOT NULL DEFAULT 0,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    importance INTEGER NOT NULL DEFAULT 0,
+                    urgency INTEGER NOT NULL DEFAULT 0,
+                    quadrant INTEGER NOT NULL DEFAULT 4,
+                    completed_at REAL NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (due_date);
+                CREATE INDEX IF NOT EXISTS tasks_category ON tasks (category);
+                CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed, due_date);
+                CREATE INDEX IF NOT EXISTS tasks_quadrant ON tasks (quadrant, completed);
+                CREATE TABLE IF NOT EXISTS notes (
+                    id TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    updated_at REAL NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS notes_category ON notes (category);
+                CREATE INDEX IF NOT EXISTS notes_date ON notes (date);
+                CREATE TABLE IF NOT EXISTS categories (
+                    position INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS free_time_entries (
+                    date TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    time_spent INTEGER NOT NULL
+                );
+            """)
+            # Базы, созданные до появления completed_at и updated_at (по updated_at сливаются правки разных
+            # процессов и восстановленная из архива запись не считается старой)
+            for table, column in (("tasks", "completed_at"), ("tasks", "updated_at"), ("notes", "updated_at")):
+                columns = [row[1] for row in self.db.execute(f"PRAGMA table_info({table})")]
+                if column not in columns:
+                    self.db.execute(f"ALTER TABLE {table} ADD COLUMN {column} REAL NOT NULL DEFAULT 0")
+
+    def iter_load(self):
+        # Курсоры SQLite отдают строки по одной, весь результат в память не попадает
+        try:
+            db = self.connect()
+            categories = [row[0] for row in db.execute("SELECT name FROM categories ORDER BY position")]
+            for name in categories or DEFAULT_CATEGORIES:
+                yield "categories", name
+            for row in db.execute("SELECT date, description, time_spent FROM free_time_entries ORDER BY rowid"):
+                yield "free_time_entries", {"date": row[0], "description": row[1], "time_spent": row[2]}
+            for row in db.execute(f"SELECT {self.TASK_COLUMNS} FROM tasks ORDER BY rowid"):
+                yield "tasks", self.task_record(row)
+            for row in db.execute(f"SELECT {self.NOTE_COLUMNS} FROM notes ORDER BY rowid"):
+                yield "notes", dict(zip(self.NOTE_FIELDS, row))
+        except sqlite3.DatabaseError as e:
+            self.close()
+            raise CorruptDataError(f"{self.path}: {e}")
+
+    def load(self):
+        try:
+            db = self.connect()
+            tasks = [self.task_record(row)
+                     for row in db.execute(f"SELECT {self.TASK_COLUMNS} FROM tasks ORDER BY rowid")]
+            notes = [dict(zip(self.NOTE_FIELDS, row))
+                     for row in db.execute(f"SELECT {self.NOTE_COLUMNS} FROM notes ORDER BY rowid")]
+            categories = [row[0] for row in db.execute("SELECT name FROM categories ORDER BY position")]
+            entries = [{"date": row[0], "description": row[1], "time_spent": row[2]}
+                       for row in db.execute("SELECT date, description, time_spent FROM free_time_entries "
+                                             "ORDER BY rowid")]
+        except sqlite3.DatabaseError as e:
+            self.close()
+            raise CorruptDataError(f"{self.path}: {e}")
+        data = empty_data()
+        data["tasks"] = tasks
+        data["notes"] = notes
+        data["categories"] = categories or data["categories"]
+        data["free_time_entries"] = entries
+        return data
+
+    def task_record(self, row):
+        record = dict(zip(self.TASK_FIELDS, row))
+        for key in ("completed", "importance", "urgency"):
+            record[key] = bool(record[key])
+        return record
+
+    def _put_task(self, record):
+        self.db.execute(
+            "INSERT INTO tasks (id, title, due_date, category, comment, time_spent, completed, importance, urgency, "
+            "quadrant, completed_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET title = excluded.title, due_date = excluded.due_date, "
+            "category = excluded.category, comment = excluded.comment, time_spent = excluded.time_spent, "
+            "completed = excluded.completed, importance = excluded.importance, urgency = excluded.urgency, "
+            "quadrant = excluded.quadrant, completed_at = excluded.completed_at, updated_at = excluded.updated_at",
+            (record["id"], record["title"], record["due_date"], record.get("category", "Без категории"),
+             record.get("comment", ""), record.get("time_spent", 0), int(record.get("completed", False)),
+             int(record.get("importance", False)), int(record.get("urgency", False)), task_quadrant(record),
+             record.get("completed_at", 0.0), record.get("updated_at", 0.0)))
+
+    def _put_note(self, record):
+        self.db.execute(
+            "INSERT INTO notes (id, text, date, category, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET text = excluded.text, date = excluded.date, category = excluded.category, "
+            "updated_at = excluded.updated_at",
+            (record["id"], record["text"], record["date"], record.get("category", "Без категории"),
+             record.get("updated_at", 0.0)))
+
+    def _set(self, key, value):
+        if key == "categories":
+            self.db.execute("DELETE FROM categories")
+            self.db.executemany("INSERT INTO categories (position, name) VALUES (?, ?)", enumerate(value))
+        elif key == "free_time_entries":
+            self.db.execute("DELETE FROM free_time_entries")
+            for entry in value:
+                self._append(key, entry)
+
+    def _append(self, key, value):
+        if key == "free_time_entries":
+            self.db.execute("INSERT INTO free_time_entries (date, description, time_spent) VALUES (?, ?, ?)",
+                            (value["date"], value["description"], value["time_spent"]))
+
+    def put(self, kind, record):
+        db = self.connect()
+        with db:
+            if kind == "task":
+                self._put_task(record)
+            else:
+                self._put_note(record)
+
+    def delete(self, kind, record_id, at=None):
+        db = self.connect()
+        with db:
+            db.execute(f"DELETE FROM {'tasks' if kind == 'task' else 'notes'} WHERE id = ?", (record_id,))
+
+    def set(self, key, value):
+        db = self.connect()
+        with db:
+            self._set(key, value)
+
+    def append(self, key, value):
+        db = self.connect()
+        with db:
+            self._append(key, value)
+
+    def write_batch(self, ops):
+        # Пачка операций — одна транзакция
+        db = self.connect()
+        with db:
+            for op in ops:
+                if op["op"] == "put":
+                    if op["kind"] == "task":
+                        self._put_task(op["record"])
+                    else:
+                        self._put_note(op["record"])
+                elif op["op"] == "delete":
+                    db.execute(f"DELETE FROM {'tasks' if op['kind'] == 'task' else 'notes'} WHERE id = ?",
+                               (op["id"],))
+                elif op["op"] == "set":
+                    self._set(op["key"], op["value"])
+                elif op["op"] == "append":
+                    self._append(op["key"], op["value"])
+
+    def needs_compaction(self):
+        return False
+
+    def has_journal(self):
+        return False
+
+    def poll_changes(self):
+        # Другие процессы пишут в ту же базу построчно; отдельного слияния не требуется
+        return []
+
+    def compact(self, data):
+        # Полная синхронизация с переданным состоянием (после восстановления из копии и т. п.)
+        # и резервный снимок (snapshots.py)
+        if callable(data):
+            data = data()
+        db = self.connect()
+        with db:
+            db.execute("DELETE FROM tasks")
+            db.execute("DELETE FROM notes")
+            for record in data["tasks"]:
+                self._put_task(record)
+            for record in data["notes"]:
+                self._put_note(record)
+            self._set("categories", data["categories"])
+            self._set("free_time_entries", data["free_time_entries"])
+        self.snapshots.create_if_due(data, self.BACKUP_INTERVAL)
+
+    def recover(self):
+        self.close()
+        corrupt_path = self.path + ".corrupt"
+        os.replace(self.path, corrupt_path)
+        # Журнал WAL и его индекс принадлежат повреждённой базе: рядом с новой SQLite принял бы их за свои.
+        # Переносятся под имя отложенной базы — так её можно открыть для разбора вместе с ними
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.replace(self.path + suffix, corrupt_path + suffix)
+        data = read_backup(self.snapshots, self.backup_path)
+        self.compact(data)
+        return corrupt_path, data
+
+    indexed = True  # query_tasks идёт по индексам — им пользуются виды таблиц (views.ViewIndex)
+    # По сроку — как индекс сроков модели (DueIndex), rowid — порядок добавления, как список задач модели
+    QUERY_ORDERS = {"due_date": "due_date, id", "rowid": "rowid"}
+
+    def query_tasks(self, category=None, completed=None, quadrant=None, due_from=None, due_to=None,
+                    order="due_date"):
+        if order not in self.QUERY_ORDERS:
+            raise ValueError(f"неизвестный порядок: {order}")
+        conditions, params = [], []
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        if completed is not None:
+            conditions.append("completed = ?")
+            params.append(int(completed))
+        if quadrant is not None:
+            conditions.append("quadrant = ?")
+            params.append(quadrant)
+        if due_from is not None:
+            conditions.append("due_date >= ?")
+            params.append(due_from)
+        if due_to is not None:
+            conditions.append("due_date <= ?")
+            params.append(due_to)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.connect().execute(f"SELECT {self.TASK_COLUMNS} FROM tasks{where} "
+                                      f"ORDER BY {self.QUERY_ORDERS[order]}", params)
+        return [self.task_record(row) for row in rows]
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def open_storage():
+    # Выбор хранилища: PLANNER_STORAGE=sqlite|json, иначе SQLite, если уже есть tasks.db
+    backend = os.environ.get("PLANNER_STORAGE")
+    if backend == "sqlite" or (backend is None and os.path.exists("tasks.db")):
+        return SqliteStorage("tasks.db")
+    return JsonStorage("tasks.json")
+
+
+def migrate_json_to_sqlite(json_path="tasks.json", db_path="tasks.db"):
+    data = JsonStorage(json_path).load()
+    target = SqliteStorage(db_path)
+    target.compact(data)
+    target.close()
+    return data
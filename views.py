@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+# Сортировка по столбцам и сохранённые виды (фильтры) таблиц задач и заметок — в модели, без Tk.
+# Для каждого столбца, по которому сортировали хоть раз, держится отсортированный список пар (ключ, id).
+# Ключ считается, когда запись меняется, а не при каждой сортировке. Поэтому пересортировка или смена
+# вида на сотне тысяч задач — проход по готовому списку, а не разбор записей и полная перестройка.
+# Изменения копятся и применяются при следующем чтении: пачка правок не вставляется в индекс по одной.
+import bisect
+import itertools
+import json
+from datetime import datetime, timedelta
+from operator import attrgetter
+
+from storage import write_json_atomic
+
+VIEWS_PATH = "views.json"
+
+TASK_SORT_KEYS = {
+    "title": lambda task: task.title.casefold(),
+    "due": attrgetter("due_at"),
+    "category": lambda task: task.category.casefold(),
+    "status": attrgetter("completed"),
+    "comment": lambda task: task.comment.casefold(),
+    "time": attrgetter("time_spent"),
+    "priority": attrgetter("priority"),
+}
+NOTE_SORT_KEYS = {
+    "title": lambda note: note.title.casefold(),
+    "date": attrgetter("date"),
+    "category": lambda note: note.category.casefold(),
+}
+STATUSES = ("open", "done")
+DUE_FORMAT = "%Y-%m-%d %H:%M"
+DUE_RANGES = ("overdue", "today", "week")
+
+
+class SortIndex:
+    # Пары (ключ, id) всех записей по одному столбцу; как DueIndex, но для любого ключа
+    REBUILD_SHARE = 8  # Изменилось больше 1/8 записей — дешевле отсортировать заново, чем вставлять по одной
+
+    def __init__(self, key, items):
+        self.key = key
+        self._by_id = {item.id: (key(item), item.id) for item in items}  # id -> пара в _keys
+        self._keys = sorted(self._by_id.values())
+        self.pending = {}  # id -> запись (None — удалена), ещё не применённые к _keys
+
+    def __len__(self):
+        self.flush()
+        return len(self._keys)
+
+    def touch(self, item_id, item):
+        # Запись изменилась или удалена; ключ пересчитается при следующем чтении
+        self.pending[item_id] = item
+
+    def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        if len(pending) * self.REBUILD_SHARE > len(self._keys):
+            for item_id, item in pending.items():
+                if item is None:
+                    self._by_id.pop(item_id, None)
+                else:
+                    self._by_id[item_id] = (self.key(item), item_id)
+            self._keys = sorted(self._by_id.values())
+            return
+        for item_id, item in pending.items():
+            # Старый ключ берём из _by_id: запись могла измениться на месте ещё до уведомления
+            old = self._by_id.pop(item_id, None)
+            if old is not None:
+                del self._keys[bisect.bisect_left(self._keys, old)]
+            if item is not None:
+                new = (self.key(item), item_id)
+                bisect.insort(self._keys, new)
+                self._by_id[item_id] = new
+
+    def ids(self, reverse=False):
+        self.flush()
+        return [item_id for _, item_id in (reversed(self._keys) if reverse else self._keys)]
+
+    def top(self, limit, reverse=False):
+        # Первые limit id — без списка всех записей
+        self.flush()
+        keys = reversed(self._keys) if reverse else self._keys
+        return [item_id for _, item_id in itertools.islice(keys, max(limit, 0))]
+
+    def order(self, item_ids, reverse=False):
+        # Часть записей (найденные, отобранные видом) в порядке индекса: немногие сортируются по готовым
+        # ключам, большая часть — отбирается из готового порядка одним проходом
+        self.flush()
+        if len(item_ids) * self.REBUILD_SHARE < len(self._keys):
+            return sorted(item_ids, key=self._by_id.__getitem__, reverse=reverse)
+        wanted = set(item_ids)
+        return [item_id for item_id in self.ids(reverse) if item_id in wanted]
+
+
+class TaskView:
+    # Сохранённый вид таблицы задач. category — название или None (все); status — "open", "done" или None;
+    # quadrant — 1–4 или None; due — "overdue", "today", "week" (текущая неделя) или None;
+    # sort — ключ TASK_SORT_KEYS или None (порядок добавления); reverse — по убыванию
+    def __init__(self, name, category=None, status=None, quadrant=None, due=None, sort=None, reverse=False):
+        if status not in STATUSES + (None,):
+            raise ValueError(f"неизвестный статус: {status}")
+        if quadrant not in (1, 2, 3, 4, None):
+            raise ValueError(f"неизвестный квадрант: {quadrant}")
+        if due not in DUE_RANGES + (None,):
+            raise ValueError(f"неизвестный срок: {due}")
+        if sort not in TASK_SORT_KEYS and sort is not None:
+            raise ValueError(f"неизвестный столбец: {sort}")
+        self.name = name
+        self.category = category
+        self.status = status
+        self.quadrant = quadrant
+        self.due = due
+        self.sort = sort
+        self.reverse = bool(reverse)
+
+    @property
+    def filtered(self):
+        return self.category is not None or self.status is not None or self.quadrant is not None or self.due is not None
+
+    def to_dict(self):
+        return {"name": self.name, "category": self.category, "status": self.status, "quadrant": self.quadrant,
+                "due": self.due, "sort": self.sort, "reverse": self.reverse}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data.get("category"), data.get("status"), data.get("quadrant"), data.get("due"),
+                   data.get("sort"), data.get("reverse", False))
+
+    def due_window(self, now):
+        # (начало, конец) срока включительно или None, если вид не смотрит на срок
+        if self.due is None:
+            return None
+        if self.due == "overdue":
+            return datetime.min, now
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.due == "week":
+            start -= timedelta(days=start.weekday())
+        return start, start + timedelta(days=7 if self.due == "week" else 1) - timedelta(microseconds=1)
+
+    def query(self, now):
+        # Условия вида для выборки хранилища (query_tasks). Срок хранится как "ГГГГ-ММ-ДД ЧЧ:ММ" —
+        # такие строки сравниваются как даты; границы с точностью до минуты уточняет matcher
+        filters = {"category": self.category, "quadrant": self.quadrant,
+                   "completed": None if self.status is None else self.status == "done"}
+        if self.due == "overdue":
+            filters["completed"] = False
+            filters["due_to"] = now.strftime(DUE_FORMAT)
+        elif self.due is not None:
+            start, end = self.due_window(now)
+            filters["due_from"], filters["due_to"] = start.strftime(DUE_FORMAT), end.strftime(DUE_FORMAT)
+        return filters
+
+    def matcher(self, now):
+        window = self.due_window(now)
+        completed = None if self.status is None else self.status == "done"
+        if self.due == "overdue":
+            completed = False  # Просроченной бывает только невыполненная задача
+
+        def accepts(task):
+            if completed is not None and task.completed != completed:
+                return False
+            if self.category is not None and task.category != self.category:
+                return False
+            if self.quadrant is not None and task.priority != self.quadrant:
+                return False
+            if window is not None and not window[0] <= task.due_at <= window[1]:
+                return False
+            if self.due == "overdue" and task.due_at >= now:
+                return False
+            return True
+
+        return accepts
+
+
+DEFAULT_VIEWS = (
+    TaskView("Все задачи"),
+    TaskView("Открытые", status="open"),
+    TaskView("Открытые Q1 на этой неделе", status="open", quadrant=1, due="week", sort="due"),
+    TaskView("Просроченные", due="overdue", sort="due"),
+    TaskView("На сегодня", status="open", due="today", sort="due"),
+    TaskView("Выполненные", status="done", sort="due", reverse=True),
+)
+
+
+def load_views(path=VIEWS_PATH):
+    # Сохранённые виды; файла нет или он испорчен — виды по умолчанию
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [TaskView.from_dict(data) for data in json.load(f)["views"]] or list(DEFAULT_VIEWS)
+    except (OSError, ValueError, KeyError, TypeError):
+        return list(DEFAULT_VIEWS)
+
+
+def save_views(views, path=VIEWS_PATH):
+    write_json_atomic(path, {"views": [view.to_dict() for view in views]})
+
+
+class ViewIndex:
+    # Индексы сортировки модели. Строятся при первой сортировке по столбцу, дальше обновляются по уведомлениям
+    # ядра (PlannerCore.changed); после полной перезагрузки данных сбрасываются и строятся заново по запросу
+    def __init__(self, core):
+        self.core = core
+        self.task_sorts = {}  # Ключ TASK_SORT_KEYS -> SortIndex
+        self.note_sorts = {}
+
+    def reset(self):
+        self.task_sorts = {}
+        self.note_sorts = {}
+
+    def changed(self, kind, item_id, action):
+        if kind == "all":
+            self.reset()
+        elif kind == "task":
+            task = self.core.task_index.get(item_id)  # None — задача удалена
+            for sort_index in self.task_sorts.values():
+                sort_index.touch(item_id, task)
+        elif kind == "note":
+            note = self.core.note_index.get(item_id)
+            for sort_index in self.note_sorts.values():
+                sort_index.touch(item_id, note)
+
+    def task_sort(self, column):
+        sort_index = self.task_sorts.get(column)
+        if sort_index is None:
+            sort_index = SortIndex(TASK_SORT_KEYS[column], self.core.tasks)
+            if not self.core.loading:  # Во время загрузки записи добавляются без уведомлений — индекс устареет
+                self.task_sorts[column] = sort_index
+        return sort_index
+
+    def note_sort(self, column):
+        sort_index = self.note_sorts.get(column)
+        if sort_index is None:
+            sort_index = SortIndex(NOTE_SORT_KEYS[column], self.core.notes)
+            if not self.core.loading:
+                self.note_sorts[column] = sort_index
+        return sort_index
+
+    def task_ids(self, view=None, sort=None, reverse=False, tasks=None, now=None):
+        # id задач вида view в порядке столбца sort (None — порядок добавления).
+        # tasks — отбирать не из всех задач, а из этих (например, найденных)
+        index = self.core.task_index
+        ids = None  # None — все задачи
+        if tasks is not None:
+            ids = [task.id for task in tasks if task.id in index]
+        if view is not None and view.filtered:
+            now = now or datetime.now()
+            accepts = view.matcher(now)
+            if ids is not None:
+                ids = [task_id for task_id in ids if accepts(index[task_id])]
+            elif getattr(self.core.storage, "indexed", False):
+                # Хранилище с индексами (SQLite): кандидатов отбирает запрос по индексам, а не проход по всем
+                # задачам. Проверка в памяти отсекает то, чего в модели нет или что в ней уже другое
+                # Порядок тот же, что у ветки ниже: открытые в окне срока — по сроку, остальные — по добавлению
+                by_due = view.due is not None and (view.status == "open" or view.due == "overdue")
+                records = self.core.storage.query_tasks(order="due_date" if by_due else "rowid", **view.query(now))
+                ids = [record["id"] for record in records if record["id"] in index and accepts(index[record["id"]])]
+            elif view.due is not None and (view.status == "open" or view.due == "overdue"):
+                # Открытые задачи в окне срока — из индекса сроков через bisect, а не проходом по всем
+                ids = [task_id for task_id in self.core.due_index.ids_between(*view.due_window(now))
+                       if accepts(index[task_id])]
+            else:
+                ids = [task.id for task in self.core.tasks if accepts(task)]
+        if sort is None:
+            return ids if ids is not None else [task.id for task in self.core.tasks]
+        if ids is None:
+            return self.task_sort(sort).ids(reverse)
+        return self.task_sort(sort).order(ids, reverse)
+
+    def note_ids(self, sort=None, reverse=False, notes=None):
+        ids = None if notes is None else [note.id for note in notes if note.id in self.core.note_index]
+        if sort is None:
+            return ids if ids is not None else [note.id for note in self.core.notes]
+        if ids is None:
+            return self.note_sort(sort).ids(reverse)
+        return self.note_sort(sort).order(ids, reverse)
+
+    def tasks(self, view=None, sort=None, reverse=False, tasks=None, now=None):
+        return [self.core.task_index[task_id] for task_id in self.task_ids(view, sort, reverse, tasks, now)]
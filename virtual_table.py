@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+class VirtualTable:
+    # Виртуальный список поверх ttk.Treeview: порядок строк хранится в модели (список id),
+    # а в самом Treeview существуют только строки видимого окна. Прокрутка, выделение,
+    # сортировка и фильтрация работают с моделью, Tk перерисовывает лишь окно.
+    def __init__(self, tree, scrollbar, row_fn):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.row_fn = row_fn  # id -> (values, tags)
+        self.ids = []
+        self.offset = 0
+        self.rendered = []
+        self.selected = []  # Выделение в модели, в порядке выбора
+        self.syncing = False
+
+        self.scrollbar.configure(command=self.yview)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select, add="+")
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.move_selection(-self.visible_rows()))
+        self.tree.bind("<Next>", lambda event: self.move_selection(self.visible_rows()))
+        self.tree.bind("<Control-a>", self.select_all)
+        self.tree.bind("<Button-1>", self.on_click, add="+")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def visible_rows(self):
+        return int(self.tree.cget("height"))
+
+    # --- модель ---
+
+    def set_ids(self, ids):
+        # Новый порядок или новый фильтр: выделение сохраняем для оставшихся строк
+        self.ids = list(ids)
+        present = set(self.ids)
+        self.selected = [item_id for item_id in self.selected if item_id in present]
+        self.render()
+
+    def append(self, item_id):
+        self.ids.append(item_id)
+        if len(self.ids) - 1 < self.offset + self.visible_rows():
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def extend(self, item_ids):
+        # Догрузка порции строк: окно перерисовываем, только если новые строки в него попадают
+        visible_end = self.offset + self.visible_rows()
+        self.ids.extend(item_ids)
+        if len(self.ids) - len(item_ids) < visible_end:
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def update(self, item_id):
+        if self.tree.exists(item_id):
+            values, tags = self.row_fn(item_id)
+            self.tree.item(item_id, values=values, tags=tags)
+
+    def remove(self, item_id):
+        try:
+            self.ids.remove(item_id)
+        except ValueError:
+            return
+        if item_id in self.selected:
+            self.selected.remove(item_id)
+        self.render()
+
+    def remove_many(self, item_ids):
+        # Удаление пачки строк: один проход по модели и одна перерисовка
+        removed = set(item_ids)
+        self.ids = [item_id for item_id in self.ids if item_id not in removed]
+        self.selected = [item_id for item_id in self.selected if item_id not in removed]
+        self.render()
+
+    def refresh(self):
+        self.render()
+
+    def selection(self):
+        return list(self.selected)
+
+    def select_all(self, event=None):
+        # Выделяет все строки модели, в том числе не попавшие в окно (например, все найденные)
+        if str(self.tree.cget("selectmode")) == "extended":
+            self.selected = list(self.ids)
+            self.render()
+        return "break"
+
+    def see(self, item_id):
+        position = self.ids.index(item_id)
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + self.visible_rows():
+            self.offset = position - self.visible_rows() + 1
+        self.render()
+
+    # --- окно ---
+
+    def render(self):
+        visible = self.visible_rows()
+        self.offset = max(0, min(self.offset, len(self.ids) - visible))
+        window = self.ids[self.offset:self.offset + visible]
+        self.syncing = True
+        try:
+            if window != self.rendered:
+                self.tree.delete(*self.tree.get_children())
+                for item_id in window:
+                    values, tags = self.row_fn(item_id)
+                    self.tree.insert("", "end", iid=item_id, values=values, tags=tags)
+                self.rendered = window
+            else:
+                for item_id in window:
+                    values, tags = self.row_fn(item_id)
+                    self.tree.item(item_id, values=values, tags=tags)
+            shown = set(window)
+            self.tree.selection_set([item_id for item_id in self.selected if item_id in shown])
+        finally:
+            self.syncing = False
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        total = len(self.ids)
+        if total <= self.visible_rows():
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.visible_rows()) / total)
+
+    def scroll(self, rows):
+        self.offset += rows
+        self.render()
+        return "break"
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.ids))
+            self.render()
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self.scroll(amount * self.visible_rows() if args[2] == "pages" else amount)
+
+    def on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def on_select(self, event):
+        if self.syncing:
+            return
+        # Выделение в видимом окне переносим в модель, строки вне окна не трогаем
+        chosen = self.tree.selection()
+        if str(self.tree.cget("selectmode")) == "browse":
+            if chosen:
+                self.selected = list(chosen)
+            return
+        shown = set(self.rendered)
+        self.selected = [item_id for item_id in self.selected if item_id not in shown]
+        self.selected.extend(chosen)
+
+    def on_click(self, event):
+        # Щелчок без Ctrl и Shift начинает выделение заново — и за пределами окна тоже,
+        # иначе массовое действие задело бы строки, выделенные раньше и уже прокрученные
+        if not event.state & 0x0005:
+            self.selected = []
+
+    def move_selection(self, step):
+        if not self.ids:
+            return "break"
+        current = self.selected[-1] if self.selected else None
+        position = self.ids.index(current) + step if current in self.ids else 0
+        position = max(0, min(position, len(self.ids) - 1))
+        self.selected = [self.ids[position]]
+        self.see(self.ids[position])
+        self.tree.focus(self.ids[position])
+        return "break"